@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battle Chess Analytics - Thống kê toàn bộ không gian đội hình (cần numpy)
+Nhóm 13
+
+Mô phỏng mọi cặp (đội hình team 1, đội hình team 2) trên nhiều tiến trình rồi tính:
+- tỉ lệ thắng/hòa của từng đội hình (đánh trước và đánh sau như nhau)
+- đội hình khắc chế tốt nhất (best response) của mỗi đội hình, và chiến lược hỗn hợp cân bằng
+  (xấp xỉ Nash bằng fictitious play) của trò chơi chọn đội hình
+- đóng góp của từng tướng: tỉ lệ điểm của các đội hình có / không có tướng đó, theo từng vị trí
+
+Kết quả được giữ dưới dạng ma trận người thắng (N x N, 1 byte mỗi trận). Khi chỉ số một tướng
+thay đổi, chỉ các trận có đội hình chứa tướng đó được mô phỏng lại; engine không dùng range
+nên đổi range không phải mô phỏng lại trận nào.
+
+Chạy:   python Analytics.py report --save analytics.npz
+        python Analytics.py update analytics.npz Tank --hp 22
+"""
+
+import sys
+import json
+import time
+import argparse
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+from MatchupTable import composition_index
+
+ENGINES = ('batch', 'engine')
+
+# Tổ hợp đội hình theo thứ tự của MatchupTable (ID vị trí đầu là chữ số có trọng số lớn nhất)
+_COMPOSITIONS = {}
+
+def compositions(num_champions: int, team_size: int) -> np.ndarray:
+    key = (num_champions, team_size)
+    if key not in _COMPOSITIONS:
+        _COMPOSITIONS[key] = np.array(list(itertools.product(range(num_champions), repeat=team_size)),
+                                      dtype=np.intp).reshape(-1, team_size)
+    return _COMPOSITIONS[key]
+
+def _simulate_block(stats: List[tuple], team_size: int, rows: np.ndarray, cols: np.ndarray, engine: str) -> np.ndarray:
+    """Chạy trong worker: người thắng của mọi cặp (rows x cols), dạng (len(rows), len(cols))"""
+    comps = compositions(len(stats), team_size)
+    team1 = comps[np.repeat(rows, len(cols))]
+    team2 = comps[np.tile(cols, len(rows))]
+    
+    if engine == 'batch':
+        from BatchSimulator import simulate_batch
+    
+        hp_table = np.array([s[1] for s in stats], dtype=np.int32)
+        dmg_table = np.array([s[2] for s in stats], dtype=np.int32)
+        winners = simulate_batch(hp_table[team1], dmg_table[team1], hp_table[team2], dmg_table[team2])['winner']
+    else:
+        from Server import BattleEngine, Champion
+    
+        winners = np.empty(len(team1), dtype=np.uint8)
+        for k, (ids1, ids2) in enumerate(zip(team1.tolist(), team2.tolist())):
+            winners[k] = BattleEngine.simulate_battle(
+                [Champion(*stats[i]) for i in ids1], [Champion(*stats[i]) for i in ids2], record_log=False
+            )['winner']
+    
+    return winners.astype(np.uint8).reshape(len(rows), len(cols))
+
+class CompositionAnalytics:
+    """Ma trận kết quả của toàn bộ không gian đội hình và các thống kê suy ra từ nó.
+    
+    winners[i, j]: người thắng (0 = hòa, 1, 2) khi đội hình i là team 1 gặp đội hình j là team 2.
+    """
+    
+    def __init__(self, champions: List[Dict[str, Any]], team_size: int = 4, workers: Optional[int] = None,
+                 engine: str = 'batch', block_pairs: int = 65536):
+        if engine not in ENGINES:
+            raise ValueError(f'engine phải là một trong {ENGINES}')
+        self.champions = [dict(c) for c in champions]
+        self.team_size = team_size
+        self.workers = workers
+        self.engine = engine
+        self.block_pairs = block_pairs
+        self.compositions = compositions(len(champions), team_size)
+        self.winners = None
+        self.simulated = 0  # số trận đã mô phỏng (kể cả các lần tính lại)
+        self._executor = None
+        self._cache = {}
+    
+    def __len__(self) -> int:
+        return len(self.compositions)
+    
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+    
+    def _stats(self) -> List[tuple]:
+        return [(c['name'], c['hp'], c['dmg'], c['range']) for c in self.champions]
+    
+    def _simulate(self, rows: np.ndarray, cols: np.ndarray):
+        """Mô phỏng lại các cặp rows x cols trên pool tiến trình và ghi vào winners"""
+        if len(rows) == 0 or len(cols) == 0:
+            return
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+    
+        stats = self._stats()
+        step = max(1, self.block_pairs // len(cols))
+        blocks = [rows[start:start + step] for start in range(0, len(rows), step)]
+        futures = [self._executor.submit(_simulate_block, stats, self.team_size, block, cols, self.engine)
+                   for block in blocks]
+        for block, future in zip(blocks, futures):
+            self.winners[np.ix_(block, cols)] = future.result()
+        self.simulated += len(rows) * len(cols)
+        self._cache.clear()
+    
+    def compute(self):
+        """Mô phỏng toàn bộ N x N cặp đội hình"""
+        n = len(self)
+        self.winners = np.empty((n, n), dtype=np.uint8)
+        everything = np.arange(n)
+        self._simulate(everything, everything)
+    
+    def refresh(self, champions: List[Dict[str, Any]]) -> int:
+        """Cập nhật theo danh mục mới (ví dụ server.available_champions sau update_champion_stats).
+        Chỉ mô phỏng lại các trận có tướng đổi HP/DMG; trả về số trận đã mô phỏng lại."""
+        if self.winners is None or len(champions) != len(self.champions):
+            self.champions = [dict(c) for c in champions]
+            self.compositions = compositions(len(champions), self.team_size)
+            before = self.simulated
+            self.compute()
+            return self.simulated - before
+    
+        changed = [i for i, (old, new) in enumerate(zip(self.champions, champions))
+                   if (old['hp'], old['dmg']) != (new['hp'], new['dmg'])]
+        self.champions = [dict(c) for c in champions]
+        if not changed:
+            self._cache.clear()
+            return 0
+    
+        affected = np.isin(self.compositions, changed).any(axis=1)
+        rows = np.nonzero(affected)[0]
+        others = np.nonzero(~affected)[0]
+    
+        before = self.simulated
+        # Hàng của đội hình bị ảnh hưởng gặp mọi đối thủ, và cột của chúng khi đối thủ không bị ảnh hưởng
+        self._simulate(rows, np.arange(len(self)))
+        self._simulate(others, rows)
+        return self.simulated - before
+    
+    def update_champion(self, name: str, **stats) -> int:
+        """Đổi chỉ số (hp, dmg, range) của một tướng rồi tính lại phần bị ảnh hưởng"""
+        champions = [dict(c) for c in self.champions]
+        for champion in champions:
+            if champion['name'] == name:
+                champion.update(stats)
+                break
+        else:
+            raise KeyError(f'Tướng {name} không tồn tại')
+        return self.refresh(champions)
+    
+    def composition_stats(self) -> Dict[str, np.ndarray]:
+        """Số trận thắng/hòa/thua của mỗi đội hình khi gặp mọi đội hình, ở cả hai bên (2N trận)"""
+        if 'stats' not in self._cache:
+            w = self.winners
+            wins = (w == 1).sum(axis=1) + (w == 2).sum(axis=0)
+            draws = (w == 0).sum(axis=1) + (w == 0).sum(axis=0)
+            games = 2 * len(self)
+            self._cache['stats'] = {
+                'wins': wins,
+                'draws': draws,
+                'losses': games - wins - draws,
+                'win_rate': wins / games,
+                'draw_rate': draws / games,
+                'score': (wins + 0.5 * draws) / games
+            }
+        return self._cache['stats']
+    
+    def payoff(self) -> np.ndarray:
+        """payoff[y, x]: điểm trung bình (thắng 1, hòa 0.5) của đội hình y gặp x, đánh trước một
+        trận và đánh sau một trận. payoff[y, x] + payoff[x, y] = 1 (trò chơi đối xứng, tổng không đổi)"""
+        if 'payoff' not in self._cache:
+            score = (self.winners == 1).astype(np.float32)
+            score += 0.5 * (self.winners == 0)
+            self._cache['payoff'] = (score + (1 - score.T)) / 2
+        return self._cache['payoff']
+    
+    def best_responses(self, targets: Sequence[int]) -> List[Dict[str, Any]]:
+        """Đội hình khắc chế tốt nhất mỗi đội hình trong targets"""
+        payoff = self.payoff()
+        result = []
+        for x in targets:
+            column = payoff[:, x]
+            best = int(column.argmax())
+            result.append({
+                'composition': int(x),
+                'best_response': best,
+                'payoff': float(column[best]),
+                'responses': int((column == column[best]).sum())
+            })
+        return result
+    
+    def equilibrium(self, iterations: int = 20000) -> Dict[str, Any]:
+        """Chiến lược hỗn hợp cân bằng xấp xỉ bằng fictitious play: mỗi vòng chọn best response với
+        tần suất các đội hình đã chọn; tần suất hội tụ về cân bằng Nash của trò chơi đối xứng."""
+        advantage = self.payoff() - 0.5  # phản đối xứng: advantage[:, b] == -advantage[b]
+        total = np.zeros(len(self), dtype=np.float64)
+        counts = np.zeros(len(self), dtype=np.int64)
+    
+        choice = int(self.composition_stats()['score'].argmax())
+        for _ in range(iterations):
+            counts[choice] += 1
+            total -= advantage[choice]
+            choice = int(total.argmax())
+    
+        strategy = counts / iterations
+        return {
+            'strategy': strategy,
+            # Lợi thế tốt nhất một đội hình có thể đạt khi gặp chiến lược hỗn hợp (0 = cân bằng đúng)
+            'exploitability': float(total.max() / iterations),
+            'iterations': iterations
+        }
+    
+    def champion_contribution(self) -> List[Dict[str, Any]]:
+        """Tỉ lệ điểm trung bình của các đội hình có / không có từng tướng, và theo từng vị trí"""
+        score = self.composition_stats()['score']
+        result = []
+        for champion_id, champion in enumerate(self.champions):
+            present = (self.compositions == champion_id)
+            with_champion = present.any(axis=1)
+            result.append({
+                'name': champion['name'],
+                'with': float(score[with_champion].mean()),
+                'without': float(score[~with_champion].mean()) if (~with_champion).any() else 0.0,
+                'by_slot': [float(score[present[:, slot]].mean()) for slot in range(self.team_size)]
+            })
+            result[-1]['contribution'] = result[-1]['with'] - result[-1]['without']
+        return result
+    
+    def names(self, index: int) -> List[str]:
+        return [self.champions[i]['name'] for i in self.compositions[index]]
+    
+    def index_of(self, names: Sequence[str]) -> int:
+        ids = {c['name']: i for i, c in enumerate(self.champions)}
+        return composition_index([ids[name] for name in names], len(self.champions))
+    
+    def save(self, path: str):
+        np.savez_compressed(path, winners=self.winners, team_size=self.team_size,
+                            champions=json.dumps(self.champions, ensure_ascii=False))
+    
+    @classmethod
+    def load(cls, path: str, **kwargs) -> 'CompositionAnalytics':
+        with np.load(path) as data:
+            analytics = cls(json.loads(str(data['champions'])), int(data['team_size']), **kwargs)
+            analytics.winners = data['winners']
+        return analytics
+
+def print_report(analytics: CompositionAnalytics, top: int = 10, iterations: int = 20000):
+    stats = analytics.composition_stats()
+    order = np.argsort(-stats['score'], kind='stable')[:top]
+    
+    print(f"\n📊 TOP {top} ĐỘI HÌNH (trên {2 * len(analytics):,} trận mỗi đội hình):")
+    for rank, (index, response) in enumerate(zip(order, analytics.best_responses(order)), 1):
+        print(f"{rank:>3}. {', '.join(analytics.names(index)):<36} thắng {stats['win_rate'][index]:6.1%}"
+              f"  hòa {stats['draw_rate'][index]:5.1%}  | khắc chế: {', '.join(analytics.names(response['best_response']))}"
+              f" ({response['payoff']:.2f})")
+    
+    equilibrium = analytics.equilibrium(iterations)
+    strategy = equilibrium['strategy']
+    support = np.argsort(-strategy)
+    print(f"\n⚖️ CÂN BẰNG HỖN HỢP (fictitious play {iterations:,} vòng, độ khai thác "
+          f"{equilibrium['exploitability']:.4f}):")
+    for index in support[:top]:
+        if strategy[index] < 0.01:
+            break
+        print(f"   {strategy[index]:6.1%}  {', '.join(analytics.names(index))}")
+    
+    print("\n🧩 ĐÓNG GÓP CỦA TỪNG TƯỚNG (tỉ lệ điểm của đội hình có / không có tướng):")
+    header = ''.join(f"{'vị trí ' + str(slot + 1):>10}" for slot in range(analytics.team_size))
+    print(f"   {'Tướng':<10} {'có':>7} {'không':>7} {'chênh':>7}{header}")
+    for row in sorted(analytics.champion_contribution(), key=lambda r: -r['contribution']):
+        slots = ''.join(f"{value:>10.1%}" for value in row['by_slot'])
+        print(f"   {row['name']:<10} {row['with']:>7.1%} {row['without']:>7.1%} {row['contribution']:>+7.1%}{slots}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Thống kê toàn bộ không gian đội hình')
+    sub = parser.add_subparsers(dest='command', required=True)
+    
+    report = sub.add_parser('report', help='mô phỏng mọi cặp đội hình và in thống kê')
+    report.add_argument('--champions', default=None, help='file JSON danh mục tướng')
+    report.add_argument('--save', default=None, help='lưu ma trận kết quả (.npz) để cập nhật sau')
+    
+    update = sub.add_parser('update', help='đổi chỉ số một tướng và chỉ tính lại phần bị ảnh hưởng')
+    update.add_argument('path', help='file .npz tạo bởi report --save (được ghi đè)')
+    update.add_argument('champion')
+    update.add_argument('--hp', type=int)
+    update.add_argument('--dmg', type=int)
+    update.add_argument('--range', type=int)
+    
+    for command in (report, update):
+        command.add_argument('--workers', type=int, default=None, help='số tiến trình (mặc định: số core)')
+        command.add_argument('--engine', choices=ENGINES, default='batch',
+                             help='batch: BatchSimulator (numpy), engine: BattleEngine.simulate_battle từng trận')
+        command.add_argument('--top', type=int, default=10)
+        command.add_argument('--iterations', type=int, default=20000, help='số vòng fictitious play')
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == 'report':
+        if args.champions:
+            with open(args.champions, encoding='utf-8') as f:
+                champions = json.load(f)
+        else:
+            from Server import GameServer
+            champions = GameServer(battle_workers=0).available_champions
+    
+        analytics = CompositionAnalytics(champions, workers=args.workers, engine=args.engine)
+        started = time.perf_counter()
+        analytics.compute()
+    else:
+        analytics = CompositionAnalytics.load(args.path, workers=args.workers, engine=args.engine)
+        changes = {k: v for k, v in (('hp', args.hp), ('dmg', args.dmg), ('range', args.range)) if v is not None}
+        started = time.perf_counter()
+        analytics.update_champion(args.champion, **changes)
+    
+    elapsed = time.perf_counter() - started
+    analytics.close()
+    print(f"⏱️ Mô phỏng {analytics.simulated:,} trận trong {elapsed:.1f}s"
+          + (f" ({analytics.simulated / elapsed:,.0f} trận/s)" if analytics.simulated else ""))
+    
+    print_report(analytics, args.top, args.iterations)
+    
+    path = args.save if args.command == 'report' else args.path
+    if path:
+        analytics.save(path)
+        print(f"\n💾 Đã lưu {path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
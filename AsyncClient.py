@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battle Chess Async Client - Client không giao diện (asyncio) dùng cho bot, kiểm thử và tạo tải
+Nhóm 13
+
+Ví dụ:
+    client = AsyncGameClient('localhost', 8888)
+    await client.connect()
+    await client.select_team([0, 1, 2, 3])
+    result = await client.battle()
+    await client.close()
+
+Mất kết nối thì kết nối lại bằng phiên cũ (server giữ phiên --session-ttl giây):
+    await client.connect(session=client.session)
+    result = await client.battle()  # kết quả trận đang đấu lúc mất kết nối, nếu có
+"""
+
+import asyncio
+from collections import deque
+from typing import List, Dict, Any, Optional
+
+from Protocol import FrameDecoder, BinaryCodec, encode_message, decode_message
+
+class ServerError(Exception):
+    """Server trả về tin nhắn 'error' cho yêu cầu đang chờ"""
+
+class AsyncGameClient:
+    """Mỗi yêu cầu (select_team, ready_to_battle) chờ tin nhắn trả lời tương ứng qua một Future.
+    
+    Server trả lời theo thứ tự yêu cầu nên tin nhắn 'error' thuộc về yêu cầu cũ nhất đang chờ.
+    """
+    
+    def __init__(self, host: str = 'localhost', port: int = 8888, wire_format: str = 'json',
+                 want_log: bool = False, player: Optional[str] = None, compression: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.wire_format = wire_format
+        self.compression = compression
+        self.want_log = want_log
+        self.player = player
+        self.reader = None
+        self.writer = None
+        self.decoder = FrameDecoder()
+        self.send_format = 'json'
+        self.codec = None
+        self.champions = []
+        self.welcome = None
+        self.session = None  # token để resume phiên này sau khi mất kết nối
+        self.resumed = None  # tin nhắn 'resumed' của lần connect(session) gần nhất
+        self.last_battle_start = None
+        self.last_result_id = None  # match_id của battle_result gần nhất (server gửi lại khi resume)
+        self._pending = deque()  # [(loại tin nhắn trả lời, Future)]
+        self._resumed_result = None  # Future của battle_result server còn giữ cho phiên vừa resume
+        self._reader_task = None
+    
+    async def connect(self, session: Optional[str] = None):
+        """Kết nối, chờ 'welcome', chọn định dạng khung và kiểu nén nếu server hỗ trợ, rồi resume phiên
+        session nếu có (ServerError nếu phiên đã hết hạn; khi đó client dùng phiên mới)"""
+        self.decoder = FrameDecoder()
+        self.send_format = 'json'
+        self.codec = None
+        self._resumed_result = None
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        welcome = self._expect('welcome')
+        self._reader_task = asyncio.get_running_loop().create_task(self._read_loop())
+        self.welcome = await welcome
+        self.champions = self.welcome['champions']
+        self.session = self.welcome.get('session')
+    
+        if self.wire_format != 'json' and self.wire_format in self.welcome.get('formats', []):
+            self.codec = BinaryCodec(self.champions)
+            changed = self._expect('format_changed')
+            self._send({'type': 'set_format', 'format': self.wire_format})
+            self.send_format = self.wire_format
+            await changed
+        
+        if self.compression and self.compression in self.welcome.get('compression', []):
+            await self.request({'type': 'set_compression', 'compression': self.compression}, 'compression_changed')
+        
+        if session:
+            self.resumed = await self.request({'type': 'resume', 'session': session}, 'resumed')
+            self.session = session
+    
+    async def select_team(self, team: List[Any]) -> Dict[str, Any]:
+        """team: 4 ID hoặc tên tướng. Trả về tin nhắn 'team_confirmed'"""
+        return await self.request({'type': 'select_team', 'team': list(team)}, 'team_confirmed')
+    
+    async def battle(self) -> Dict[str, Any]:
+        """Gửi ready_to_battle và chờ đến khi có 'battle_result'. Ngay sau khi resume phiên đang chờ
+        ghép trận hoặc đang đấu thì chỉ chờ kết quả trận đó"""
+        if self._resumed_result is not None:
+            future, self._resumed_result = self._resumed_result, None
+            return await future
+        
+        message = {'type': 'ready_to_battle', 'want_log': self.want_log}
+        if self.player:
+            message['player'] = self.player
+        return await self.request(message, 'battle_result')
+    
+    async def request(self, message: Dict[str, Any], reply_type: str) -> Dict[str, Any]:
+        future = self._expect(reply_type)
+        self._send(message)
+        return await future
+    
+    async def leave(self):
+        """Thoát hẳn: server xóa phiên ngay thay vì giữ để resume như khi chỉ close()"""
+        if self.writer is not None and not self.writer.is_closing():
+            self._send({'type': 'leave'})
+        await self.close()
+    
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+    
+    def _expect(self, reply_type: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((reply_type, future))
+        future.add_done_callback(self._forget)
+        return future
+    
+    def _forget(self, future: asyncio.Future):
+        """Bỏ yêu cầu bị hủy (ví dụ asyncio.wait_for hết giờ) để trả lời đến sau không bị khớp vào nó"""
+        if not future.cancelled():
+            return
+        for i, (_, pending) in enumerate(self._pending):
+            if pending is future:
+                del self._pending[i]
+                return
+    
+    def _send(self, message: Dict[str, Any]):
+        self.writer.write(encode_message(message, self.send_format, self.codec, ensure_ascii=False))
+    
+    async def _read_loop(self):
+        error = ConnectionError('Server đã đóng kết nối')
+        try:
+            while True:
+                data = await self.reader.read(65536)
+                if not data:
+                    break
+                self.decoder.feed(data)
+                for frame in self.decoder:
+                    self._dispatch(decode_message(frame, self.decoder.wire_format, self.codec))
+        except asyncio.CancelledError:
+            error = ConnectionError('Client đã đóng kết nối')
+            raise
+        except Exception as e:
+            error = e
+        finally:
+            # Mọi yêu cầu còn chờ đều thất bại khi mất kết nối
+            while self._pending:
+                _, future = self._pending.popleft()
+                if not future.done():
+                    future.set_exception(error)
+    
+    def _dispatch(self, message: Dict[str, Any]):
+        msg_type = message.get('type')
+    
+        if msg_type == 'format_changed':
+            self.decoder.wire_format = message['format']
+        elif msg_type == 'battle_start':
+            self.last_battle_start = message
+        elif msg_type == 'ping':
+            self._send({'type': 'pong'})
+            return
+        elif msg_type == 'battle_result':
+            self.last_result_id = message.get('match_id')
+        elif msg_type == 'resumed' and (message['state'] != 'idle' or
+                                        message.get('pending_result') not in (None, self.last_result_id)):
+            # battle_result đến sau 'resumed': đăng ký chờ trước khi trả 'resumed' cho connect()
+            self._resumed_result = self._expect('battle_result')
+    
+        if msg_type == 'error':
+            while self._pending:
+                _, future = self._pending.popleft()
+                if not future.done():
+                    future.set_exception(ServerError(message.get('message')))
+                    return
+            return
+    
+        for i, (reply_type, future) in enumerate(self._pending):
+            if reply_type == msg_type and not future.done():
+                del self._pending[i]
+                future.set_result(message)
+                return
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battle Chess Batch Simulator - Mô phỏng hàng loạt trận đấu bằng NumPy
+Nhóm 13
+
+Cho kết quả giống hệt BattleEngine.simulate_battle (người thắng, HP cuối của từng tướng)
+nhưng xử lý N trận cùng lúc: mỗi bước trong một round là một phép toán trên cả mảng.
+Yêu cầu thư viện numpy.
+"""
+
+import numpy as np
+from typing import List, Dict, Any, Sequence
+
+MAX_ROUNDS = 50
+
+def team_arrays(teams: Sequence[Sequence[str]], champions: List[Dict[str, Any]]):
+    """Chuyển danh sách đội hình (tên tướng) thành hai mảng hp, dmg có dạng (N, số tướng)"""
+    index = {c['name']: i for i, c in enumerate(champions)}
+    hp_table = np.array([c['hp'] for c in champions], dtype=np.int32)
+    dmg_table = np.array([c['dmg'] for c in champions], dtype=np.int32)
+    ids = np.array([[index[name] for name in team] for team in teams], dtype=np.intp)
+    return hp_table[ids], dmg_table[ids]
+
+def _attack_phase(attacker_alive, attacker_dmg, defender_hp, active):
+    """Lần lượt từng vị trí tấn công tướng còn sống đầu tiên của đối phương"""
+    for slot in range(attacker_dmg.shape[1]):
+        defender_alive = defender_hp > 0
+        attacking = active & attacker_alive[:, slot] & defender_alive.any(axis=1)
+        rows = np.nonzero(attacking)[0]
+        if rows.size == 0:
+            continue
+        targets = defender_alive[rows].argmax(axis=1)
+        hp = defender_hp[rows, targets] - attacker_dmg[rows, slot]
+        defender_hp[rows, targets] = np.maximum(hp, 0)
+
+def simulate_batch(hp1, dmg1, hp2, dmg2) -> Dict[str, np.ndarray]:
+    """Mô phỏng N trận: team1 (hp1, dmg1) gặp team2 (hp2, dmg2), mỗi mảng có dạng (N, số tướng).
+    
+    Trả về dict gồm 'winner' (0 = hòa, 1, 2), 'rounds', 'team1_hp', 'team2_hp'.
+    """
+    hp1 = np.array(hp1, dtype=np.int32)
+    hp2 = np.array(hp2, dtype=np.int32)
+    dmg1 = np.asarray(dmg1, dtype=np.int32)
+    dmg2 = np.asarray(dmg2, dtype=np.int32)
+    
+    if hp1.ndim != 2 or hp1.shape != dmg1.shape or hp2.shape != dmg2.shape or len(hp1) != len(hp2):
+        raise ValueError('hp/dmg phải là mảng 2 chiều cùng kích thước (N, số tướng)')
+    if (hp1 <= 0).any() or (hp2 <= 0).any():
+        raise ValueError('HP ban đầu của mọi tướng phải lớn hơn 0')
+    
+    n = len(hp1)
+    winner = np.zeros(n, dtype=np.int8)
+    rounds = np.zeros(n, dtype=np.int16)
+    team1_hp = np.empty_like(hp1)
+    team2_hp = np.empty_like(hp2)
+    
+    # Chỉ giữ lại các trận chưa kết thúc để mỗi round làm ít việc hơn
+    idx = np.arange(n)
+    
+    for round_num in range(1, MAX_ROUNDS + 1):
+        if idx.size == 0:
+            break
+        
+        everyone = np.ones(idx.size, dtype=bool)
+        _attack_phase(hp1 > 0, dmg1, hp2, everyone)
+        
+        team2_dead = ~(hp2 > 0).any(axis=1)
+        _attack_phase(hp2 > 0, dmg2, hp1, ~team2_dead)
+        team1_dead = ~(hp1 > 0).any(axis=1) & ~team2_dead
+        
+        # Giống simulate_battle: team 1 bị tiêu diệt ở round cuối vẫn tính là hòa
+        if round_num == MAX_ROUNDS:
+            finished = np.ones(idx.size, dtype=bool)
+            winner[idx[team2_dead]] = 1
+        else:
+            finished = team1_dead | team2_dead
+            winner[idx[team2_dead]] = 1
+            winner[idx[team1_dead]] = 2
+        
+        done = idx[finished]
+        rounds[done] = round_num
+        team1_hp[done] = hp1[finished]
+        team2_hp[done] = hp2[finished]
+        
+        keep = ~finished
+        idx = idx[keep]
+        hp1, hp2, dmg1, dmg2 = hp1[keep], hp2[keep], dmg1[keep], dmg2[keep]
+    
+    return {
+        'winner': winner,
+        'rounds': rounds,
+        'team1_hp': team1_hp,
+        'team2_hp': team2_hp
+    }
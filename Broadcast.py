@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battle Chess Broadcast - Phát trực tiếp trận đấu theo từng round cho người chơi và người xem
+Nhóm 13
+"""
+
+import time
+import heapq
+import itertools
+import threading
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from Protocol import encode_message
+
+DEFAULT_MAX_PENDING = 256 * 1024  # byte tồn đọng tối đa của một người xem
+
+class MatchChannel:
+    """Một trận đấu đang được phát: hai người chơi và những người xem đăng ký theo match_id"""
+    
+    def __init__(self, match_id: str, players: List[Tuple[str, Any]], teams: Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]):
+        self.match_id = match_id
+        self.players = dict(players)  # {client_id: socket}
+        self.spectators = {}  # {client_id: socket}
+        self.teams = teams
+        self.round = 0
+        self.rounds = None  # iterator (round, sự kiện), có khi kết quả trận đấu sẵn sàng
+        self.winner = None
+        self.finish = None
+    
+    def info(self) -> Dict[str, Any]:
+        return {'match_id': self.match_id, 'players': list(self.players), 'round': self.round}
+
+class Broadcaster:
+    """Phát các round của trận đấu trên một luồng riêng.
+    
+    Mỗi tin nhắn chỉ được mã hóa một lần cho mỗi định dạng rồi gửi chung cho mọi người nhận.
+    Việc gửi không bao giờ chặn: dữ liệu chưa gửi được nằm trong hàng đợi của từng socket
+    (write_nowait), người xem có quá max_pending byte tồn đọng bị ngắt khỏi kênh nên một người xem
+    chậm không làm trận đấu (và người xem khác) phải chờ. Người chơi chỉ bị giới hạn bởi hàng đợi gửi
+    của kết nối (--send-queue-limit).
+    
+    interval: số giây giữa hai round (0 = phát liên tục).
+    """
+    
+    def __init__(self, interval: float = 0.0, max_pending: int = DEFAULT_MAX_PENDING,
+                 clock: Callable[[], float] = time.monotonic):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.clock = clock
+        self.channels = {}  # {match_id: MatchChannel}
+        self.watching = {}  # {client_id: match_id} của người xem
+        self._due = []  # heap (thời điểm phát round kế tiếp, thứ tự, match_id)
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.spectators_dropped = 0
+    
+    def open(self, match_id: str, players: List[Tuple[str, Any]], teams) -> MatchChannel:
+        """Mở kênh khi trận đấu bắt đầu để người xem đăng ký được trong lúc chờ kết quả"""
+        channel = MatchChannel(match_id, players, teams)
+        with self._cond:
+            self.channels[match_id] = channel
+        return channel
+    
+    def close(self, match_id: str):
+        with self._cond:
+            channel = self.channels.pop(match_id, None)
+            if channel is not None:
+                for client_id in channel.spectators:
+                    self.watching.pop(client_id, None)
+    
+    def stream(self, match_id: str, rounds, winner: int, finish: Callable[[], None]):
+        """Bắt đầu phát các round (iterable (round, sự kiện)); finish() được gọi sau round cuối"""
+        with self._cond:
+            channel = self.channels[match_id]
+            channel.rounds = iter(rounds)
+            channel.winner = winner
+            channel.finish = finish
+            heapq.heappush(self._due, (self.clock(), next(self._order), match_id))
+            self._ensure_thread()
+            self._cond.notify()
+    
+    def subscribe(self, match_id: str, client_id: str, client_socket) -> Optional[MatchChannel]:
+        with self._cond:
+            channel = self.channels.get(match_id)
+            if channel is None:
+                return None
+            self._unsubscribe(client_id)
+            channel.spectators[client_id] = client_socket
+            self.watching[client_id] = match_id
+            return channel
+    
+    def unsubscribe(self, client_id: str):
+        with self._cond:
+            self._unsubscribe(client_id)
+    
+    def _unsubscribe(self, client_id: str):
+        match_id = self.watching.pop(client_id, None)
+        if match_id in self.channels:
+            self.channels[match_id].spectators.pop(client_id, None)
+    
+    def matches(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            return [channel.info() for channel in self.channels.values()]
+    
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                'channels': len(self.channels),
+                'spectators': len(self.watching),
+                'frames_sent': self.frames_sent,
+                'bytes_sent': self.bytes_sent,
+                'spectators_dropped': self.spectators_dropped
+            }
+    
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='broadcaster')
+            self._thread.daemon = True
+            self._thread.start()
+    
+    def publish(self, channel: MatchChannel, message: Dict[str, Any], players: bool = True):
+        """Gửi một tin nhắn cho người xem (và người chơi) của kênh, mã hóa một lần mỗi định dạng"""
+        frames = {}
+        recipients = list(channel.spectators.items())
+        if players:
+            recipients += [(client_id, sock) for client_id, sock in channel.players.items()]
+    
+        for client_id, client_socket in recipients:
+            key = (client_socket.wire_format, client_socket.codec)
+            frame = frames.get(key)
+            if frame is None:
+                frame = frames[key] = encode_message(message, client_socket.wire_format, client_socket.codec)
+    
+            is_player = client_id in channel.players
+            limit = float('inf') if is_player else self.max_pending
+            try:
+                accepted = client_socket.write_nowait(frame, limit)
+            except OSError:
+                accepted = False
+    
+            if not accepted:
+                if not is_player:
+                    # Người xem quá chậm: ngắt khỏi kênh thay vì để dữ liệu dồn lại không giới hạn
+                    self._unsubscribe(client_id)
+                    self.spectators_dropped += 1
+                continue
+    
+            self.frames_sent += 1
+            self.bytes_sent += len(frame)
+    
+    def _step(self, channel: MatchChannel) -> bool:
+        """Phát round kế tiếp, trả về False khi trận đấu đã phát hết"""
+        next_round = next(channel.rounds, None)
+        if next_round is None:
+            return False
+    
+        channel.round, events = next_round
+        self.publish(channel, {
+            'type': 'battle_round',
+            'match_id': channel.match_id,
+            'round': channel.round,
+            'events': [list(event) for event in events]
+        })
+        return True
+    
+    def _run(self):
+        while True:
+            finished = []
+            with self._cond:
+                now = self.clock()
+                while self._due and self._due[0][0] <= now:
+                    _, _, match_id = heapq.heappop(self._due)
+                    channel = self.channels.get(match_id)
+                    if channel is None:
+                        continue
+                    if self._step(channel):
+                        heapq.heappush(self._due, (now + self.interval, next(self._order), match_id))
+                    else:
+                        finished.append(channel)
+    
+                for channel in finished:
+                    self.publish(channel, {
+                        'type': 'battle_end',
+                        'match_id': channel.match_id,
+                        'winner': channel.winner,
+                        'round': channel.round
+                    }, players=False)
+                    self.channels.pop(channel.match_id, None)
+                    for client_id in channel.spectators:
+                        self.watching.pop(client_id, None)
+    
+            # Kết quả trận đấu cho người chơi gửi ngoài khóa để không giữ khóa trong lúc gửi
+            for channel in finished:
+                try:
+                    channel.finish()
+                except Exception as e:
+                    print(f"❌ Lỗi khi kết thúc trận {channel.match_id}: {e}")
+    
+            with self._cond:
+                if finished:
+                    continue
+                timeout = None
+                if self._due:
+                    timeout = max(self._due[0][0] - self.clock(), 0.0)
+                if timeout is None or timeout > 0:
+                    self._cond.wait(timeout)
@@ -1,307 +1,575 @@
-﻿#!/usr/bin/env python3
-# -*- coding: utf-8 -*-
-"""
-Battle Chess Client - Game Client
-Nhóm 13
-"""
-
-import socket
-import json
-import threading
-import time
-from typing import List, Dict, Any
-
-class GameClient:
-    
-    def __init__(self, host='localhost', port=8888):
-        self.host = host
-        self.port = port
-        self.socket = None
-        self.connected = False
-        self.available_champions = []
-        self.selected_team = []
-        self.in_battle = False
-    
-    def connect_to_server(self):
-        try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.connect((self.host, self.port))
-            self.connected = True
-            
-            print(f"✅ Đã kết nối đến server {self.host}:{self.port}")
-            
-            receive_thread = threading.Thread(target=self.receive_messages)
-            receive_thread.daemon = True
-            receive_thread.start()
-            
-            return True
-            
-        except Exception as e:
-            print(f"❌ Không thể kết nối đến server: {e}")
-            return False
-    
-    def receive_messages(self):
-        while self.connected:
-            try:
-                data = self.socket.recv(4096)
-                if not data:
-                    break
-                
-                message = json.loads(data.decode('utf-8'))
-                self.handle_server_message(message)
-                
-            except Exception as e:
-                if self.connected:
-                    print(f"❌ Lỗi khi nhận tin nhắn: {e}")
-                    print(f"❌ Lỗi khi nhận tin nhắn: {data}")
-                break
-        
-        self.connected = False
-        print("🔌 Kết nối đã bị ngắt")
-    
-    def handle_server_message(self, message: Dict[str, Any]):
-        """Xử lý tin nhắn từ server"""
-        msg_type = message.get('type')
-        
-        if msg_type == 'welcome':
-            self.handle_welcome(message)
-        elif msg_type == 'team_confirmed':
-            self.handle_team_confirmed(message)
-        elif msg_type == 'waiting':
-            self.handle_waiting(message)
-        elif msg_type == 'battle_start':
-            self.handle_battle_start(message)
-        elif msg_type == 'battle_result':
-            self.handle_battle_result(message)
-        elif msg_type == 'error':
-            self.handle_error(message)
-        else:
-            print(f"📩 Tin nhắn từ server: {message}")
-    
-    def handle_welcome(self, message: Dict[str, Any]):
-        print(f"🎉 {message['message']}")
-        self.available_champions = message['champions']
-    def handle_team_confirmed(self, message: Dict[str, Any]):
-        print(f"✅ {message['message']}")
-        self.show_team_info(message['team'])
-        
-    def handle_waiting(self, message: Dict[str, Any]):
-        print(f"⏳ {message['message']}")
-    
-    def handle_battle_start(self, message: Dict[str, Any]):
-        self.in_battle = True
-        print(f"\n⚔️ {message['message']}")
-        print("\n=== ĐỘI HÌNH CỦA BẠN ===")
-        self.show_team_info(message['your_team'])
-        print("\n=== ĐỘI HÌNH ĐỐI THỦ ===")
-        self.show_team_info(message['enemy_team'])
-        print("\n🎬 Trận đấu đang diễn ra...")
-    
-    def handle_battle_result(self, message: Dict[str, Any]):
-        self.in_battle = False
-        result = message['your_result']
-        
-        print("\n" + "="*50)
-        print("🏆 KẾT QUẢ TRẬN ĐẤU 🏆")
-        print("="*50)
-        
-        if result == 'win':
-            print("🎉 BẠN THẮNG! 🎉")
-        elif result == 'lose':
-            print("😭 BẠN THUA! 😭")
-        else:
-            print("🤝 HÒA! 🤝")
-        
-        print("\n📜 LOG TRẬN ĐẤU:")
-        for log_line in message['battle_log']:
-            print(log_line)
-        
-        print("\n=== TRẠNG THÁI CUỐI TRẬN ===")
-        print("Đội của bạn:")
-        self.show_team_info(message['your_team_final'])
-        print("\nĐội đối thủ:")
-        self.show_team_info(message['enemy_team_final'])
-        
-        print("\n" + "="*50)
-        self.show_main_menu()
-    
-    def handle_error(self, message: Dict[str, Any]):
-        print(f"❌ Lỗi: {message['message']}")
-    
-    def show_main_menu(self):
-        print("\n1. Xem danh sách tướng")
-        print("2. Chọn đội hình (4 tướng)")
-        print("3. Sẵn sàng chiến đấu")
-        print("4. Thoát")
-    
-    def show_champions_list(self):
-        print("\n📋 DANH SÁCH TƯỚNG CÓ SẴN:")
-        print("-" * 60)
-        print(f"{'STT':<3} {'Tên':<12} {'HP':<4} {'DMG':<4} {'Range':<6} {'Mô tả'}")
-        print("-" * 60)
-        
-        for i, champion in enumerate(self.available_champions, 1):
-            description = self.get_champion_description(champion)
-            print(f"{i:<3} {champion['name']:<12} {champion['hp']:<4} {champion['dmg']:<4} {champion['range']:<6} {description}")
-        print("-" * 60)
-    
-    def get_champion_description(self, champion: Dict[str, Any]) -> str:
-        descriptions = {
-            'Warrior': 'Front line, High DMG',
-            'Mage': 'Back line, High magic DMG, Low HP',
-            'Archer': 'Back line, High DMG, Low HP',
-            'Tank': 'Front line, Low DMG. High HP',
-            'Assassin': 'Front line, High DMG, Low HP',
-            'Healer': 'Back line, Low DMG, Low HP',
-            'Knight': 'Front line, Balance',
-            'Wizard': 'Back line, Magic DMG, Low HP'
-        }
-        return descriptions.get(champion['name'], 'Tướng đặc biệt')
-    
-    def select_team(self):
-        print("\n🎯 CHỌN ĐỘI HÌNH (4 tướng)")
-        print("Nhập số thứ tự của 4 tướng (cách nhau bởi dấu cách)")
-        print("Ví dụ: 1 3 5 7")
-        
-        self.show_champions_list()
-        
-        while True:
-            try:
-                input_str = input("\nNhập đội hình: ").strip()
-                if not input_str:
-                    print("❌ Vui lòng nhập lựa chọn!")
-                    continue
-            
-                indices = [int(x) - 1 for x in input_str.split()]
-            
-                if len(indices) != 4:
-                    print("❌ Bạn phải chọn đúng 4 tướng!")
-                    continue
-            
-                if any(i < 0 or i >= len(self.available_champions) for i in indices):
-                    print("❌ Số thứ tự không hợp lệ!")
-                    continue
-            
-                selected_names = [self.available_champions[i]['name'] for i in indices]
-                self.selected_team = selected_names
-            
-                print(f"✅ Đã chọn: {', '.join(selected_names)}")
-            
-                message = {
-                    'type': 'select_team',
-                    'team': selected_names
-                }
-                self.send_message(message)
-            
-            except ValueError:
-                print("❌ Vui lòng nhập số hợp lệ!")
-            except Exception as e:
-                print(f"❌ Lỗi: {e}")
-            time.sleep(3)
-            break
-    def ready_to_battle(self):
-        if not self.selected_team:
-            print("❌ Bạn chưa chọn đội hình!")
-            return
-        
-        message = {
-            'type': 'ready_to_battle'
-        }
-        self.send_message(message)
-        print("⏳ Đang tìm đối thủ...")
-    
-    def show_team_info(self, team: List[Dict[str, Any]]):
-        """Hiển thị thông tin đội hình"""
-        print("-" * 50)
-        for i, champion in enumerate(team, 1):
-            status = "💀" if not champion['alive'] else "❤️"
-            print(f"{i}. {champion['name']:<12} - HP: {champion['hp']:>2}/{champion['max_hp']:<2} | DMG: {champion['dmg']:>2} | Range: {champion['range']} {status}")
-        print("-" * 50)
-    
-    def send_message(self, message: Dict[str, Any]):
-        """Gửi tin nhắn đến server"""
-        try:
-            data = json.dumps(message, ensure_ascii=False)
-            self.socket.send(data.encode('utf-8'))
-        except Exception as e:
-            print(f"❌ Lỗi khi gửi tin nhắn: {e}")
-    
-    def disconnect(self):
-        """Ngắt kết nối"""
-        self.connected = False
-        if self.socket:
-            try:
-                self.socket.close()
-            except:
-                pass
-        print("👋 Đã ngắt kết nối")
-    
-    def run(self):
-        """Chạy client"""
-        if not self.connect_to_server():
-            return
-        
-        try:
-            while self.connected:
-
-                if self.in_battle:
-                    time.sleep(1)
-                    continue
-
-                try:
-                    time.sleep(1)
-                    self.show_main_menu()
-                    choice = input("\nNhập lựa chọn (1-4): ").strip()
-                    
-                    if choice == '1':
-                        self.show_champions_list()
-                    elif choice == '2':
-                        self.select_team()
-                    elif choice == '3':
-                        self.ready_to_battle()
-                    elif choice == '4':
-                        print("👋 Tạm biệt!")
-                        break
-                    else:
-                        print("❌ Lựa chọn không hợp lệ!")
-                
-                except EOFError:
-                    break
-                except KeyboardInterrupt:
-                    break
-                except Exception as e:
-                    print(f"❌ Lỗi: {e}")
-        
-        finally:
-            self.disconnect()
-
-def main():
-    print("🎮 Battle Chess Client")
-    print("Nhập địa chỉ server (Enter để dùng localhost:8888):")
-    
-    try:
-        server_input = input("Server (host:port): ").strip()
-        
-        if server_input:
-            if ':' in server_input:
-                host, port = server_input.split(':', 1)
-                port = int(port)
-            else:
-                host = server_input
-                port = 8888
-        else:
-            host = 'localhost'
-            port = 8888
-        
-        client = GameClient(host, port)
-        client.run()
-        
-    except ValueError:
-        print("❌ Port không hợp lệ!")
-    except KeyboardInterrupt:
-        print("\n👋 Tạm biệt!")
-    except Exception as e:
-        print(f"❌ Lỗi: {e}")
-
-if __name__ == "__main__":
-    main()
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battle Chess Client - Game Client
+Nhóm 13
+"""
+
+import socket
+import threading
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional
+
+from Protocol import FrameDecoder, BinaryCodec, encode_message, decode_message
+
+REPLY_TIMEOUT = 10.0  # giây chờ tối đa welcome, team_confirmed, danh sách trận
+RECONNECT_ATTEMPTS = 5  # số lần thử kết nối lại (và resume phiên) khi mất kết nối
+RECONNECT_DELAY = 2.0
+
+class PendingReply:
+    """Tin nhắn trả lời mà luồng giao diện đang chờ; luồng nhận tin nhắn đánh thức khi có trả lời"""
+    
+    def __init__(self, reply_type: str):
+        self.reply_type = reply_type
+        self.message = None
+        self.event = threading.Event()
+    
+    def resolve(self, message: Optional[Dict[str, Any]]):
+        self.message = message
+        self.event.set()
+    
+    def wait(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Trả về tin nhắn trả lời, tin nhắn 'error', hoặc None nếu hết giờ/mất kết nối"""
+        self.event.wait(timeout)
+        return self.message
+
+class GameClient:
+    
+    def __init__(self, host='localhost', port=8888, wire_format='binary', compression='zlib'):
+        self.host = host
+        self.port = port
+        self.wire_format = wire_format  # định dạng muốn dùng, nếu server hỗ trợ
+        self.compression = compression  # kiểu nén muốn dùng cho tin nhắn lớn, nếu server hỗ trợ
+        self.socket = None
+        self.decoder = FrameDecoder()
+        self.send_format = 'json'
+        self.codec = None
+        self.send_lock = threading.Lock()
+        self.connected = False
+        self.available_champions = []
+        self.selected_team = []
+        self.auto_mode = False  # đang tự động đấu liên tục: chỉ in một dòng cho mỗi trận
+        self.pending = deque()  # [PendingReply] theo thứ tự gửi yêu cầu
+        self.pending_lock = threading.Lock()
+        self.live_teams = None  # (team 1, team 2) của trận đang xem/đang đấu, để hiển thị từng round
+        self.session = None  # token của phiên, dùng để resume khi kết nối lại
+        self.new_session = None  # phiên của kết nối mới, dùng nếu không resume được phiên cũ
+        self.resuming = False
+        self.last_result_id = None  # match_id của battle_result gần nhất (server gửi lại khi resume)
+    
+    def connect_to_server(self):
+        try:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            # Tin nhắn yêu cầu rất nhỏ: tắt Nagle để không bị trễ chờ ACK khi đấu liên tục
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.socket.connect((self.host, self.port))
+            self.connected = True
+            
+            print(f"✅ Đã kết nối đến server {self.host}:{self.port}")
+            
+            welcome = self.expect('welcome')
+            receive_thread = threading.Thread(target=self.receive_messages)
+            receive_thread.daemon = True
+            receive_thread.start()
+            
+            if welcome.wait(REPLY_TIMEOUT) is None:
+                print("❌ Server không gửi lời chào")
+                return False
+            return True
+            
+        except Exception as e:
+            print(f"❌ Không thể kết nối đến server: {e}")
+            return False
+    
+    def receive_messages(self):
+        # Mất kết nối mà người dùng chưa thoát: kết nối lại và resume phiên cũ
+        while self.receive_until_closed() and self.session and self.reconnect():
+            pass
+        
+        self.connected = False
+        # Đánh thức mọi yêu cầu đang chờ trả lời
+        self.wake_pending()
+        print("🔌 Kết nối đã bị ngắt")
+    
+    def receive_until_closed(self) -> bool:
+        """Nhận tin nhắn đến khi kết nối đóng; True nếu kết nối bị mất (không phải do disconnect())"""
+        decoder = self.decoder
+        data = b''
+        while self.connected:
+            try:
+                data = self.socket.recv(4096)
+                if not data:
+                    break
+                
+                decoder.feed(data)
+                for frame in decoder:
+                    message = decode_message(frame, decoder.wire_format, self.codec)
+                    self.handle_server_message(message)
+                
+            except Exception as e:
+                if self.connected:
+                    print(f"❌ Lỗi khi nhận tin nhắn: {e}")
+                    print(f"❌ Lỗi khi nhận tin nhắn: {data}")
+                break
+        return self.connected
+    
+    def reconnect(self) -> bool:
+        """Mở kết nối mới; handle_welcome gửi resume với token của phiên cũ"""
+        for attempt in range(1, RECONNECT_ATTEMPTS + 1):
+            print(f"🔄 Mất kết nối, đang kết nối lại ({attempt}/{RECONNECT_ATTEMPTS})...")
+            time.sleep(RECONNECT_DELAY)
+            if not self.connected:
+                return False
+            try:
+                sock = socket.create_connection((self.host, self.port), REPLY_TIMEOUT)
+            except OSError:
+                continue
+            sock.settimeout(None)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.send_lock:
+                self.socket.close()
+                self.socket = sock
+                self.decoder = FrameDecoder()
+                self.send_format = 'json'
+                self.codec = None
+            self.resuming = True
+            return True
+        return False
+    
+    def wake_pending(self):
+        with self.pending_lock:
+            pending, self.pending = self.pending, deque()
+        for reply in pending:
+            reply.resolve(None)
+    
+    def handle_server_message(self, message: Dict[str, Any]):
+        """Xử lý tin nhắn từ server"""
+        msg_type = message.get('type')
+        
+        if msg_type == 'battle_result' and message.get('match_id') == self.last_result_id:
+            return  # kết quả đã nhận, server gửi lại khi resume
+        
+        if msg_type == 'welcome':
+            self.handle_welcome(message)
+        elif msg_type == 'ping':
+            self.send_message({'type': 'pong'})
+        elif msg_type == 'resumed':
+            self.handle_resumed(message)
+        elif msg_type == 'format_changed':
+            # Mọi khung sau format_changed dùng định dạng mới
+            self.decoder.wire_format = message['format']
+        elif msg_type == 'compression_changed':
+            pass  # FrameDecoder tự nhận ra và giải nén khung nén
+        elif msg_type == 'team_confirmed':
+            self.handle_team_confirmed(message)
+        elif msg_type == 'waiting':
+            self.handle_waiting(message)
+        elif msg_type == 'battle_start':
+            self.handle_battle_start(message)
+        elif msg_type == 'battle_result':
+            self.handle_battle_result(message)
+        elif msg_type == 'battle_round':
+            self.handle_battle_round(message)
+        elif msg_type == 'spectating':
+            self.handle_spectating(message)
+        elif msg_type == 'battle_end':
+            self.handle_battle_end(message)
+        elif msg_type == 'matches':
+            self.handle_matches(message)
+        elif msg_type == 'error':
+            if self.resuming:
+                self.handle_resume_failed()
+            self.handle_error(message)
+        else:
+            print(f"📩 Tin nhắn từ server: {message}")
+        
+        self.resolve_pending(message)
+    
+    def expect(self, reply_type: str) -> PendingReply:
+        """Đăng ký chờ tin nhắn loại reply_type; gọi trước khi gửi yêu cầu"""
+        reply = PendingReply(reply_type)
+        with self.pending_lock:
+            self.pending.append(reply)
+        return reply
+    
+    def resolve_pending(self, message: Dict[str, Any]):
+        """Server trả lời theo thứ tự yêu cầu nên tin nhắn 'error' thuộc về yêu cầu cũ nhất đang chờ"""
+        msg_type = message.get('type')
+        with self.pending_lock:
+            for i, reply in enumerate(self.pending):
+                if msg_type == 'error' or reply.reply_type == msg_type:
+                    del self.pending[i]
+                    break
+            else:
+                return
+        reply.resolve(message)
+    
+    def request(self, message: Dict[str, Any], reply_type: str,
+                timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Gửi yêu cầu và chờ tin nhắn trả lời (hoặc 'error'); None nếu hết giờ hay mất kết nối"""
+        reply = self.expect(reply_type)
+        self.send_message(message)
+        message = reply.wait(timeout)
+        if message is None:
+            with self.pending_lock:
+                if reply in self.pending:
+                    self.pending.remove(reply)
+        return message
+    
+    def handle_welcome(self, message: Dict[str, Any]):
+        print(f"🎉 {message['message']}")
+        self.available_champions = message['champions']
+        if self.wire_format != 'json' and self.wire_format in message.get('formats', []):
+            self.request_format(self.wire_format)
+        if self.compression and self.compression in message.get('compression', []):
+            self.send_message({'type': 'set_compression', 'compression': self.compression})
+        if self.resuming:
+            self.new_session = message.get('session')
+            self.send_message({'type': 'resume', 'session': self.session})
+        else:
+            self.session = message.get('session')
+    
+    def handle_resumed(self, message: Dict[str, Any]):
+        """Server trả lại đội hình và trạng thái của phiên cũ; battle_result còn chờ (nếu có) đến ngay sau"""
+        self.resuming = False
+        self.selected_team = [c['name'] for c in message['team']]
+        state = {'queued': 'đang chờ đối thủ', 'in_battle': 'trận đấu đang diễn ra'}.get(message['state'])
+        print(f"🔁 Đã kết nối lại phiên {message['client_id']}" + (f" - {state}" if state else ""))
+        if message['state'] == 'idle' and message.get('pending_result') in (None, self.last_result_id):
+            # Không còn trận đấu nào: các yêu cầu gửi trước khi mất kết nối sẽ không được trả lời
+            self.wake_pending()
+    
+    def handle_resume_failed(self):
+        self.resuming = False
+        self.session = self.new_session
+        self.selected_team = []
+        print("⚠️ Phiên cũ đã hết hạn, cần chọn lại đội hình")
+    
+    def request_format(self, wire_format: str):
+        """Đề nghị server đổi định dạng khung; tin nhắn gửi sau set_format dùng định dạng mới"""
+        with self.send_lock:
+            self.codec = BinaryCodec(self.available_champions)
+            self.socket.sendall(encode_message({'type': 'set_format', 'format': wire_format}, self.send_format, self.codec))
+            self.send_format = wire_format
+    
+    def handle_team_confirmed(self, message: Dict[str, Any]):
+        print(f"✅ {message['message']}")
+        self.show_team_info(message['team'])
+        
+    def handle_waiting(self, message: Dict[str, Any]):
+        if not self.auto_mode:
+            print(f"⏳ {message['message']}")
+    
+    def handle_battle_start(self, message: Dict[str, Any]):
+        teams = (message['your_team'], message['enemy_team'])
+        if message.get('side') == 2:
+            teams = teams[::-1]
+        self.live_teams = tuple([dict(c) for c in team] for team in teams)
+        if self.auto_mode:
+            return
+        print(f"\n⚔️ {message['message']}")
+        print("\n=== ĐỘI HÌNH CỦA BẠN ===")
+        self.show_team_info(message['your_team'])
+        print("\n=== ĐỘI HÌNH ĐỐI THỦ ===")
+        self.show_team_info(message['enemy_team'])
+        print("\n🎬 Trận đấu đang diễn ra...")
+    
+    def handle_battle_result(self, message: Dict[str, Any]):
+        result = message['your_result']
+        self.last_result_id = message.get('match_id')
+        
+        if self.auto_mode:
+            icon = {'win': '🎉', 'lose': '😭'}.get(result, '🤝')
+            print(f"{icon} {result.upper()} - điểm {message.get('rating', 0):.0f}")
+            return
+        
+        print("\n" + "="*50)
+        print("🏆 KẾT QUẢ TRẬN ĐẤU 🏆")
+        print("="*50)
+        
+        if result == 'win':
+            print("🎉 BẠN THẮNG! 🎉")
+        elif result == 'lose':
+            print("😭 BẠN THUA! 😭")
+        else:
+            print("🤝 HÒA! 🤝")
+        
+        if message.get('battle_log'):
+            print("\n📜 LOG TRẬN ĐẤU:")
+            for log_line in message['battle_log']:
+                print(log_line)
+        
+        print("\n=== TRẠNG THÁI CUỐI TRẬN ===")
+        print("Đội của bạn:")
+        self.show_team_info(message['your_team_final'])
+        print("\nĐội đối thủ:")
+        self.show_team_info(message['enemy_team_final'])
+        
+        print("\n" + "="*50)
+    
+    def handle_battle_round(self, message: Dict[str, Any]):
+        """Hiển thị một round được phát trực tiếp"""
+        if self.auto_mode:
+            return
+        print(f"--- ROUND {message['round']} ({message['match_id']}) ---")
+        if not self.live_teams:
+            return
+        
+        for side, attacker, target, damage, killed in message['events']:
+            attacker_info = self.live_teams[side - 1][attacker]
+            target_info = self.live_teams[2 - side][target]
+            target_info['hp'] = max(target_info['hp'] - damage, 0)
+            
+            line = f"  [Team {side}] {attacker_info['name']} tấn công {target_info['name']} gây {damage} sát thương"
+            if killed:
+                line += f" - {target_info['name']} đã bị tiêu diệt!"
+            else:
+                line += f" - {target_info['name']} còn {target_info['hp']}/{target_info['max_hp']} HP"
+            print(line)
+    
+    def handle_spectating(self, message: Dict[str, Any]):
+        print(f"👀 Đang xem trận {message['match_id']}: {' vs '.join(message['players'])}")
+        self.live_teams = ([dict(c) for c in message['team1']], [dict(c) for c in message['team2']])
+    
+    def handle_battle_end(self, message: Dict[str, Any]):
+        winner = message['winner']
+        result = f"Team {winner} THẮNG" if winner in (1, 2) else "HÒA"
+        print(f"🏁 Trận {message['match_id']} kết thúc sau {message['round']} round - {result}!")
+        self.live_teams = None
+    
+    def handle_matches(self, message: Dict[str, Any]):
+        if not message['matches']:
+            print("📭 Không có trận đấu nào đang diễn ra")
+            return
+        
+        print("\n📺 TRẬN ĐẤU ĐANG DIỄN RA:")
+        for match in message['matches']:
+            print(f"  {match['match_id']}: {' vs '.join(match['players'])} (round {match['round']})")
+    
+    def handle_error(self, message: Dict[str, Any]):
+        print(f"❌ Lỗi: {message['message']}")
+    
+    def show_main_menu(self):
+        print("\n1. Xem danh sách tướng")
+        print("2. Chọn đội hình (4 tướng)")
+        print("3. Sẵn sàng chiến đấu")
+        print("4. Thoát")
+        print("5. Xem trận đấu đang diễn ra")
+        print("6. Tự động đấu liên tục")
+    
+    def show_champions_list(self):
+        print("\n📋 DANH SÁCH TƯỚNG CÓ SẴN:")
+        print("-" * 60)
+        print(f"{'STT':<3} {'Tên':<12} {'HP':<4} {'DMG':<4} {'Range':<6} {'Mô tả'}")
+        print("-" * 60)
+        
+        for i, champion in enumerate(self.available_champions, 1):
+            description = self.get_champion_description(champion)
+            print(f"{i:<3} {champion['name']:<12} {champion['hp']:<4} {champion['dmg']:<4} {champion['range']:<6} {description}")
+        print("-" * 60)
+    
+    def get_champion_description(self, champion: Dict[str, Any]) -> str:
+        descriptions = {
+            'Warrior': 'Front line, High DMG',
+            'Mage': 'Back line, High magic DMG, Low HP',
+            'Archer': 'Back line, High DMG, Low HP',
+            'Tank': 'Front line, Low DMG. High HP',
+            'Assassin': 'Front line, High DMG, Low HP',
+            'Healer': 'Back line, Low DMG, Low HP',
+            'Knight': 'Front line, Balance',
+            'Wizard': 'Back line, Magic DMG, Low HP'
+        }
+        return descriptions.get(champion['name'], 'Tướng đặc biệt')
+    
+    def select_team(self):
+        print("\n🎯 CHỌN ĐỘI HÌNH (4 tướng)")
+        print("Nhập số thứ tự của 4 tướng (cách nhau bởi dấu cách)")
+        print("Ví dụ: 1 3 5 7")
+        
+        self.show_champions_list()
+        
+        while True:
+            try:
+                input_str = input("\nNhập đội hình: ").strip()
+                if not input_str:
+                    print("❌ Vui lòng nhập lựa chọn!")
+                    continue
+            
+                indices = [int(x) - 1 for x in input_str.split()]
+            
+                if len(indices) != 4:
+                    print("❌ Bạn phải chọn đúng 4 tướng!")
+                    continue
+            
+                if any(i < 0 or i >= len(self.available_champions) for i in indices):
+                    print("❌ Số thứ tự không hợp lệ!")
+                    continue
+            
+                selected_names = [self.available_champions[i]['name'] for i in indices]
+                self.selected_team = selected_names
+            
+                print(f"✅ Đã chọn: {', '.join(selected_names)}")
+            
+                # Gửi ID tướng thay cho tên để tin nhắn gọn hơn
+                message = {
+                    'type': 'select_team',
+                    'team': [self.available_champions[i]['id'] for i in indices]
+                }
+                reply = self.request(message, 'team_confirmed', REPLY_TIMEOUT)
+                if reply is None:
+                    print("❌ Server không xác nhận đội hình")
+                elif reply['type'] == 'error':
+                    self.selected_team = []
+            
+            except ValueError:
+                print("❌ Vui lòng nhập số hợp lệ!")
+            except Exception as e:
+                print(f"❌ Lỗi: {e}")
+            break
+    
+    def ready_to_battle(self, want_log: bool = True) -> Optional[Dict[str, Any]]:
+        """Vào hàng đợi và chờ đến khi có battle_result (hoặc lỗi), trả về tin nhắn đó"""
+        if not self.selected_team:
+            print("❌ Bạn chưa chọn đội hình!")
+            return None
+        
+        message = {
+            'type': 'ready_to_battle',
+            'want_log': want_log
+        }
+        if not self.auto_mode:
+            print("⏳ Đang tìm đối thủ...")
+        return self.request(message, 'battle_result')
+    
+    def auto_battle(self, count: Optional[int] = None):
+        """Vào lại hàng đợi ngay khi nhận battle_result, đấu liên tục count trận (None = đến khi Ctrl+C)"""
+        if not self.selected_team:
+            print("❌ Bạn chưa chọn đội hình!")
+            return
+        
+        tally = {'win': 0, 'lose': 0, 'draw': 0}
+        started = time.perf_counter()
+        self.auto_mode = True
+        print("🔁 Tự động đấu liên tục (Ctrl+C để dừng)...")
+        try:
+            while self.connected and (count is None or sum(tally.values()) < count):
+                reply = self.ready_to_battle(want_log=False)
+                if reply is None or reply['type'] != 'battle_result':
+                    break
+                tally[reply['your_result']] += 1
+        except KeyboardInterrupt:
+            print("\n⏹️ Dừng tự động đấu")
+        finally:
+            self.auto_mode = False
+        
+        played = sum(tally.values())
+        elapsed = time.perf_counter() - started
+        print(f"📊 {played} trận trong {elapsed:.1f}s: thắng {tally['win']}, thua {tally['lose']}, hòa {tally['draw']}")
+    
+    def spectate(self):
+        reply = self.request({'type': 'list_matches'}, 'matches', REPLY_TIMEOUT)
+        if reply is None or not reply.get('matches'):
+            return
+        
+        match_id = input("\nNhập mã trận muốn xem (Enter để bỏ qua): ").strip()
+        if match_id:
+            self.send_message({'type': 'spectate', 'match_id': match_id})
+    
+    def show_team_info(self, team: List[Dict[str, Any]]):
+        """Hiển thị thông tin đội hình"""
+        print("-" * 50)
+        for i, champion in enumerate(team, 1):
+            status = "💀" if not champion['alive'] else "❤️"
+            print(f"{i}. {champion['name']:<12} - HP: {champion['hp']:>2}/{champion['max_hp']:<2} | DMG: {champion['dmg']:>2} | Range: {champion['range']} {status}")
+        print("-" * 50)
+    
+    def send_message(self, message: Dict[str, Any]):
+        """Gửi tin nhắn đến server"""
+        try:
+            with self.send_lock:
+                self.socket.sendall(encode_message(message, self.send_format, self.codec, ensure_ascii=False))
+        except Exception as e:
+            print(f"❌ Lỗi khi gửi tin nhắn: {e}")
+    
+    def disconnect(self):
+        """Ngắt kết nối"""
+        if self.connected and self.socket:
+            # Báo server đây là thoát chủ động để không bị giữ phiên và chỗ trong hàng đợi
+            self.send_message({'type': 'leave'})
+        self.connected = False
+        if self.socket:
+            try:
+                self.socket.close()
+            except:
+                pass
+        print("👋 Đã ngắt kết nối")
+    
+    def run(self):
+        """Chạy client"""
+        if not self.connect_to_server():
+            return
+        
+        try:
+            while self.connected:
+                try:
+                    self.show_main_menu()
+                    choice = input("\nNhập lựa chọn (1-6): ").strip()
+                    
+                    if choice == '1':
+                        self.show_champions_list()
+                    elif choice == '2':
+                        self.select_team()
+                    elif choice == '3':
+                        self.ready_to_battle()
+                    elif choice == '4':
+                        print("👋 Tạm biệt!")
+                        break
+                    elif choice == '5':
+                        self.spectate()
+                    elif choice == '6':
+                        count = input("Số trận (Enter = đấu đến khi nhấn Ctrl+C): ").strip()
+                        self.auto_battle(int(count) if count else None)
+                    else:
+                        print("❌ Lựa chọn không hợp lệ!")
+                
+                except EOFError:
+                    break
+                except KeyboardInterrupt:
+                    break
+                except Exception as e:
+                    print(f"❌ Lỗi: {e}")
+        
+        finally:
+            self.disconnect()
+
+def main():
+    print("🎮 Battle Chess Client")
+    print("Nhập địa chỉ server (Enter để dùng localhost:8888):")
+    
+    try:
+        server_input = input("Server (host:port): ").strip()
+        
+        if server_input:
+            if ':' in server_input:
+                host, port = server_input.split(':', 1)
+                port = int(port)
+            else:
+                host = server_input
+                port = 8888
+        else:
+            host = 'localhost'
+            port = 8888
+        
+        client = GameClient(host, port)
+        client.run()
+        
+    except ValueError:
+        print("❌ Port không hợp lệ!")
+    except KeyboardInterrupt:
+        print("\n👋 Tạm biệt!")
+    except Exception as e:
+        print(f"❌ Lỗi: {e}")
+
+if __name__ == "__main__":
+    main()
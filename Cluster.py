@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battle Chess Cluster - Chạy server trên nhiều tiến trình worker cùng nghe một cổng
+Nhóm 13
+
+Một tiến trình GameServer chỉ dùng được một core (GIL) cho phần JSON và mô phỏng. Launcher này
+chạy N tiến trình worker cùng bind một cổng với SO_REUSEPORT (kernel chia kết nối mới cho các
+worker) và một tiến trình broker ghép trận chung qua Unix socket:
+
+- ready_to_battle được chuyển cho broker; broker giữ hàng đợi ghép trận và điểm Elo cho mọi worker
+- khi ghép được cặp, worker của người chơi 1 mô phỏng trận đấu. Người chơi 2 ở worker khác được
+  đại diện bằng RemoteClientSocket: battle_start, các round phát trực tiếp và battle_result vẫn được
+  mã hóa như bình thường rồi broker chuyển nguyên khung tới worker đang giữ kết nối của người đó
+- worker báo điểm Elo mới cho broker sau mỗi trận
+
+Chạy:  python Cluster.py --workers 4 --port 8888 --backend async
+Đo:    python benchmarks/bench_cluster.py --workers 1,2,4
+"""
+
+import os
+import sys
+import time
+import queue
+import shutil
+import signal
+import socket
+import tempfile
+import itertools
+import threading
+import multiprocessing
+from multiprocessing.connection import Listener, Client
+from typing import Dict, Any, Tuple
+
+from Matchmaking import MATCHMAKERS, EloRatings
+
+class RemoteClientSocket:
+    """Người chơi đang kết nối tới worker khác: khung tin nhắn đã mã hóa được chuyển qua broker"""
+    
+    def __init__(self, link: 'BrokerLink', worker_id: int, client_id: str, wire_format: str, codec,
+                 compression=None):
+        self.link = link
+        self.worker_id = worker_id
+        self.client_id = client_id
+        self.wire_format = wire_format
+        self.codec = codec
+        self.compression = compression
+    
+    def sendall(self, data: bytes):
+        self.link.forward(self.worker_id, self.client_id, bytes(data))
+    
+    def sendmsg(self, buffers):
+        self.sendall(b''.join(buffers))
+    
+    def write_nowait(self, data: bytes, limit: float) -> bool:
+        # Worker giữ kết nối thật tự lo việc đẩy dữ liệu; broker không giữ lại khung nào
+        self.sendall(data)
+        return True
+    
+    def pending_bytes(self) -> int:
+        return 0
+    
+    def close(self):
+        pass
+
+class BrokerLink:
+    """Kết nối từ một worker (GameServer) tới broker"""
+    
+    def __init__(self, server, address: str, authkey: bytes):
+        self.server = server
+        self.worker_id = server.worker_id
+        self.forwarded = 0
+        self._conn = Client(address, family='AF_UNIX', authkey=authkey)
+        self._lock = threading.Lock()
+        self.send(('hello', self.worker_id))
+    
+        thread = threading.Thread(target=self.receive_loop, name='broker-link')
+        thread.daemon = True
+        thread.start()
+    
+    def send(self, message: tuple):
+        try:
+            with self._lock:
+                self._conn.send(message)
+        except OSError as e:
+            print(f"❌ Lỗi khi gửi tới broker: {e}")
+    
+    def client_info(self, client_id: str) -> Dict[str, Any]:
+        """Những gì worker khác cần để mô phỏng và gửi tin nhắn cho người chơi này"""
+        client = self.server.clients[client_id]
+        return {
+            'client_id': client_id,
+            'worker': self.worker_id,
+            'player': client.get('player', client_id),
+            'team': [c.name for c in client['team']],
+            'team_snapshot': client['team_snapshot'],
+            'want_log': client.get('want_log', True),
+            'wire_format': client['socket'].wire_format,
+            'compression': client['socket'].compression
+        }
+    
+    def enqueue(self, client_id: str):
+        self.send(('ready', self.client_info(client_id)))
+    
+    def client_gone(self, client_id: str):
+        self.send(('gone', client_id))
+    
+    def forward(self, worker_id: int, client_id: str, data: bytes):
+        self.forwarded += len(data)
+        self.send(('frame', worker_id, client_id, data))
+    
+    def report_ratings(self, *ratings: Tuple[str, float]):
+        self.send(('ratings', ratings))
+    
+    def release(self, *client_ids: str):
+        """Bỏ các người chơi ở worker khác sau khi trận đấu của họ kết thúc"""
+        for client_id in client_ids:
+            client = self.server.clients.get(client_id)
+            if client is not None and isinstance(client['socket'], RemoteClientSocket):
+                del self.server.clients[client_id]
+    
+    def remote_client(self, info: Dict[str, Any]) -> Dict[str, Any]:
+        server = self.server
+        codec = server.codec if info['wire_format'] == 'binary' else None
+        return {
+            'socket': RemoteClientSocket(self, info['worker'], info['client_id'], info['wire_format'], codec,
+                                         info['compression']),
+            'decoder': None,
+            'team': [server.create_champion(name) for name in info['team']],
+            'team_snapshot': info['team_snapshot'],
+            'want_log': info['want_log'],
+            'player': info['player']
+        }
+    
+    def receive_loop(self):
+        while True:
+            try:
+                message = self._conn.recv()
+            except (EOFError, OSError):
+                print("❌ Mất kết nối tới broker")
+                return
+    
+            try:
+                kind = message[0]
+                if kind == 'frame':
+                    self.deliver(*message[1:])
+                elif kind == 'waiting':
+                    self.waiting(*message[1:])
+                elif kind == 'battle':
+                    self.start_match(*message[1:])
+            except Exception as e:
+                print(f"❌ Lỗi khi xử lý tin nhắn {message[0]} từ broker: {e}")
+    
+    def deliver(self, client_id: str, data: bytes):
+        """Khung tin nhắn do worker khác mã hóa cho người chơi đang kết nối tới worker này"""
+        client = self.server.clients.get(client_id)
+        if client is None:
+            return  # người chơi đã ngắt kết nối
+        try:
+            client['socket'].sendall(data)
+        except OSError:
+            print("Lỗi khi gửi tin nhắn")
+    
+    def waiting(self, client_id: str, depth: int):
+        client = self.server.clients.get(client_id)
+        if client is not None:
+            self.server.send_message(client['socket'], {
+                'type': 'waiting',
+                'message': f'Đang chờ đối thủ... ({depth}/2)'
+            })
+    
+    def start_match(self, match_id: str, info1: Dict[str, Any], info2: Dict[str, Any],
+                    rating1: float, rating2: float):
+        """Broker giao trận đấu cho worker của người chơi 1"""
+        server = self.server
+        server.ratings.set(info1['player'], rating1)
+        server.ratings.set(info2['player'], rating2)
+    
+        local = [info for info in (info1, info2) if info['worker'] == self.worker_id]
+        if any(info['client_id'] not in server.clients for info in local):
+            # Có người ngắt kết nối trước khi trận bắt đầu: đưa người còn lại về hàng đợi
+            for info in (info1, info2):
+                if info['worker'] != self.worker_id or info['client_id'] in server.clients:
+                    self.send(('requeue', info))
+            return
+    
+        if info2['worker'] != self.worker_id:
+            server.clients[info2['client_id']] = self.remote_client(info2)
+        server.start_battle(info1['client_id'], info2['client_id'], match_id)
+
+class MatchBroker:
+    """Tiến trình ghép trận chung: hàng đợi, điểm Elo và chuyển tin nhắn giữa các worker"""
+    
+    def __init__(self, address: str, authkey: bytes, matchmaking: str = 'fifo'):
+        self.listener = Listener(address, family='AF_UNIX', authkey=authkey)
+        self.matchmaking_mode = matchmaking
+        self.matchmaking = MATCHMAKERS[matchmaking]()
+        self.ratings = EloRatings()
+        self.match_ids = itertools.count(1)
+        # Mỗi worker có hàng đợi gửi và luồng gửi riêng: luồng đọc của broker không bao giờ bị chặn
+        # khi gửi, nên worker đang chờ gửi cho broker không thể làm kẹt cả hai phía
+        self.workers = {}   # {worker_id: hàng đợi tin nhắn gửi cho worker}
+        self.online = {}    # {client_id: worker_id} của người chơi đã từng sẵn sàng và chưa ngắt kết nối
+        self.waiting = {}   # {client_id: client_info} của người đang trong hàng đợi
+        self.matches = 0
+        self.forwarded_frames = 0
+        self._lock = threading.Lock()
+    
+    def serve_forever(self):
+        if self.matchmaking_mode != 'fifo':
+            thread = threading.Thread(target=self.poll_loop, name='matchmaker')
+            thread.daemon = True
+            thread.start()
+    
+        while True:
+            conn = self.listener.accept()
+            thread = threading.Thread(target=self.handle_worker, args=(conn,))
+            thread.daemon = True
+            thread.start()
+    
+    def poll_loop(self, interval: float = 0.25):
+        while True:
+            time.sleep(interval)
+            for pair in self.matchmaking.poll():
+                with self._lock:
+                    self.start_match(*pair)
+    
+    def send_to(self, worker_id: int, message: tuple):
+        outbox = self.workers.get(worker_id)
+        if outbox is not None:
+            outbox.put(message)
+    
+    @staticmethod
+    def send_loop(conn, outbox: queue.Queue):
+        while True:
+            message = outbox.get()
+            if message is None:
+                return
+            try:
+                conn.send(message)
+            except OSError:
+                return
+    
+    def handle_worker(self, conn):
+        worker_id = None
+        try:
+            kind, worker_id = conn.recv()
+            if kind != 'hello':
+                return
+            outbox = self.workers[worker_id] = queue.Queue()
+            sender = threading.Thread(target=self.send_loop, args=(conn, outbox))
+            sender.daemon = True
+            sender.start()
+            print(f"✅ Worker {worker_id} đã kết nối tới broker")
+    
+            while True:
+                message = conn.recv()
+                kind = message[0]
+                if kind == 'frame':
+                    _, target, client_id, data = message
+                    self.forwarded_frames += 1
+                    self.send_to(target, ('frame', client_id, data))
+                elif kind == 'ready':
+                    self.enqueue(message[1])
+                elif kind == 'requeue':
+                    self.enqueue(message[1], requeue=True)
+                elif kind == 'gone':
+                    self.remove(message[1])
+                elif kind == 'ratings':
+                    for player, rating in message[1]:
+                        self.ratings.set(player, rating)
+        except (EOFError, OSError):
+            pass
+        finally:
+            if worker_id is not None:
+                outbox = self.workers.pop(worker_id, None)
+                if outbox is not None:
+                    outbox.put(None)
+                for client_id, owner in list(self.online.items()):
+                    if owner == worker_id:
+                        self.remove(client_id)
+                print(f"❌ Worker {worker_id} đã ngắt kết nối khỏi broker")
+    
+    def enqueue(self, info: Dict[str, Any], requeue: bool = False):
+        client_id = info['client_id']
+        with self._lock:
+            # Người được đưa lại hàng đợi có thể đã ngắt kết nối ở worker của họ
+            if requeue and client_id not in self.online:
+                return
+            self.online[client_id] = info['worker']
+            self.waiting[client_id] = info
+            pair, depth = self.matchmaking.push(client_id, self.ratings.get(info['player']))
+            if not requeue:
+                self.send_to(info['worker'], ('waiting', client_id, depth))
+            if pair is not None:
+                self.start_match(*pair)
+    
+    def remove(self, client_id: str):
+        with self._lock:
+            self.online.pop(client_id, None)
+            self.waiting.pop(client_id, None)
+            self.matchmaking.remove(client_id)
+    
+    def start_match(self, client1_id: str, client2_id: str):
+        """Giao trận cho worker của người chơi 1 (gọi khi đang giữ self._lock)"""
+        info1 = self.waiting.pop(client1_id)
+        info2 = self.waiting.pop(client2_id)
+        self.matches += 1
+        self.send_to(info1['worker'], (
+            'battle', f"match_{next(self.match_ids)}", info1, info2,
+            self.ratings.get(info1['player']), self.ratings.get(info2['player'])
+        ))
+
+def run_broker(address: str, authkey: bytes, matchmaking: str):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # launcher quyết định khi nào dừng
+    broker = MatchBroker(address, authkey, matchmaking)
+    print(f"🤝 Broker ghép trận tại {address}")
+    broker.serve_forever()
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def run_worker(worker_id: int, args, address: str, authkey: bytes):
+    from Server import create_server
+    
+    # Ctrl+C do launcher xử lý; SIGTERM từ launcher dừng worker êm như Ctrl+C khi chạy một tiến trình
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, _interrupt)
+    
+    overrides = {'reuse_port': True, 'worker_id': worker_id, 'broker': (address, authkey)}
+    if args.metrics_port is not None:
+        overrides['metrics_port'] = args.metrics_port + worker_id - 1
+    if args.replays:
+        # Mỗi worker ghi file replay riêng; lịch sử SQLite thì dùng chung được
+        overrides['replay_dir'] = os.path.join(args.replays, f'worker-{worker_id}')
+    
+    server = create_server(args, **overrides)
+    try:
+        server.start_server()
+    except KeyboardInterrupt:
+        pass
+
+def run_cluster(args):
+    context = multiprocessing.get_context('spawn')
+    directory = tempfile.mkdtemp(prefix='battle-chess-')  # chỉ người chạy server đọc/ghi được
+    address = os.path.join(directory, 'broker.sock')
+    authkey = os.urandom(16)
+    
+    broker = context.Process(target=run_broker, args=(address, authkey, args.matchmaking), name='broker')
+    broker.start()
+    for _ in range(200):
+        if os.path.exists(address):
+            break
+        time.sleep(0.05)
+    
+    workers = [context.Process(target=run_worker, args=(i, args, address, authkey), name=f'worker-{i}')
+               for i in range(1, args.workers + 1)]
+    for worker in workers:
+        worker.start()
+    print(f"🎮 Battle Chess Cluster: {args.workers} worker tại {args.host}:{args.port}")
+    
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        print("\n🛑 Đang dừng các worker...")
+    finally:
+        # Ctrl+C lần nữa không được cắt ngang lúc các worker đang ghi nốt dữ liệu
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join(10)
+            if worker.is_alive():
+                worker.kill()
+                worker.join()
+        broker.terminate()
+        broker.join()
+        shutil.rmtree(directory, ignore_errors=True)
+
+def main(argv=None):
+    from Server import build_parser
+    
+    parser = build_parser('Battle Chess Server nhiều tiến trình (SO_REUSEPORT + broker ghép trận)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='số tiến trình worker cùng nghe cổng (mặc định: số core)')
+    args = parser.parse_args(argv)
+    
+    if not hasattr(socket, 'SO_REUSEPORT'):
+        print("❌ Hệ điều hành không hỗ trợ SO_REUSEPORT")
+        return 1
+    run_cluster(args)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
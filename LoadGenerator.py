@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battle Chess Load Generator - Tạo tải cho server bằng hàng nghìn người chơi giả (asyncio)
+Nhóm 13
+
+Mỗi người chơi kết nối, chọn đội hình ngẫu nhiên rồi liên tục gửi ready_to_battle và chờ
+battle_result cho đến hết thời gian chạy. Báo cáo số trận/s, phân vị độ trễ
+(ready_to_battle -> battle_result, gồm cả thời gian chờ ghép trận) và tỉ lệ lỗi.
+
+Chạy: python LoadGenerator.py --players 2000 --duration 30
+     python LoadGenerator.py --start-server --server-args "--backend async" --players 5000
+"""
+
+import os
+import sys
+import time
+import shlex
+import signal
+import socket
+import random
+import asyncio
+import argparse
+import subprocess
+from collections import Counter
+from typing import List
+
+from AsyncClient import AsyncGameClient, ServerError
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+class LoadStats:
+    def __init__(self):
+        self.connected = 0
+        self.connect_latencies = []
+        self.match_latencies = []
+        self.results = Counter()  # win / lose / draw
+        self.errors = Counter()
+        self.requests = 0
+        self.last_result = 0.0
+        self.elapsed = 0.0
+    
+    def error(self, kind: str):
+        self.errors[kind] += 1
+
+async def run_player(index: int, args, stats: LoadStats, deadline: float, rng: random.Random):
+    client = AsyncGameClient(args.host, args.port, args.format, args.want_log, player=f'bot_{index}',
+                             compression=None if args.compression == 'none' else args.compression)
+    loop = asyncio.get_running_loop()
+    
+    try:
+        started = loop.time()
+        try:
+            await asyncio.wait_for(client.connect(), args.timeout)
+        except asyncio.TimeoutError:
+            stats.error('connect_timeout')
+            return
+        except OSError:
+            stats.error('connect')
+            return
+        stats.connected += 1
+        stats.connect_latencies.append(loop.time() - started)
+    
+        team = [rng.randrange(len(client.champions)) for _ in range(4)]
+        stats.requests += 1
+        await asyncio.wait_for(client.select_team(team), args.timeout)
+    
+        while loop.time() < deadline:
+            started = loop.time()
+            stats.requests += 1
+            try:
+                result = await asyncio.wait_for(client.battle(), args.timeout)
+            except asyncio.TimeoutError:
+                stats.error('timeout')
+                continue
+            stats.last_result = loop.time()
+            stats.match_latencies.append(stats.last_result - started)
+            stats.results[result['your_result']] += 1
+    
+    except asyncio.TimeoutError:
+        stats.error('timeout')
+    except ServerError:
+        stats.error('server_error')
+    except (ConnectionError, OSError):
+        stats.error('disconnect')
+    finally:
+        await client.leave()
+
+async def run_load(args) -> LoadStats:
+    stats = LoadStats()
+    rng = random.Random(args.seed)
+    loop = asyncio.get_running_loop()
+    tasks = []
+    
+    # Kết nối dần theo connect_rate để không tràn hàng đợi listen của server
+    started = loop.time()
+    deadline = started + args.duration
+    for i in range(args.players):
+        tasks.append(loop.create_task(run_player(i, args, stats, deadline, rng)))
+        if args.connect_rate > 0:
+            delay = started + (i + 1) / args.connect_rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+    
+    # Hết giờ: chờ các trận đang dở thêm một khoảng rồi hủy những người còn chờ ghép trận
+    await asyncio.sleep(max(deadline - loop.time(), 0))
+    done, pending = await asyncio.wait(tasks, timeout=args.grace)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    
+    # Không tính thời gian chờ những người không còn đối thủ vào throughput
+    stats.elapsed = max(deadline, stats.last_result) - started
+    return stats
+
+def report(args, stats: LoadStats):
+    results = sum(stats.results.values())
+    matches = results / 2  # mỗi trận có hai người chơi giả nhận kết quả
+    errors = sum(stats.errors.values())
+    
+    print(f"👥 Người chơi: {args.players} (kết nối thành công {stats.connected}, "
+          f"p50 {percentile(stats.connect_latencies, 50) * 1000:.1f} ms, "
+          f"p99 {percentile(stats.connect_latencies, 99) * 1000:.1f} ms)")
+    print(f"⚔️ Trận đấu: {matches:,.0f} trận trong {stats.elapsed:.1f} s → {matches / stats.elapsed:,.1f} trận/s "
+          f"(thắng {stats.results['win']}, thua {stats.results['lose']}, hòa {stats.results['draw']})")
+    latencies = stats.match_latencies
+    print(f"⏱️ ready_to_battle → battle_result: p50 {percentile(latencies, 50) * 1000:.1f} ms, "
+          f"p90 {percentile(latencies, 90) * 1000:.1f} ms, p99 {percentile(latencies, 99) * 1000:.1f} ms, "
+          f"max {max(latencies, default=0.0) * 1000:.1f} ms")
+    error_rate = errors / max(stats.requests + args.players, 1)
+    details = ', '.join(f'{kind} {count}' for kind, count in sorted(stats.errors.items())) or 'không có'
+    print(f"❌ Lỗi: {errors} ({error_rate:.2%}) - {details}")
+
+def start_server(args, script: str = 'Server.py') -> subprocess.Popen:
+    """Chạy Server.py (hoặc Cluster.py) cục bộ và chờ đến khi nhận kết nối"""
+    command = [sys.executable, script, '--host', args.host, '--port', str(args.port)]
+    command += shlex.split(args.server_args)
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    
+    for _ in range(200):
+        try:
+            socket.create_connection((args.host, args.port), timeout=0.1).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError('Server không khởi động được')
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Tạo tải cho Battle Chess Server')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8888)
+    parser.add_argument('--players', type=int, default=1000, help='số người chơi giả')
+    parser.add_argument('--duration', type=float, default=10.0, help='số giây gửi ready_to_battle')
+    parser.add_argument('--connect-rate', type=float, default=1000.0, help='số kết nối mới mỗi giây (0 = tất cả cùng lúc)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='thời gian chờ tối đa một câu trả lời')
+    parser.add_argument('--grace', type=float, default=5.0, help='số giây chờ các trận đang dở sau khi hết giờ')
+    parser.add_argument('--format', choices=['json', 'binary'], default='json')
+    parser.add_argument('--want-log', action='store_true', help='yêu cầu log trận đấu trong battle_result')
+    parser.add_argument('--compression', choices=['none', 'zlib'], default='none',
+                        help='đề nghị server nén các tin nhắn lớn (battle_result có log)')
+    parser.add_argument('--seed', type=int, default=13)
+    parser.add_argument('--start-server', action='store_true', help='tự chạy Server.py cục bộ trong lúc đo')
+    parser.add_argument('--server-args', default='', help='tham số thêm cho Server.py, ví dụ "--backend async"')
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    server = start_server(args) if args.start_server else None
+    
+    try:
+        stats = asyncio.run(run_load(args))
+        report(args, stats)
+    finally:
+        if server is not None:
+            # SIGINT như Ctrl+C để server dừng êm (ghi nốt lịch sử trận đấu...)
+            server.send_signal(signal.SIGINT)
+            try:
+                server.wait(10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+
+if __name__ == "__main__":
+    main()
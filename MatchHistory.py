@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battle Chess Match History - Lưu lịch sử trận đấu vào SQLite, ghi theo lô trên một luồng nền
+Nhóm 13
+
+record() chỉ đưa trận đấu vào hàng đợi nên không bao giờ chặn luồng xử lý trận đấu; luồng ghi
+gom các trận đang chờ vào một transaction. Khi hàng đợi đầy (ổ đĩa quá chậm) trận đấu bị bỏ qua
+và được đếm trong dropped thay vì làm chậm server.
+
+Tra cứu:
+    python MatchHistory.py player history.db client_1
+    python MatchHistory.py composition history.db Tank Knight Warrior Assassin
+    python MatchHistory.py show history.db 42
+"""
+
+import sys
+import time
+import queue
+import sqlite3
+import argparse
+import threading
+from typing import List, Dict, Any, Optional
+
+from Protocol import BattleLog
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    match_id TEXT NOT NULL,
+    played_at REAL NOT NULL,
+    player1 TEXT NOT NULL,
+    player2 TEXT NOT NULL,
+    team1 TEXT NOT NULL,        -- tên tướng theo thứ tự vị trí, cách nhau bởi dấu phẩy
+    team2 TEXT NOT NULL,
+    max_hp TEXT NOT NULL,       -- HP tối đa lúc thi đấu: team 1 rồi team 2, cách nhau bởi dấu phẩy
+    winner INTEGER NOT NULL,    -- 1, 2 hoặc 0 = hòa
+    rounds INTEGER NOT NULL,
+    rating1 REAL,
+    rating2 REAL,
+    stat_version TEXT,
+    events BLOB                 -- BattleLog.pack_events(), NULL nếu trận không có log
+);
+CREATE INDEX IF NOT EXISTS matches_player1 ON matches (player1, id);
+CREATE INDEX IF NOT EXISTS matches_player2 ON matches (player2, id);
+CREATE INDEX IF NOT EXISTS matches_team1 ON matches (team1, id);
+CREATE INDEX IF NOT EXISTS matches_team2 ON matches (team2, id);
+"""
+
+COLUMNS = ('match_id', 'played_at', 'player1', 'player2', 'team1', 'team2', 'max_hp',
+           'winner', 'rounds', 'rating1', 'rating2', 'stat_version', 'events')
+
+INSERT = f"INSERT INTO matches ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+def composition_key(team: List[str]) -> str:
+    return ','.join(team)
+
+class MatchHistory:
+    """Kho lịch sử trận đấu. Mỗi luồng đọc dùng kết nối riêng; chỉ luồng ghi nền giữ kết nối ghi."""
+    
+    def __init__(self, path: str, batch_size: int = 512, flush_interval: float = 0.5,
+                 max_pending: int = 100000, clock=time.time):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self._queue = queue.Queue(max_pending)
+        self._local = threading.local()
+    
+        # Tạo bảng trước khi trả về để có thể đọc ngay
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        connection.close()
+    
+        self._writer = threading.Thread(target=self._write_loop, name='match-history')
+        self._writer.daemon = True
+        self._writer.start()
+    
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path)
+        # WAL: đọc không chặn luồng ghi; mất điện chỉ có thể mất vài lô cuối
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.row_factory = sqlite3.Row
+        return connection
+    
+    def record(self, match_id: str, player1: str, player2: str, team1: List[str], team2: List[str],
+               max_hp: List[int], winner: int, rounds: int, log: Optional[BattleLog] = None,
+               ratings: Optional[tuple] = None, stat_version: Optional[str] = None) -> bool:
+        """Đưa một trận vào hàng đợi ghi; trả về False nếu hàng đợi đầy và trận bị bỏ qua"""
+        row = (
+            match_id, self.clock(), player1, player2, composition_key(team1), composition_key(team2),
+            ','.join(map(str, max_hp)), winner, rounds,
+            ratings[0] if ratings else None, ratings[1] if ratings else None,
+            stat_version, log.pack_events() if log is not None else None
+        )
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+    
+    def pending(self) -> int:
+        return self._queue.qsize()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Chờ đến khi mọi trận đã đưa vào hàng đợi được ghi xuống đĩa; False nếu hết timeout
+        (kể cả khi hàng đợi đầy mãi) hoặc luồng ghi đã dừng"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = threading.Event()
+        if not self._put_control(done, deadline):
+            return False
+        return done.wait(None if deadline is None else max(deadline - time.monotonic(), 0))
+    
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Ghi nốt hàng đợi rồi dừng luồng ghi; False nếu luồng ghi chưa dừng sau timeout giây"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self._put_control(None, deadline):
+            self._writer.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+        if self._writer.is_alive():
+            print(f"⚠️ Luồng ghi lịch sử trận đấu chưa dừng, còn {self.pending()} mục chưa ghi")
+            return False
+        return True
+    
+    def _put_control(self, item, deadline: Optional[float]) -> bool:
+        """Đưa tín hiệu (Event hoặc None) vào hàng đợi mà không chặn mãi khi hàng đợi đầy và luồng
+        ghi bị kẹt hoặc đã dừng"""
+        while self._writer.is_alive():
+            wait = 0.1 if deadline is None else min(0.1, max(deadline - time.monotonic(), 0))
+            try:
+                self._queue.put(item, timeout=wait)
+                return True
+            except queue.Full:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return False
+        return False
+    
+    def _write_loop(self):
+        connection = self._connect()
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch, waiters = [], []
+            deadline = time.monotonic() + self.flush_interval
+    
+            # Gom thêm cho đến khi đủ lô hoặc hết flush_interval
+            while True:
+                if item is None:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+    
+                if stopping or waiters or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+    
+            if batch:
+                try:
+                    with connection:
+                        connection.executemany(INSERT, batch)
+                    self.written += len(batch)
+                    self.batches += 1
+                except sqlite3.Error as e:
+                    self.dropped += len(batch)
+                    print(f"❌ Lỗi khi ghi lịch sử trận đấu: {e}")
+            for waiter in waiters:
+                waiter.set()
+        connection.close()
+    
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+    
+    @staticmethod
+    def _row(row: sqlite3.Row) -> Dict[str, Any]:
+        match = dict(row)
+        match['team1'] = match['team1'].split(',')
+        match['team2'] = match['team2'].split(',')
+        match['max_hp'] = [int(hp) for hp in match['max_hp'].split(',')]
+        return match
+    
+    def by_player(self, player: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Các trận gần nhất của một người chơi (dùng index theo player1 và player2)"""
+        rows = self._reader().execute(
+            "SELECT * FROM (SELECT * FROM matches WHERE player1 = ? ORDER BY id DESC LIMIT ?) "
+            "UNION SELECT * FROM (SELECT * FROM matches WHERE player2 = ? ORDER BY id DESC LIMIT ?) "
+            "ORDER BY id DESC LIMIT ?",
+            (player, limit, player, limit, limit)
+        ).fetchall()
+        return [self._row(row) for row in rows]
+    
+    def by_composition(self, team: List[str], limit: int = 50) -> List[Dict[str, Any]]:
+        """Các trận gần nhất có đội hình team (đúng thứ tự vị trí) ở bất kỳ bên nào"""
+        key = composition_key(team)
+        rows = self._reader().execute(
+            "SELECT * FROM (SELECT * FROM matches WHERE team1 = ? ORDER BY id DESC LIMIT ?) "
+            "UNION SELECT * FROM (SELECT * FROM matches WHERE team2 = ? ORDER BY id DESC LIMIT ?) "
+            "ORDER BY id DESC LIMIT ?",
+            (key, limit, key, limit, limit)
+        ).fetchall()
+        return [self._row(row) for row in rows]
+    
+    def composition_record(self, team: List[str]) -> Dict[str, int]:
+        """Số trận thắng/thua/hòa của một đội hình trên toàn bộ lịch sử"""
+        key = composition_key(team)
+        record = {'win': 0, 'lose': 0, 'draw': 0}
+        for column, side in (('team1', 1), ('team2', 2)):
+            rows = self._reader().execute(
+                f"SELECT winner, COUNT(*) FROM matches WHERE {column} = ? GROUP BY winner", (key,)
+            )
+            for winner, count in rows:
+                record['draw' if winner == 0 else 'win' if winner == side else 'lose'] += count
+        return record
+    
+    def get(self, match_row_id: int) -> Optional[Dict[str, Any]]:
+        row = self._reader().execute("SELECT * FROM matches WHERE id = ?", (match_row_id,)).fetchone()
+        return self._row(row) if row is not None else None
+    
+    @staticmethod
+    def battle_log(match: Dict[str, Any]) -> Optional[BattleLog]:
+        """Dựng lại BattleLog (render() ra log văn bản) từ một trận đã lưu"""
+        if match['events'] is None:
+            return None
+        size1 = len(match['team1'])
+        return BattleLog.from_parts(
+            match['team1'], match['max_hp'][:size1], match['team2'], match['max_hp'][size1:],
+            BattleLog.unpack_events(match['events']), match['winner']
+        )
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'written': self.written,
+            'batches': self.batches,
+            'pending': self.pending(),
+            'dropped': self.dropped
+        }
+
+def print_matches(matches: List[Dict[str, Any]]):
+    for match in matches:
+        played = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(match['played_at']))
+        result = f"Team {match['winner']} thắng" if match['winner'] else "Hòa"
+        print(f"#{match['id']:<6} {played}  {match['player1']} ({', '.join(match['team1'])}) vs "
+              f"{match['player2']} ({', '.join(match['team2'])}) - {result} sau {match['rounds']} round")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tra cứu lịch sử trận đấu')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    player = commands.add_parser('player', help='các trận gần nhất của một người chơi')
+    player.add_argument('history')
+    player.add_argument('player')
+    player.add_argument('--limit', type=int, default=20)
+    
+    composition = commands.add_parser('composition', help='các trận và thành tích của một đội hình')
+    composition.add_argument('history')
+    composition.add_argument('team', nargs='+', help='tên tướng theo thứ tự vị trí')
+    composition.add_argument('--limit', type=int, default=20)
+    
+    show = commands.add_parser('show', help='xem log của một trận')
+    show.add_argument('history')
+    show.add_argument('id', type=int)
+    
+    args = parser.parse_args(argv)
+    history = MatchHistory(args.history)
+    
+    try:
+        if args.command == 'player':
+            print_matches(history.by_player(args.player, args.limit))
+        elif args.command == 'composition':
+            record = history.composition_record(args.team)
+            print(f"📊 {', '.join(args.team)}: thắng {record['win']}, thua {record['lose']}, hòa {record['draw']}")
+            print_matches(history.by_composition(args.team, args.limit))
+        else:
+            match = history.get(args.id)
+            if match is None:
+                print(f"❌ Không có trận #{args.id}")
+                return 1
+            print_matches([match])
+            log = history.battle_log(match)
+            if log is None:
+                print("(trận này không lưu log)")
+            else:
+                print('\n'.join(log.render()))
+    finally:
+        history.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battle Chess Matchmaking - Hàng đợi ghép trận và xếp hạng Elo
+Nhóm 13
+"""
+
+import time
+import heapq
+import bisect
+import itertools
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+DEFAULT_RATING = 1500.0
+
+class EloRatings:
+    """Điểm Elo của người chơi, cập nhật sau mỗi trận"""
+    
+    def __init__(self, k_factor: float = 32.0, default: float = DEFAULT_RATING):
+        self.k_factor = k_factor
+        self.default = default
+        self._ratings = {}
+        self._lock = threading.Lock()
+    
+    def get(self, player: str) -> float:
+        return self._ratings.get(player, self.default)
+    
+    def set(self, player: str, rating: float):
+        """Ghi đè điểm của người chơi, ví dụ điểm do broker giữ khi chạy nhiều worker (Cluster.py)"""
+        with self._lock:
+            self._ratings[player] = rating
+    
+    @staticmethod
+    def expected_score(rating: float, opponent: float) -> float:
+        return 1.0 / (1.0 + 10 ** ((opponent - rating) / 400.0))
+    
+    def record(self, player1: str, player2: str, winner: int) -> Tuple[float, float]:
+        """Cập nhật điểm sau trận (winner: 1, 2 hoặc 0 = hòa), trả về điểm mới của hai người"""
+        score1 = 1.0 if winner == 1 else 0.0 if winner == 2 else 0.5
+        with self._lock:
+            rating1, rating2 = self.get(player1), self.get(player2)
+            change = self.k_factor * (score1 - self.expected_score(rating1, rating2))
+            self._ratings[player1] = rating1 + change
+            self._ratings[player2] = rating2 - change
+            return self._ratings[player1], self._ratings[player2]
+
+class MatchmakingQueue:
+    """Hàng đợi ghép trận FIFO an toàn đa luồng, có thống kê độ dài hàng đợi và thời gian chờ ghép"""
+    
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._waiting = OrderedDict()  # {client_id: thời điểm vào hàng đợi}
+        self.matches = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.on_wait = None  # callable(số giây chờ) gọi cho mỗi người được ghép, ví dụ để ghi metrics
+    
+    def __len__(self) -> int:
+        return len(self._waiting)
+    
+    def __contains__(self, client_id: str) -> bool:
+        return client_id in self._waiting
+    
+    def _record_match(self, now: float, *queued_times: float):
+        for queued in queued_times:
+            self.total_wait += now - queued
+            self.max_wait = max(self.max_wait, now - queued)
+            if self.on_wait is not None:
+                self.on_wait(now - queued)
+        self.matches += 1
+    
+    def push(self, client_id: str, rating: Optional[float] = None) -> Tuple[Optional[Tuple[str, str]], int]:
+        """Thêm client vào hàng đợi. Trả về (cặp đấu nếu ghép được, số người đang chờ)"""
+        with self._lock:
+            if client_id not in self._waiting:
+                self._waiting[client_id] = self.clock()
+            depth = len(self._waiting)
+            
+            if depth < 2:
+                return None, depth
+            
+            client1_id, queued1 = self._waiting.popitem(last=False)
+            client2_id, queued2 = self._waiting.popitem(last=False)
+            self._record_match(self.clock(), queued1, queued2)
+            return (client1_id, client2_id), depth
+    
+    def poll(self) -> List[Tuple[str, str]]:
+        """FIFO ghép ngay khi push nên không còn cặp nào chờ"""
+        return []
+    
+    def remove(self, client_id: str) -> bool:
+        with self._lock:
+            return self._waiting.pop(client_id, None) is not None
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'depth': len(self._waiting),
+                'matches': self.matches,
+                'avg_time_to_match': self.total_wait / (2 * self.matches) if self.matches else 0.0,
+                'max_time_to_match': self.max_wait
+            }
+
+class RatingMatchmaker(MatchmakingQueue):
+    """Ghép trận theo điểm Elo.
+    
+    Người chờ được chia vào các bucket theo điểm (bucket_width điểm mỗi bucket), mỗi bucket là
+    một danh sách sắp xếp theo (điểm, thứ tự vào hàng đợi); danh sách bucket không rỗng cũng được
+    giữ có thứ tự. Đối thủ gần điểm nhất luôn là người liền trước hoặc liền sau trong thứ tự điểm,
+    nên tìm đối thủ chỉ tốn vài lần bisect (O(log n)) dù bucket đông đến đâu. Dung sai của mỗi
+    người nới rộng thêm widen_step điểm sau mỗi widen_interval giây chờ; heap thời điểm nới rộng
+    giúp poll() chỉ tìm lại cho những người vừa được nới dung sai thay vì quét toàn bộ hàng đợi.
+    """
+    
+    def __init__(self, bucket_width: int = 50, base_tolerance: float = 50.0, widen_step: float = 50.0,
+                 widen_interval: float = 1.0, max_tolerance: float = 500.0, clock=time.time):
+        super().__init__(clock)
+        self.bucket_width = bucket_width
+        self.base_tolerance = base_tolerance
+        self.widen_step = widen_step
+        self.widen_interval = widen_interval
+        self.max_tolerance = max_tolerance
+        
+        self._buckets = {}        # {bucket: [(rating, seq, client_id)] đã sắp xếp}
+        self._bucket_keys = []    # các bucket không rỗng, đã sắp xếp
+        self._widen_heap = []     # (thời điểm nới dung sai kế tiếp, seq, client_id)
+        self._stale = 0           # số mục trong _widen_heap của người đã rời hàng đợi
+        self._entries = {}        # {client_id: (rating, thời điểm vào hàng đợi, seq)}
+        self._seq = itertools.count()  # thứ tự vào hàng đợi, phân biệt các lần vào hàng đợi của cùng client
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __contains__(self, client_id: str) -> bool:
+        return client_id in self._entries
+    
+    def tolerance(self, waited: float) -> float:
+        steps = int(waited / self.widen_interval) if self.widen_interval > 0 else 0
+        return min(self.max_tolerance, self.base_tolerance + steps * self.widen_step)
+    
+    def _bucket_of(self, rating: float) -> int:
+        return int(rating // self.bucket_width)
+    
+    def _add(self, client_id: str, rating: float, now: float):
+        seq = next(self._seq)
+        bucket = self._bucket_of(rating)
+        if bucket not in self._buckets:
+            self._buckets[bucket] = []
+            bisect.insort(self._bucket_keys, bucket)
+        bisect.insort(self._buckets[bucket], (rating, seq, client_id))
+        self._entries[client_id] = (rating, now, seq)
+        if self.widen_interval > 0:
+            heapq.heappush(self._widen_heap, (now + self.widen_interval, seq, client_id))
+    
+    def _discard(self, client_id: str, in_heap: bool = True) -> Optional[Tuple[float, float, int]]:
+        """Bỏ client khỏi hàng đợi. in_heap=False khi poll() đã lấy mục heap của client ra"""
+        entry = self._entries.pop(client_id, None)
+        if entry is None:
+            return None
+        rating, _, seq = entry
+        bucket = self._bucket_of(rating)
+        members = self._buckets[bucket]
+        del members[bisect.bisect_left(members, (rating, seq))]
+        if not members:
+            del self._buckets[bucket]
+            del self._bucket_keys[bisect.bisect_left(self._bucket_keys, bucket)]
+        
+        if self.widen_interval > 0 and in_heap:
+            # Mục heap của người đã rời hàng đợi được dọn khi chiếm quá nửa heap
+            self._stale += 1
+            if self._stale > len(self._widen_heap) // 2:
+                self._widen_heap = [item for item in self._widen_heap if self._is_queued(item[1], item[2])]
+                heapq.heapify(self._widen_heap)
+                self._stale = 0
+        return entry
+    
+    def _is_queued(self, seq: int, client_id: str) -> bool:
+        entry = self._entries.get(client_id)
+        return entry is not None and entry[2] == seq
+    
+    def _neighbour(self, bucket: int, members: list, index: int, direction: int) -> Optional[Tuple[float, int, str]]:
+        """Người liền kề theo thứ tự điểm: trong cùng bucket, hoặc ở đầu/cuối bucket không rỗng kế bên"""
+        if 0 <= index < len(members):
+            return members[index]
+        position = bisect.bisect_left(self._bucket_keys, bucket) + direction
+        if 0 <= position < len(self._bucket_keys):
+            other = self._buckets[self._bucket_keys[position]]
+            return other[-1] if direction < 0 else other[0]
+        return None
+    
+    def _find_opponent(self, client_id: str, tolerance: float) -> Optional[str]:
+        """Đối thủ có điểm gần nhất trong khoảng dung sai, cùng điểm thì ưu tiên người chờ lâu hơn"""
+        rating, _, seq = self._entries[client_id]
+        bucket = self._bucket_of(rating)
+        members = self._buckets[bucket]
+        index = bisect.bisect_left(members, (rating, seq))
+        
+        below = self._neighbour(bucket, members, index - 1, -1)
+        if below is not None:
+            # Người liền trước là người vào hàng đợi muộn nhất trong số những người cùng điểm đó
+            same = self._buckets[self._bucket_of(below[0])]
+            below = same[bisect.bisect_left(same, (below[0],))]
+        above = self._neighbour(bucket, members, index + 1, 1)
+        
+        candidates = [c for c in (below, above) if c is not None and abs(c[0] - rating) <= tolerance]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda c: (abs(c[0] - rating), c[1]))[2]
+    
+    def _match(self, client_id: str, opponent_id: str, now: float, popped: bool = False) -> Tuple[str, str]:
+        queued1 = self._discard(opponent_id)[1]
+        queued2 = self._discard(client_id, in_heap=not popped)[1]
+        self._record_match(now, queued1, queued2)
+        # Người chờ lâu hơn là team 1
+        return opponent_id, client_id
+    
+    def push(self, client_id: str, rating: Optional[float] = None) -> Tuple[Optional[Tuple[str, str]], int]:
+        if rating is None:
+            rating = DEFAULT_RATING
+        with self._lock:
+            now = self.clock()
+            if client_id not in self._entries:
+                self._add(client_id, rating, now)
+            depth = len(self._entries)
+            
+            queued = self._entries[client_id][1]
+            opponent_id = self._find_opponent(client_id, self.tolerance(now - queued))
+            if opponent_id is None:
+                return None, depth
+            return self._match(client_id, opponent_id, now), depth
+    
+    def poll(self) -> List[Tuple[str, str]]:
+        """Tìm lại đối thủ cho những người vừa được nới dung sai; gọi định kỳ"""
+        pairs = []
+        with self._lock:
+            now = self.clock()
+            while self._widen_heap and self._widen_heap[0][0] <= now:
+                _, seq, client_id = heapq.heappop(self._widen_heap)
+                if not self._is_queued(seq, client_id):
+                    self._stale -= 1
+                    continue
+                
+                tolerance = self.tolerance(now - self._entries[client_id][1])
+                opponent_id = self._find_opponent(client_id, tolerance)
+                if opponent_id is not None:
+                    pairs.append(self._match(client_id, opponent_id, now, popped=True))
+                else:
+                    heapq.heappush(self._widen_heap, (now + self.widen_interval, seq, client_id))
+        return pairs
+    
+    def remove(self, client_id: str) -> bool:
+        with self._lock:
+            return self._discard(client_id) is not None
+    
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        with self._lock:
+            stats['depth'] = len(self._entries)
+            stats['buckets'] = len(self._bucket_keys)
+        return stats
+
+MATCHMAKERS = {
+    'fifo': MatchmakingQueue,
+    'rating': RatingMatchmaker
+}
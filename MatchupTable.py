@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battle Chess Matchup Table - Bảng kết quả tính sẵn cho mọi cặp đội hình
+Nhóm 13
+
+Với C tướng và đội hình 4 tướng (cho phép trùng) có C^4 đội hình có thứ tự.
+simulate_battle là tất định nên kết quả của mọi cặp (team1, team2) được tính
+một lần và ghi vào file nhị phân; server map file này vào bộ nhớ và tra cứu O(1).
+
+Định dạng file:
+    header 32 bytes: magic 'BCMT', version, số tướng, số tướng mỗi đội, kích thước bản ghi,
+                     phiên bản chỉ số tướng (16 ký tự)
+    bản ghi thứ (team1 * số_đội_hình + team2), mỗi bản ghi:
+        1 byte  winner << 6 | rounds
+        K bytes HP cuối của team 1
+        K bytes HP cuối của team 2
+
+Tạo bảng:  python MatchupTable.py build matchups.bin
+Tỉ lệ thắng: python MatchupTable.py winrate matchups.bin Warrior Mage Tank Knight
+"""
+
+import os
+import mmap
+import time
+import struct
+import argparse
+import itertools
+from typing import List, Dict, Any, Sequence
+
+MAGIC = b'BCMT'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHH16s4x')
+
+def composition_index(ids: Sequence[int], num_champions: int) -> int:
+    index = 0
+    for champion_id in ids:
+        index = index * num_champions + champion_id
+    return index
+
+def composition_from_index(index: int, num_champions: int, team_size: int) -> List[int]:
+    ids = []
+    for _ in range(team_size):
+        index, champion_id = divmod(index, num_champions)
+        ids.append(champion_id)
+    return ids[::-1]
+
+class MatchupTable:
+    """Bảng kết quả đã tính sẵn, đọc qua mmap (chỉ cần thư viện chuẩn)"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        magic, version, num_champions, team_size, record_size, stat_version = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{path} không phải bảng kết quả hợp lệ')
+        
+        self.num_champions = num_champions
+        self.team_size = team_size
+        self.record_size = record_size
+        self.stat_version = stat_version.decode('ascii')
+        self.num_compositions = num_champions ** team_size
+        
+        expected = HEADER.size + self.num_compositions ** 2 * record_size
+        if len(self._map) != expected:
+            self.close()
+            raise ValueError(f'{path} bị thiếu dữ liệu ({len(self._map)}/{expected} bytes)')
+    
+    def close(self):
+        self._map.close()
+        self._file.close()
+    
+    def _record(self, team1_index: int, team2_index: int) -> bytes:
+        offset = HEADER.size + (team1_index * self.num_compositions + team2_index) * self.record_size
+        return self._map[offset:offset + self.record_size]
+    
+    def lookup(self, team1_ids: Sequence[int], team2_ids: Sequence[int]) -> Dict[str, Any]:
+        record = self._record(
+            composition_index(team1_ids, self.num_champions),
+            composition_index(team2_ids, self.num_champions)
+        )
+        k = self.team_size
+        return {
+            'winner': record[0] >> 6,
+            'rounds': record[0] & 0x3F,
+            'team1_hp': list(record[1:1 + k]),
+            'team2_hp': list(record[1 + k:1 + 2 * k])
+        }
+    
+    def win_rate(self, team_ids: Sequence[int]) -> Dict[str, Any]:
+        """Thống kê thắng/hòa/thua của một đội hình với mọi đối thủ, khi đánh trước và đánh sau"""
+        index = composition_index(team_ids, self.num_champions)
+        n = self.num_compositions
+        
+        # Khi là team 1: các bản ghi liền nhau trong một hàng
+        start = HEADER.size + index * n * self.record_size
+        row = self._map[start:start + n * self.record_size]
+        first = [0, 0, 0]
+        for winner_rounds in row[::self.record_size]:
+            first[winner_rounds >> 6] += 1
+        
+        # Khi là team 2: một cột, mỗi bản ghi cách nhau n bản ghi
+        second = [0, 0, 0]
+        stride = n * self.record_size
+        offset = HEADER.size + index * self.record_size
+        for _ in range(n):
+            second[self._map[offset] >> 6] += 1
+            offset += stride
+        
+        games = 2 * n
+        wins = first[1] + second[2]
+        draws = first[0] + second[0]
+        return {
+            'games': games,
+            'wins': wins,
+            'draws': draws,
+            'losses': games - wins - draws,
+            'win_rate': wins / games,
+            'win_rate_first': first[1] / n,
+            'win_rate_second': second[2] / n
+        }
+
+def build_table(path: str, champions: List[Dict[str, Any]], team_size: int = 4, block: int = 16):
+    """Mô phỏng mọi cặp đội hình bằng BatchSimulator và ghi ra file (cần numpy)"""
+    import numpy as np
+    from Server import champion_stat_version
+    from BatchSimulator import simulate_batch
+    
+    if max(c['hp'] for c in champions) > 255:
+        raise ValueError('HP tối đa phải <= 255 để lưu trong 1 byte')
+    
+    num_champions = len(champions)
+    record_size = 1 + 2 * team_size
+    compositions = np.array(list(itertools.product(range(num_champions), repeat=team_size)), dtype=np.intp)
+    n = len(compositions)
+    
+    hp_table = np.array([c['hp'] for c in champions], dtype=np.int32)
+    dmg_table = np.array([c['dmg'] for c in champions], dtype=np.int32)
+    all_hp, all_dmg = hp_table[compositions], dmg_table[compositions]
+    
+    tmp_path = path + '.tmp'
+    started = time.time()
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, num_champions, team_size, record_size,
+                            champion_stat_version(champions).encode('ascii')))
+        
+        for first in range(0, n, block):
+            team1 = np.repeat(np.arange(first, min(n, first + block)), n)
+            team2 = np.tile(np.arange(n), len(team1) // n)
+            
+            result = simulate_batch(all_hp[team1], all_dmg[team1], all_hp[team2], all_dmg[team2])
+            
+            records = np.empty((len(team1), record_size), dtype=np.uint8)
+            records[:, 0] = (result['winner'].astype(np.uint8) << 6) | result['rounds'].astype(np.uint8)
+            records[:, 1:1 + team_size] = result['team1_hp']
+            records[:, 1 + team_size:] = result['team2_hp']
+            f.write(records.tobytes())
+            
+            done = min(n, first + block)
+            if done % 256 == 0 or done == n:
+                print(f"\r⏳ {done}/{n} đội hình ({time.time() - started:.0f}s)", end='', flush=True)
+    
+    os.replace(tmp_path, path)
+    print(f"\n✅ Đã ghi {n * n} trận vào {path}")
+
+def main():
+    from Server import ChampionRegistry, DEFAULT_CHAMPIONS_FILE
+    
+    parser = argparse.ArgumentParser(description='Bảng kết quả tính sẵn cho mọi cặp đội hình')
+    parser.add_argument('--champions', default=DEFAULT_CHAMPIONS_FILE)
+    sub = parser.add_subparsers(dest='command', required=True)
+    
+    build = sub.add_parser('build', help='mô phỏng toàn bộ và ghi bảng')
+    build.add_argument('path')
+    
+    winrate = sub.add_parser('winrate', help='tỉ lệ thắng của một đội hình')
+    winrate.add_argument('path')
+    winrate.add_argument('team', nargs='+')
+    
+    args = parser.parse_args()
+    champions = ChampionRegistry.load(args.champions).champions
+    
+    if args.command == 'build':
+        build_table(args.path, champions)
+    else:
+        index = {c['name']: i for i, c in enumerate(champions)}
+        table = MatchupTable(args.path)
+        stats = table.win_rate([index[name] for name in args.team])
+        print(f"Đội hình: {', '.join(args.team)}")
+        print(f"Thắng {stats['wins']} / Hòa {stats['draws']} / Thua {stats['losses']} "
+              f"(tỉ lệ thắng {stats['win_rate']:.1%}, đánh trước {stats['win_rate_first']:.1%}, "
+              f"đánh sau {stats['win_rate_second']:.1%})")
+        table.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battle Chess Metrics - Bộ đếm và histogram độ trễ, xuất theo định dạng văn bản của Prometheus
+Nhóm 13
+
+Khi tắt metrics, server giữ metrics = None và chỉ tốn một phép so sánh ở mỗi điểm đo.
+"""
+
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Any, Callable, Tuple
+
+# Giây: từ micro giây (mã hóa tin nhắn, mô phỏng) đến vài giây (chờ ghép trận)
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Bộ đếm tăng dần, có thể chia theo nhãn (labels là tuple giá trị theo thứ tự label_names)"""
+    
+    kind = 'counter'
+    
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.values = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1, labels: Tuple[Any, ...] = ()):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+    
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self.values.items())
+        return [f'{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}'
+                for labels, value in values]
+
+class Histogram:
+    """Histogram với các mốc cố định; số đếm từng mốc được cộng dồn khi xuất"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+                 label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.label_names = label_names
+        self.series = {}  # {labels: [số đếm từng mốc (mốc cuối là +Inf), tổng, số lần]}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, labels: Tuple[Any, ...] = ()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+    
+    def render(self) -> List[str]:
+        with self._lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self.series.items()]
+    
+        lines = []
+        for labels, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.label_names, labels)} {count}')
+        return lines
+
+class CallbackMetric:
+    """Giá trị đọc lúc xuất metrics (số client, độ dài hàng đợi, số đếm mà module khác tự giữ)"""
+    
+    def __init__(self, name: str, help_text: str, fn: Callable[[], float], kind: str = 'gauge'):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.kind = kind
+    
+    def render(self) -> List[str]:
+        return [f'{self.name} {_format_value(self.fn())}']
+
+class MetricsRegistry:
+    """Tập các metric của một tiến trình, tên được thêm tiền tố prefix_"""
+    
+    def __init__(self, prefix: str = ''):
+        self.prefix = prefix + '_' if prefix else ''
+        self.metrics = []
+    
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+    
+    def counter(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(self.prefix + name, help_text, label_names))
+    
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+                  label_names: Tuple[str, ...] = ()) -> Histogram:
+        return self._add(Histogram(self.prefix + name, help_text, buckets, label_names))
+    
+    def callback(self, name: str, help_text: str, fn: Callable[[], float], kind: str = 'gauge') -> CallbackMetric:
+        return self._add(CallbackMetric(self.prefix + name, help_text, fn, kind))
+    
+    def render(self) -> str:
+        """Xuất mọi metric theo định dạng văn bản Prometheus (phiên bản 0.0.4)"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                lines.append(f'# lỗi khi đọc {metric.name}: {e}')
+        return '\n'.join(lines) + '\n'
+
+class ServerMetrics(MetricsRegistry):
+    """Các metric đo trên đường xử lý chính của GameServer"""
+    
+    def __init__(self):
+        super().__init__('battlechess')
+        self.connections = self.counter('connections_total', 'Số kết nối đã nhận')
+        self.messages = self.counter('messages_total', 'Số tin nhắn nhận được theo loại', ('type',))
+        self.bytes_received = self.counter('received_bytes_total', 'Số byte nhận từ client')
+        self.bytes_sent = self.counter('sent_bytes_total', 'Số byte gửi cho client (không gồm phát trực tiếp)')
+        self.decode_seconds = self.histogram('decode_seconds', 'Thời gian giải mã một tin nhắn',
+                                             label_names=('format',))
+        self.encode_seconds = self.histogram('encode_seconds', 'Thời gian mã hóa một tin nhắn',
+                                             label_names=('format',))
+        self.simulate_seconds = self.histogram('simulate_seconds', 'Thời gian mô phỏng một trận đấu')
+        self.battle_queue_seconds = self.histogram('battle_queue_seconds',
+                                                   'Thời gian trận đấu chờ worker mô phỏng')
+        self.matchmaking_wait_seconds = self.histogram('matchmaking_wait_seconds',
+                                                       'Thời gian người chơi chờ ghép trận', WAIT_BUCKETS)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = None
+    
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+    
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(registry: MetricsRegistry, host: str = 'localhost', port: int = 9100) -> ThreadingHTTPServer:
+    """Phục vụ GET /metrics trên một luồng nền"""
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    
+    thread = threading.Thread(target=server.serve_forever, name='metrics')
+    thread.daemon = True
+    thread.start()
+    return server
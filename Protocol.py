@@ -0,0 +1,625 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battle Chess Protocol - Đóng gói/giải mã khung tin nhắn dùng chung cho server và client
+Nhóm 13
+
+Hai định dạng khung tin nhắn, chọn trong lúc bắt tay sau 'welcome':
+- json:   object JSON kết thúc bằng ký tự xuống dòng (mặc định)
+- binary: 4 byte độ dài (big-endian) + nội dung mã hóa kiểu msgpack, đội hình và log trận đấu
+          được nén thành ID tướng và mã sự kiện (xem BinaryCodec)
+
+Với cả hai định dạng, khung lớn có thể được nén (thỏa thuận bằng set_compression): 4 byte độ dài
+có bit cao nhất bật + nội dung khung (không gồm ký tự xuống dòng / độ dài) nén zlib với từ điển
+COMPRESSION_DICTIONARY. Byte đầu của khung nén luôn >= 0x80, không trùng với khung JSON ('{') hay
+khung nhị phân thường, nên FrameDecoder tự nhận ra khung nén mà không cần biết trạng thái thỏa thuận.
+"""
+
+import json
+import zlib
+import struct
+from array import array
+from typing import List, Dict, Any, Optional
+
+MAX_FRAME_SIZE = 1 << 20  # 1 MB
+
+WIRE_FORMATS = ('json', 'binary')
+
+LENGTH_PREFIX = struct.Struct('>I')
+
+COMPRESSIONS = ('zlib',)
+COMPRESSED_FLAG = 0x80000000
+COMPRESSION_LEVEL = 6
+
+# Từ điển nén dùng chung: khung mẫu của battle_result và các cụm lặp lại trong log trận đấu, để khung
+# đầu tiên cũng nén được như thể đã thấy các cụm này. zlib tham chiếu ngược gần thì rẻ hơn nên cụm
+# xuất hiện nhiều nhất (dòng tấn công) nằm cuối. Đổi từ điển là đổi giao thức: client và server
+# phải dùng cùng một từ điển (zlib kiểm tra bằng mã từ điển ở phần đầu dữ liệu nén).
+COMPRESSION_DICTIONARY = (
+    '{"type": "battle_result", "match_id": "match_1", "winner": 1, "your_result": "win", "rating": 1000, '
+    '"your_team_final": [{"name": "Warrior", "hp": 0, "max_hp": 12, "dmg": 4, "range": 1, "alive": false}, '
+    '{"name": "Mage", "hp": 6, "max_hp": 6, "dmg": 5, "range": 2, "alive": true}, '
+    '{"name": "Archer", "hp": 8, "max_hp": 8, "dmg": 4, "range": 3, "alive": true}, '
+    '{"name": "Tank", "hp": 20, "max_hp": 20, "dmg": 2, "range": 1, "alive": true}], '
+    '"enemy_team_final": [{"name": "Assassin", "hp": 0, "max_hp": 6, "dmg": 7, "range": 1, "alive": false}, '
+    '{"name": "Healer", "hp": 0, "max_hp": 9, "dmg": 1, "range": 2, "alive": false}, '
+    '{"name": "Knight", "hp": 0, "max_hp": 15, "dmg": 3, "range": 1, "alive": false}, '
+    '{"name": "Wizard", "hp": 0, "max_hp": 7, "dmg": 6, "range": 2, "alive": false}], '
+    '"battle_log": ["=== TRẬN ĐẤU BẮT ĐẦU ===", "Team 1: Warrior, Mage, Archer, Tank", '
+    '"Team 2: Assassin, Healer, Knight, Wizard", "", "Trận đấu kéo dài quá lâu - HÒA!"]}'
+    '"🏆 Team 2 THẮNG!"]}"🏆 Team 1 THẮNG!"]}'
+    '"", "--- ROUND 1 ---", "Team 1 tấn công:", '
+    '"  Warrior tấn công Assassin gây 4 sát thương - Assassin đã bị tiêu diệt!", '
+    '"Team 2 phản công:", "  Knight tấn công Tank gây 3 sát thương - Tank còn 17/20 HP", '
+    '"  Tank tấn công Tank gây 2 sát thương - Tank còn 18/20 HP", '
+).encode('utf-8')
+
+class FrameError(ValueError):
+    """Dữ liệu nhận được không phải khung tin nhắn hợp lệ (quá lớn, khung nén hỏng...)"""
+
+class FrameTooLarge(FrameError):
+    """Khung tin nhắn vượt quá giới hạn kích thước cho phép"""
+
+def compress_frame(frame, wire_format: str = 'json', level: int = COMPRESSION_LEVEL) -> bytes:
+    """Nén một khung đã mã hóa (bytes hoặc danh sách đoạn của encode_frame_parts) thành khung nén.
+    Mỗi khung được nén độc lập nên gửi được từ nhiều luồng mà không cần trạng thái nén theo kết nối."""
+    if not isinstance(frame, (bytes, bytearray)):
+        frame = b''.join(frame)
+    payload = memoryview(frame)[:-1] if wire_format == 'json' else memoryview(frame)[LENGTH_PREFIX.size:]
+    compressor = zlib.compressobj(level, zdict=COMPRESSION_DICTIONARY)
+    data = compressor.compress(payload) + compressor.flush()
+    return LENGTH_PREFIX.pack(len(data) | COMPRESSED_FLAG) + data
+
+def decompress_payload(data, max_size: int = MAX_FRAME_SIZE) -> bytes:
+    """Giải nén nội dung khung nén; kích thước sau giải nén cũng bị giới hạn bởi max_size"""
+    decompressor = zlib.decompressobj(zdict=COMPRESSION_DICTIONARY)
+    try:
+        frame = decompressor.decompress(data, max_size + 1)
+    except zlib.error as e:
+        raise FrameError(f'Khung nén không hợp lệ: {e}') from None
+    if len(frame) > max_size:
+        raise FrameTooLarge(f'Khung tin nhắn vượt quá {max_size} bytes sau khi giải nén')
+    if not decompressor.eof:
+        raise FrameError('Khung nén không hợp lệ: thiếu dữ liệu')
+    return frame
+
+def encode_frame(message: Dict[str, Any], ensure_ascii: bool = False) -> bytes:
+    return (json.dumps(message, ensure_ascii=ensure_ascii) + "\n").encode('utf-8')
+
+def encode_frame_raw(message: Dict[str, Any], raw_fields: Dict[str, bytes], ensure_ascii: bool = False) -> bytes:
+    """Như encode_frame, nhưng giá trị trong raw_fields đã được mã hóa JSON sẵn nên chỉ việc ghép vào"""
+    return b''.join(encode_frame_parts(message, raw_fields, ensure_ascii=ensure_ascii))
+
+def encode_frame_parts(message: Dict[str, Any], raw_fields: Dict[str, bytes], wire_format: str = 'json',
+                       codec: Optional['BinaryCodec'] = None, ensure_ascii: bool = False) -> List[bytes]:
+    """Khung tin nhắn dưới dạng danh sách đoạn byte để gửi bằng sendmsg (scatter/gather).
+    
+    Chỉ phần message được mã hóa mới; giá trị trong raw_fields (mã hóa sẵn bằng encode_value
+    cùng định dạng) được đưa nguyên vào danh sách, không ghép hay chép lại.
+    """
+    if wire_format == 'binary':
+        parts = codec.pack_map_parts(message, raw_fields)
+        return [LENGTH_PREFIX.pack(sum(len(p) for p in parts))] + parts
+    
+    parts = [json.dumps(message, ensure_ascii=ensure_ascii)[:-1].encode('utf-8')]
+    for key, raw in raw_fields.items():
+        separator = b', ' if len(parts) > 1 or message else b''
+        parts.append(separator + json.dumps(key).encode('utf-8') + b': ')
+        parts.append(raw)
+    parts.append(b'}\n')
+    return parts
+
+def encode_value(value: Any, wire_format: str = 'json', codec: Optional['BinaryCodec'] = None,
+                 ensure_ascii: bool = False) -> bytes:
+    """Mã hóa một giá trị để dùng lại làm raw_fields của nhiều khung"""
+    if wire_format == 'binary':
+        return codec.pack(value)
+    return json.dumps(value, ensure_ascii=ensure_ascii).encode('utf-8')
+
+def decode_frame(frame: bytes) -> Dict[str, Any]:
+    return json.loads(frame)
+
+def encode_message(message: Dict[str, Any], wire_format: str = 'json', codec: Optional['BinaryCodec'] = None,
+                   ensure_ascii: bool = False) -> bytes:
+    """Mã hóa tin nhắn thành khung theo định dạng đã thỏa thuận"""
+    if wire_format == 'binary':
+        payload = codec.pack(message)
+        return LENGTH_PREFIX.pack(len(payload)) + payload
+    return encode_frame(message, ensure_ascii)
+
+def decode_message(frame: bytes, wire_format: str = 'json', codec: Optional['BinaryCodec'] = None) -> Dict[str, Any]:
+    if wire_format == 'binary':
+        return codec.unpack(frame)
+    return decode_frame(frame)
+
+class FrameDecoder:
+    """Bộ đọc khung tăng dần: nhận dữ liệu thô từ recv() và tách ra từng khung hoàn chỉnh.
+    
+    Vị trí đã quét được ghi nhớ nên dữ liệu của một khung lớn đến qua nhiều lần recv()
+    không bị quét lại từ đầu. wire_format có thể đổi giữa hai khung (sau khi bắt tay),
+    phần dữ liệu còn lại trong buffer được đọc theo định dạng mới. Khung nén được nhận ra và
+    giải nén ngay tại đây, người gọi luôn nhận nội dung khung chưa nén.
+    """
+    
+    def __init__(self, max_frame_size: int = MAX_FRAME_SIZE, wire_format: str = 'json'):
+        self.max_frame_size = max_frame_size
+        self.wire_format = wire_format
+        self.buffer = bytearray()
+        self._scanned = 0
+    
+    def feed(self, data: bytes):
+        self.buffer += data
+    
+    def next_frame(self) -> Optional[bytearray]:
+        """Trả về khung kế tiếp (không gồm ký tự xuống dòng / độ dài) hoặc None nếu chưa đủ dữ liệu"""
+        if self.wire_format == 'binary':
+            return self._next_binary_frame()
+        
+        while True:
+            if self.buffer and self.buffer[0] & 0x80:
+                return self._next_binary_frame()
+            
+            end = self.buffer.find(b"\n", self._scanned)
+            if end < 0:
+                self._scanned = len(self.buffer)
+                if self._scanned > self.max_frame_size:
+                    raise FrameTooLarge(f'Khung tin nhắn vượt quá {self.max_frame_size} bytes')
+                return None
+            
+            if end > self.max_frame_size:
+                raise FrameTooLarge(f'Khung tin nhắn vượt quá {self.max_frame_size} bytes')
+            
+            frame = self.buffer[:end]
+            # Xóa ở đầu bytearray không phải chép lại phần còn lại của buffer
+            del self.buffer[:end + 1]
+            self._scanned = 0
+            
+            if frame.strip():
+                return frame
+    
+    def _next_binary_frame(self) -> Optional[bytearray]:
+        if len(self.buffer) < LENGTH_PREFIX.size:
+            return None
+        
+        length, = LENGTH_PREFIX.unpack_from(self.buffer)
+        compressed = length & COMPRESSED_FLAG
+        length &= ~COMPRESSED_FLAG
+        if length > self.max_frame_size:
+            raise FrameTooLarge(f'Khung tin nhắn vượt quá {self.max_frame_size} bytes')
+        
+        end = LENGTH_PREFIX.size + length
+        if len(self.buffer) < end:
+            return None
+        
+        frame = self.buffer[LENGTH_PREFIX.size:end]
+        del self.buffer[:end]
+        if compressed:
+            return decompress_payload(frame, self.max_frame_size)
+        return frame
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self) -> bytearray:
+        frame = self.next_frame()
+        if frame is None:
+            raise StopIteration
+        return frame
+
+class BattleLog:
+    """Log trận đấu dạng sự kiện gọn (round, team tấn công, vị trí tấn công, vị trí mục tiêu,
+    sát thương, bị tiêu diệt) lưu trong mảng số nguyên. Chỉ dựng chuỗi khi cần hiển thị."""
+    
+    FIELDS = 6
+    # Dạng lưu/gửi gọn: mỗi sự kiện 4 byte - round, cờ (team tấn công | bị tiêu diệt |
+    # vị trí tấn công 3 bit | vị trí mục tiêu 3 bit), sát thương
+    EVENT = struct.Struct('>BBH')
+    
+    def __init__(self, team1: List[Any], team2: List[Any]):
+        """team1, team2: danh sách tướng (có thuộc tính name, max_hp)"""
+        self.team1_names = [c.name for c in team1]
+        self.team2_names = [c.name for c in team2]
+        self.team1_max_hp = [c.max_hp for c in team1]
+        self.team2_max_hp = [c.max_hp for c in team2]
+        self.events = array('h')
+        self.winner = None
+    
+    @classmethod
+    def from_parts(cls, team1_names: List[str], team1_max_hp: List[int], team2_names: List[str],
+                   team2_max_hp: List[int], events, winner: Optional[int]) -> 'BattleLog':
+        """Dựng lại log từ các thành phần (dùng khi giải mã khung nhị phân)"""
+        log = cls.__new__(cls)
+        log.team1_names = list(team1_names)
+        log.team2_names = list(team2_names)
+        log.team1_max_hp = list(team1_max_hp)
+        log.team2_max_hp = list(team2_max_hp)
+        log.events = array('h', events)
+        log.winner = winner
+        return log
+    
+    def record(self, round_num: int, side: int, attacker: int, target: int, damage: int, killed: bool):
+        self.events.extend((round_num, side, attacker, target, damage, killed))
+    
+    def __len__(self) -> int:
+        return len(self.events) // self.FIELDS
+    
+    def pack_events(self) -> Optional[bytes]:
+        """Sự kiện dạng EVENT (4 byte mỗi sự kiện); None nếu có giá trị không vừa (đội quá 8 tướng...)"""
+        if len(self.team1_names) > 8 or len(self.team2_names) > 8:
+            return None
+        
+        out = bytearray()
+        pack_event = self.EVENT.pack
+        for round_num, side, attacker, target, damage, killed in self:
+            if not 0 <= round_num <= 0xff or not 0 <= damage <= 0xffff:
+                return None
+            flags = (side - 1) << 7 | bool(killed) << 6 | attacker << 3 | target
+            out += pack_event(round_num, flags, damage)
+        return bytes(out)
+    
+    @classmethod
+    def unpack_events(cls, data) -> array:
+        """Ngược lại của pack_events: mảng sự kiện FIELDS số mỗi sự kiện"""
+        events = array('h')
+        for round_num, flags, damage in cls.EVENT.iter_unpack(data):
+            events.extend((round_num, (flags >> 7) + 1, (flags >> 3) & 7, flags & 7, damage, (flags >> 6) & 1))
+        return events
+    
+    def __iter__(self):
+        events = self.events
+        for i in range(0, len(events), self.FIELDS):
+            yield tuple(events[i:i + self.FIELDS])
+    
+    def rounds(self):
+        """Duyệt log theo từng round: (round, [(team tấn công, vị trí tấn công, vị trí mục tiêu,
+        sát thương, bị tiêu diệt), ...])"""
+        current_round, events = None, []
+        for round_num, side, attacker, target, damage, killed in self:
+            if round_num != current_round and events:
+                yield current_round, events
+                events = []
+            current_round = round_num
+            events.append((side, attacker, target, damage, killed))
+        if events:
+            yield current_round, events
+    
+    def render(self) -> List[str]:
+        """Dựng log dạng văn bản, giống hệt log mà simulate_battle tạo trước đây"""
+        names = {1: self.team1_names, 2: self.team2_names}
+        hp = {1: list(self.team1_max_hp), 2: list(self.team2_max_hp)}
+        max_hp = {1: self.team1_max_hp, 2: self.team2_max_hp}
+        
+        lines = [
+            "=== TRẬN ĐẤU BẮT ĐẦU ===",
+            f"Team 1: {', '.join(self.team1_names)}",
+            f"Team 2: {', '.join(self.team2_names)}",
+            ""
+        ]
+        
+        current_round = None
+        current_side = None
+        for round_num, side, attacker, target, damage, killed in self:
+            if round_num != current_round:
+                if current_side == 2:
+                    lines.append("")
+                lines.append(f"--- ROUND {round_num} ---")
+                current_round = round_num
+                current_side = None
+            
+            if side != current_side:
+                lines.append("Team 1 tấn công:" if side == 1 else "Team 2 phản công:")
+                current_side = side
+            
+            defender = 3 - side
+            attacker_name = names[side][attacker]
+            target_name = names[defender][target]
+            hp[defender][target] = max(hp[defender][target] - damage, 0)
+            
+            line = f"  {attacker_name} tấn công {target_name} gây {damage} sát thương"
+            if killed:
+                line += f" - {target_name} đã bị tiêu diệt!"
+            else:
+                line += f" - {target_name} còn {hp[defender][target]}/{max_hp[defender][target]} HP"
+            lines.append(line)
+        
+        # Round cuối kết thúc sau lượt phản công của team 2 thì có dòng trống
+        if current_side == 2:
+            lines.append("")
+        
+        if self.winner == 1:
+            lines.append("🏆 Team 1 THẮNG!")
+        elif self.winner == 2:
+            lines.append("🏆 Team 2 THẮNG!")
+        else:
+            lines.append("Trận đấu kéo dài quá lâu - HÒA!")
+        
+        return lines
+
+class BinaryCodec:
+    """Mã hóa nhị phân tương thích msgpack (nil, bool, int, float, str, bin, array, map, ext)
+    với hai kiểu ext riêng cho những phần chiếm nhiều byte nhất trong tin nhắn:
+    
+    - EXT_TEAM: danh sách tướng dạng to_dict() có chỉ số khớp danh mục được gửi thành
+      (ID, HP hiện tại) - 3 byte mỗi tướng thay vì ~80 byte JSON
+    - EXT_BATTLE_LOG: BattleLog gửi dạng sự kiện 4 byte (round, cờ, sát thương), bên nhận tự dựng
+      log văn bản nên tin nhắn giải mã ra giống hệt khi dùng JSON
+    
+    Cả hai bên phải dùng cùng danh mục tướng (danh mục trong 'welcome'); phần nào không khớp
+    danh mục thì được mã hóa như dữ liệu thường.
+    
+    Bộ giải mã nhận mọi mã kiểu chuẩn của msgpack (kể cả uint8-64, int8-16, float32, fixext) nên
+    khung do thư viện msgpack bất kỳ tạo ra đều đọc được. Dữ liệu hỏng, khóa map không phải giá trị
+    đơn hay lồng nhau quá MAX_DEPTH tầng đều báo ValueError.
+    """
+    
+    EXT_TEAM = 1
+    EXT_BATTLE_LOG = 2
+    
+    MAX_DEPTH = 32  # số tầng array/map lồng nhau tối đa khi giải mã
+    # Mã kiểu có kích thước cố định: số nguyên, số thực
+    SCALARS = {
+        0xcc: struct.Struct('>B'), 0xcd: struct.Struct('>H'), 0xce: struct.Struct('>I'), 0xcf: struct.Struct('>Q'),
+        0xd0: struct.Struct('>b'), 0xd1: struct.Struct('>h'), 0xd2: struct.Struct('>i'), 0xd3: struct.Struct('>q'),
+        0xca: struct.Struct('>f'), 0xcb: struct.Struct('>d')
+    }
+    FIXEXT_SIZES = {0xd4: 1, 0xd5: 2, 0xd6: 4, 0xd7: 8, 0xd8: 16}
+    
+    TEAM_MEMBER = struct.Struct('>BH')
+    LOG_EVENT = BattleLog.EVENT
+    
+    def __init__(self, champions: List[Dict[str, Any]]):
+        # Chụp lại danh mục: chỉ số tướng thay đổi sau này không làm sai lệch bảng mã đã thỏa thuận
+        self.champions = [dict(c) for c in champions]
+        self.by_name = {c['name']: c for c in self.champions}
+        self.by_id = {c['id']: c for c in self.champions}
+    
+    def pack(self, obj) -> bytes:
+        out = bytearray()
+        self._pack(obj, out)
+        return bytes(out)
+    
+    def pack_map_parts(self, message: Dict[str, Any], raw_fields: Dict[str, bytes]) -> List[bytes]:
+        """Map gồm các khóa của message và raw_fields; giá trị raw_fields đã được pack sẵn"""
+        head = bytearray()
+        self._pack_header(len(message) + len(raw_fields), head, 0x80, 16, None, 0xde, 0xdf)
+        for key, value in message.items():
+            self._pack(key, head)
+            self._pack(value, head)
+        
+        parts = [bytes(head)]
+        for key, raw in raw_fields.items():
+            parts.append(self.pack(key))
+            parts.append(raw)
+        return parts
+    
+    def unpack(self, data: bytes):
+        try:
+            obj, pos = self._unpack(memoryview(data), 0)
+        except (IndexError, KeyError, struct.error) as e:
+            raise ValueError(f'Tin nhắn nhị phân không hợp lệ: {e}')
+        if pos != len(data):
+            raise ValueError('Dữ liệu thừa sau tin nhắn nhị phân')
+        return obj
+    
+    def _pack(self, obj, out: bytearray):
+        if obj is None:
+            out.append(0xc0)
+        elif obj is True:
+            out.append(0xc3)
+        elif obj is False:
+            out.append(0xc2)
+        elif isinstance(obj, int):
+            if 0 <= obj < 0x80:
+                out.append(obj)
+            elif -32 <= obj < 0:
+                out.append(obj & 0xff)
+            elif -0x80000000 <= obj < 0x80000000:
+                out += b'\xd2' + struct.pack('>i', obj)
+            else:
+                out += b'\xd3' + struct.pack('>q', obj)
+        elif isinstance(obj, float):
+            out += b'\xcb' + struct.pack('>d', obj)
+        elif isinstance(obj, str):
+            data = obj.encode('utf-8')
+            self._pack_header(len(data), out, 0xa0, 32, 0xd9, 0xda, 0xdb)
+            out += data
+        elif isinstance(obj, (bytes, bytearray, memoryview)):
+            self._pack_header(len(obj), out, None, 0, 0xc4, 0xc5, 0xc6)
+            out += obj
+        elif isinstance(obj, BattleLog):
+            payload = self._encode_log(obj)
+            if payload is None:
+                self._pack(obj.render(), out)
+            else:
+                self._pack_ext(self.EXT_BATTLE_LOG, payload, out)
+        elif isinstance(obj, (list, tuple)):
+            payload = self._encode_team(obj)
+            if payload is not None:
+                self._pack_ext(self.EXT_TEAM, payload, out)
+                return
+            self._pack_header(len(obj), out, 0x90, 16, None, 0xdc, 0xdd)
+            for item in obj:
+                self._pack(item, out)
+        elif isinstance(obj, dict):
+            self._pack_header(len(obj), out, 0x80, 16, None, 0xde, 0xdf)
+            for key, value in obj.items():
+                self._pack(key, out)
+                self._pack(value, out)
+        else:
+            raise TypeError(f'Không mã hóa được kiểu {type(obj).__name__}')
+    
+    @staticmethod
+    def _pack_header(length: int, out: bytearray, fix: Optional[int], fix_limit: int,
+                     code8: Optional[int], code16: int, code32: int):
+        if fix is not None and length < fix_limit:
+            out.append(fix | length)
+        elif code8 is not None and length < 0x100:
+            out += bytes((code8, length))
+        elif length < 0x10000:
+            out += struct.pack('>BH', code16, length)
+        else:
+            out += struct.pack('>BI', code32, length)
+    
+    @staticmethod
+    def _pack_ext(ext_type: int, payload: bytes, out: bytearray):
+        length = len(payload)
+        if length < 0x100:
+            out += struct.pack('>BBb', 0xc7, length, ext_type)
+        elif length < 0x10000:
+            out += struct.pack('>BHb', 0xc8, length, ext_type)
+        else:
+            out += struct.pack('>BIb', 0xc9, length, ext_type)
+        out += payload
+    
+    def _catalog_id(self, name, max_hp: int) -> Optional[int]:
+        champion = self.by_name.get(name) if isinstance(name, str) else None
+        if champion is None or champion['hp'] != max_hp or champion['id'] > 0xff:
+            return None
+        return champion['id']
+    
+    def _encode_team(self, team) -> Optional[bytes]:
+        """(ID, HP) của từng tướng, hoặc None nếu danh sách không phải đội hình khớp danh mục"""
+        if not team or len(team) > 0xff or not isinstance(team[0], dict):
+            return None
+        
+        parts = [bytes((len(team),))]
+        for info in team:
+            if not isinstance(info, dict) or len(info) != 6:
+                return None
+            champion_id = self._catalog_id(info.get('name'), info.get('max_hp'))
+            if champion_id is None:
+                return None
+            champion = self.by_id[champion_id]
+            hp = info['hp']
+            if (info['dmg'] != champion['dmg'] or info['range'] != champion['range']
+                    or type(hp) is not int or not 0 <= hp <= info['max_hp'] or info['alive'] is not (hp > 0)):
+                return None
+            parts.append(self.TEAM_MEMBER.pack(champion_id, hp))
+        return b''.join(parts)
+    
+    def _decode_team(self, payload) -> List[Dict[str, Any]]:
+        team = []
+        for i in range(payload[0]):
+            champion_id, hp = self.TEAM_MEMBER.unpack_from(payload, 1 + i * self.TEAM_MEMBER.size)
+            champion = self.by_id[champion_id]
+            # Cùng thứ tự khóa với Champion.to_dict()
+            team.append({
+                'name': champion['name'],
+                'hp': hp,
+                'max_hp': champion['hp'],
+                'dmg': champion['dmg'],
+                'range': champion['range'],
+                'alive': hp > 0
+            })
+        return team
+    
+    def _encode_log(self, log: BattleLog) -> Optional[bytes]:
+        """Đầu: người thắng, số tướng mỗi đội, ID tướng. Sau đó các sự kiện dạng BattleLog.EVENT"""
+        events = log.pack_events()
+        if events is None:
+            return None
+        
+        ids = []
+        for names, max_hps in ((log.team1_names, log.team1_max_hp), (log.team2_names, log.team2_max_hp)):
+            for name, max_hp in zip(names, max_hps):
+                champion_id = self._catalog_id(name, max_hp)
+                if champion_id is None:
+                    return None
+                ids.append(champion_id)
+        
+        return bytes((log.winner or 0, len(log.team1_names), len(log.team2_names))) + bytes(ids) + events
+    
+    def _decode_log(self, payload) -> List[str]:
+        winner, size1, size2 = payload[0], payload[1], payload[2]
+        ids = payload[3:3 + size1 + size2]
+        team = [self.by_id[i] for i in ids]
+        
+        log = BattleLog.from_parts(
+            [c['name'] for c in team[:size1]], [c['hp'] for c in team[:size1]],
+            [c['name'] for c in team[size1:]], [c['hp'] for c in team[size1:]],
+            BattleLog.unpack_events(payload[3 + size1 + size2:]), winner or None
+        )
+        return log.render()
+    
+    def _unpack(self, data: memoryview, pos: int, depth: int = 0):
+        code = data[pos]
+        pos += 1
+        
+        if code < 0x80:
+            return code, pos
+        if code >= 0xe0:
+            return code - 0x100, pos
+        if 0xa0 <= code <= 0xbf:
+            return self._unpack_str(data, pos, code & 0x1f)
+        if 0x90 <= code <= 0x9f:
+            return self._unpack_array(data, pos, code & 0x0f, depth)
+        if 0x80 <= code <= 0x8f:
+            return self._unpack_map(data, pos, code & 0x0f, depth)
+        
+        if code == 0xc0:
+            return None, pos
+        if code == 0xc2:
+            return False, pos
+        if code == 0xc3:
+            return True, pos
+        scalar = self.SCALARS.get(code)
+        if scalar is not None:
+            return scalar.unpack_from(data, pos)[0], pos + scalar.size
+        if code in self.FIXEXT_SIZES:
+            return self._unpack_ext(data, pos, self.FIXEXT_SIZES[code])
+        
+        sizes = {0xd9: '>B', 0xda: '>H', 0xdb: '>I', 0xc4: '>B', 0xc5: '>H', 0xc6: '>I',
+                 0xdc: '>H', 0xdd: '>I', 0xde: '>H', 0xdf: '>I', 0xc7: '>B', 0xc8: '>H', 0xc9: '>I'}
+        if code not in sizes:
+            raise ValueError(f'Mã kiểu nhị phân không hỗ trợ: {code:#x}')
+        length, = struct.unpack_from(sizes[code], data, pos)
+        pos += struct.calcsize(sizes[code])
+        
+        if code in (0xd9, 0xda, 0xdb):
+            return self._unpack_str(data, pos, length)
+        if code in (0xc4, 0xc5, 0xc6):
+            return bytes(data[pos:pos + length]), pos + length
+        if code in (0xdc, 0xdd):
+            return self._unpack_array(data, pos, length, depth)
+        if code in (0xde, 0xdf):
+            return self._unpack_map(data, pos, length, depth)
+        return self._unpack_ext(data, pos, length)
+    
+    def _unpack_ext(self, data: memoryview, pos: int, length: int):
+        ext_type = struct.unpack_from('>b', data, pos)[0]
+        pos += 1
+        payload = data[pos:pos + length]
+        if len(payload) != length:
+            raise ValueError('Tin nhắn nhị phân bị cắt cụt')
+        if ext_type == self.EXT_TEAM:
+            return self._decode_team(payload), pos + length
+        if ext_type == self.EXT_BATTLE_LOG:
+            return self._decode_log(payload), pos + length
+        raise ValueError(f'Kiểu ext không hỗ trợ: {ext_type}')
+    
+    @staticmethod
+    def _unpack_str(data: memoryview, pos: int, length: int):
+        end = pos + length
+        if end > len(data):
+            raise ValueError('Tin nhắn nhị phân bị cắt cụt')
+        return str(data[pos:end], 'utf-8'), end
+    
+    def _unpack_array(self, data: memoryview, pos: int, length: int, depth: int):
+        if depth >= self.MAX_DEPTH:
+            raise ValueError('Tin nhắn nhị phân lồng nhau quá sâu')
+        items = []
+        for _ in range(length):
+            item, pos = self._unpack(data, pos, depth + 1)
+            items.append(item)
+        return items, pos
+    
+    def _unpack_map(self, data: memoryview, pos: int, length: int, depth: int):
+        if depth >= self.MAX_DEPTH:
+            raise ValueError('Tin nhắn nhị phân lồng nhau quá sâu')
+        result = {}
+        for _ in range(length):
+            key, pos = self._unpack(data, pos, depth + 1)
+            if isinstance(key, (list, dict)):
+                raise ValueError('Khóa của map phải là giá trị đơn')
+            result[key], pos = self._unpack(data, pos, depth + 1)
+        return result, pos
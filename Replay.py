@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battle Chess Replay - File replay gọn và công cụ kiểm tra replay song song
+Nhóm 13
+
+simulate_battle là tất định nên một trận chỉ cần lưu hai đội hình (ID tướng) cùng danh mục
+chỉ số tướng lúc thi đấu; kết quả (người thắng, số round, HP cuối) được lưu kèm để kiểm tra.
+Mô phỏng lại mọi replay và so sánh kết quả giúp phát hiện thay đổi ngoài ý muốn của engine
+sau khi sửa luật hoặc chỉ số tướng.
+
+Định dạng file (mỗi file một phiên bản chỉ số tướng):
+    header 32 bytes: magic 'BCRP', version, số tướng, số tướng mỗi đội, kích thước bản ghi,
+                     phiên bản chỉ số tướng (16 ký tự), độ dài danh mục
+    danh mục tướng (JSON UTF-8)
+    các bản ghi nối tiếp, mỗi bản ghi:
+        K bytes ID tướng team 1, K bytes ID tướng team 2
+        1 byte  winner << 6 | rounds
+        K bytes HP cuối của team 1, K bytes HP cuối của team 2
+
+Kiểm tra:   python Replay.py verify replays/*.bcr --workers 8
+Xem lại:    python Replay.py show replays/replays-<phiên bản>.bcr 12
+"""
+
+import os
+import sys
+import json
+import time
+import struct
+import argparse
+import threading
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Sequence
+
+MAGIC = b'BCRP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHH16sI')
+
+Replay = namedtuple('Replay', 'team1 team2 winner rounds team1_hp team2_hp')
+
+def record_size(team_size: int) -> int:
+    return 4 * team_size + 1
+
+def pack_replay(team1_ids: Sequence[int], team2_ids: Sequence[int], winner: int, rounds: int,
+                team1_hp: Sequence[int], team2_hp: Sequence[int]) -> bytes:
+    return bytes(team1_ids) + bytes(team2_ids) + bytes((winner << 6 | rounds,)) + bytes(team1_hp) + bytes(team2_hp)
+
+def unpack_replay(record, team_size: int) -> Replay:
+    k = team_size
+    return Replay(
+        list(record[:k]), list(record[k:2 * k]),
+        record[2 * k] >> 6, record[2 * k] & 0x3F,
+        list(record[2 * k + 1:3 * k + 1]), list(record[3 * k + 1:4 * k + 1])
+    )
+
+class ReplayFile:
+    """Đọc một file replay; bản ghi cuối bị ghi dở (server dừng đột ngột) được bỏ qua"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            data = f.read()
+    
+        if len(data) < HEADER.size:
+            raise ValueError(f'{path} không phải file replay hợp lệ')
+        magic, version, num_champions, team_size, size, stat_version, catalog_length = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION or size != record_size(team_size):
+            raise ValueError(f'{path} không phải file replay hợp lệ')
+    
+        self.num_champions = num_champions
+        self.team_size = team_size
+        self.record_size = size
+        self.stat_version = stat_version.decode('ascii')
+        self.data_offset = HEADER.size + catalog_length
+        self.champions = json.loads(data[HEADER.size:self.data_offset].decode('utf-8'))
+        self.records = memoryview(data)[self.data_offset:]
+        self.records = self.records[:len(self.records) - len(self.records) % size]
+    
+    def __len__(self) -> int:
+        return len(self.records) // self.record_size
+    
+    def __getitem__(self, index: int) -> Replay:
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start = index * self.record_size
+        return unpack_replay(self.records[start:start + self.record_size], self.team_size)
+    
+    def __iter__(self):
+        for start in range(0, len(self.records), self.record_size):
+            yield unpack_replay(self.records[start:start + self.record_size], self.team_size)
+
+class ReplayWriter:
+    """Ghi replay của server vào thư mục, mỗi phiên bản chỉ số tướng một file (ghi nối tiếp).
+    
+    write() chỉ chép vài chục byte vào buffer của file nên không làm chậm trận đấu; buffer được
+    đẩy xuống đĩa khi đầy, sau mỗi flush_interval giây và khi đóng.
+    """
+    
+    def __init__(self, directory: str, flush_interval: float = 1.0, clock=time.monotonic):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.written = 0
+        self.skipped = 0
+        self._file = None
+        self._stat_version = None
+        self._last_flush = clock()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+    
+    def path_for(self, stat_version: str) -> str:
+        return os.path.join(self.directory, f'replays-{stat_version}.bcr')
+    
+    def _open(self, stat_version: str, champions: List[Dict[str, Any]], team_size: int):
+        if self._file is not None:
+            self._file.close()
+    
+        path = self.path_for(stat_version)
+        size = record_size(team_size)
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER.size:
+            existing = ReplayFile(path)
+            if existing.team_size != team_size:
+                raise ValueError(f'{path} dùng đội hình {existing.team_size} tướng')
+            # Cắt bản ghi ghi dở nếu lần chạy trước bị dừng đột ngột
+            self._file = open(path, 'r+b')
+            self._file.truncate(existing.data_offset + len(existing) * size)
+            self._file.seek(0, os.SEEK_END)
+        else:
+            catalog = json.dumps([{k: c[k] for k in ('id', 'name', 'hp', 'dmg', 'range')} for c in champions],
+                                 ensure_ascii=False).encode('utf-8')
+            self._file = open(path, 'wb')
+            self._file.write(HEADER.pack(MAGIC, VERSION, len(champions), team_size, size,
+                                         stat_version.encode('ascii'), len(catalog)))
+            self._file.write(catalog)
+        self._stat_version = stat_version
+    
+    def write(self, stat_version: str, champions: List[Dict[str, Any]], team1_ids: Sequence[int],
+              team2_ids: Sequence[int], winner: int, rounds: int, team1_hp: Sequence[int], team2_hp: Sequence[int]):
+        """champions: danh mục lúc thi đấu, chỉ được đọc khi phải mở file cho phiên bản mới"""
+        try:
+            record = pack_replay(team1_ids, team2_ids, winner, rounds, team1_hp, team2_hp)
+        except ValueError:
+            # ID hoặc HP vượt quá 1 byte: không lưu được dạng gọn
+            self.skipped += 1
+            return
+        with self._lock:
+            if stat_version != self._stat_version:
+                self._open(stat_version, champions, len(team1_ids))
+            self._file.write(record)
+            self.written += 1
+    
+            now = self.clock()
+            if now - self._last_flush >= self.flush_interval:
+                self._file.flush()
+                self._last_flush = now
+    
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._stat_version = None
+
+def _verify_chunk(champions: List[Dict[str, Any]], team_size: int, records: bytes, first_index: int,
+                  max_reported: int):
+    """Chạy trong worker: mô phỏng lại các bản ghi bằng engine đầy đủ (từng round) và bằng
+    fast_resolve. Trả về (số trận, số sai lệch so với bản ghi, vài sai lệch đầu tiên,
+    số trận hai engine cho kết quả khác nhau, vài trận như vậy đầu tiên)"""
+    from Server import BattleEngine, Champion
+    
+    stats = [(c['name'], c['hp'], c['dmg'], c['range']) for c in champions]
+    size = record_size(team_size)
+    mismatches, reported = 0, []
+    engine_mismatches, engine_reported = 0, []
+    # Cặp đội hình lặp lại (đội hình phổ biến) chỉ cần mô phỏng một lần: kết quả là tất định
+    outcomes = {}
+    
+    def outcome_of(result):
+        return (result['winner'], result['rounds'],
+                [c['hp'] for c in result['team1_final']], [c['hp'] for c in result['team2_final']])
+    
+    for offset in range(0, len(records), size):
+        record = records[offset:offset + size]
+        replay = unpack_replay(record, team_size)
+        key = record[:2 * team_size]
+        outcome = outcomes.get(key)
+        if outcome is None:
+            team1 = [Champion(*stats[i]) for i in replay.team1]
+            team2 = [Champion(*stats[i]) for i in replay.team2]
+            # Engine đầy đủ là chuẩn để so với bản ghi; fast_resolve phải cho kết quả giống hệt
+            outcome = outcomes[key] = outcome_of(BattleEngine.simulate_battle(team1, team2))
+            fast = outcome_of(BattleEngine.fast_resolve(team1, team2))
+            if fast != outcome:
+                engine_mismatches += 1
+                if len(engine_reported) < max_reported:
+                    engine_reported.append((first_index + offset // size, Replay(replay.team1, replay.team2, *outcome),
+                                            Replay(replay.team1, replay.team2, *fast)))
+    
+        actual = Replay(replay.team1, replay.team2, *outcome)
+        if actual != replay:
+            mismatches += 1
+            if len(reported) < max_reported:
+                reported.append((first_index + offset // size, replay, actual))
+    
+    return len(records) // size, mismatches, reported, engine_mismatches, engine_reported
+
+def verify_file(replays: ReplayFile, executor: ProcessPoolExecutor, champions: Optional[List[Dict[str, Any]]] = None,
+                chunk_records: int = 20000, max_reported: int = 10) -> Dict[str, Any]:
+    """Mô phỏng lại mọi replay trên pool tiến trình. champions: danh mục dùng để mô phỏng lại
+    (mặc định danh mục ghi trong file - kiểm tra engine; danh mục hiện tại - xem trận nào đổi kết quả)"""
+    champions = champions or replays.champions
+    # Chia đủ nhỏ để mọi worker có việc, kể cả với file ít replay
+    workers = getattr(executor, '_max_workers', 1)
+    chunk_records = max(1, min(chunk_records, -(-len(replays) // (4 * workers))))
+    chunk_bytes = chunk_records * replays.record_size
+    futures = [
+        executor.submit(_verify_chunk, champions, replays.team_size, bytes(replays.records[start:start + chunk_bytes]),
+                        start // replays.record_size, max_reported)
+        for start in range(0, len(replays.records), chunk_bytes)
+    ]
+    
+    checked, mismatches, reported = 0, 0, []
+    engine_mismatches, engine_reported = 0, []
+    for future in futures:
+        count, bad, examples, engine_bad, engine_examples = future.result()
+        checked += count
+        mismatches += bad
+        reported.extend(examples[:max_reported - len(reported)])
+        engine_mismatches += engine_bad
+        engine_reported.extend(engine_examples[:max_reported - len(engine_reported)])
+    return {'checked': checked, 'mismatches': mismatches, 'examples': reported,
+            'engine_mismatches': engine_mismatches, 'engine_examples': engine_reported}
+
+def describe(replay: Replay, names: Dict[int, str]) -> str:
+    result = f"Team {replay.winner} thắng" if replay.winner else "Hòa"
+    return (f"{', '.join(names[i] for i in replay.team1)} vs {', '.join(names[i] for i in replay.team2)}: "
+            f"{result} sau {replay.rounds} round, HP cuối {replay.team1_hp} / {replay.team2_hp}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='File replay trận đấu')
+    sub = parser.add_subparsers(dest='command', required=True)
+    
+    verify = sub.add_parser('verify', help='mô phỏng lại và so sánh kết quả')
+    verify.add_argument('paths', nargs='+')
+    verify.add_argument('--workers', type=int, default=None, help='số tiến trình (mặc định: số core)')
+    verify.add_argument('--champions', default=None,
+                        help='mô phỏng lại bằng danh mục tướng này thay cho danh mục ghi trong file')
+    
+    show = sub.add_parser('show', help='xem log của một replay')
+    show.add_argument('path')
+    show.add_argument('index', type=int)
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == 'show':
+        from Server import BattleEngine, Champion
+    
+        replays = ReplayFile(args.path)
+        replay = replays[args.index]
+        stats = {c['id']: c for c in replays.champions}
+        team1 = [Champion(stats[i]['name'], stats[i]['hp'], stats[i]['dmg'], stats[i]['range']) for i in replay.team1]
+        team2 = [Champion(stats[i]['name'], stats[i]['hp'], stats[i]['dmg'], stats[i]['range']) for i in replay.team2]
+        print(describe(replay, {i: c['name'] for i, c in stats.items()}))
+        print('\n'.join(BattleEngine.simulate_battle(team1, team2)['log'].render()))
+        return 0
+    
+    champions = None
+    if args.champions:
+        with open(args.champions, encoding='utf-8') as f:
+            champions = json.load(f)
+    
+    failed = False
+    executor = ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context('spawn'))
+    with executor:
+        for path in args.paths:
+            replays = ReplayFile(path)
+            started = time.perf_counter()
+            report = verify_file(replays, executor, champions)
+            elapsed = time.perf_counter() - started
+    
+            icon = '✅' if report['mismatches'] == 0 and report['engine_mismatches'] == 0 else '❌'
+            print(f"{icon} {path}: {report['checked']:,} replay, {report['mismatches']:,} sai lệch, "
+                  f"{report['engine_mismatches']:,} trận fast_resolve khác engine đầy đủ "
+                  f"({report['checked'] / elapsed:,.0f} replay/s)")
+            names = {c['id']: c['name'] for c in replays.champions}
+            for index, expected, actual in report['examples']:
+                print(f"   #{index}: đã lưu  {describe(expected, names)}")
+                print(f"   {' ' * len(str(index))}  mô phỏng {describe(actual, names)}")
+            for index, full, fast in report['engine_examples']:
+                print(f"   #{index}: engine đầy đủ {describe(full, names)}")
+                print(f"   {' ' * len(str(index))}  fast_resolve  {describe(fast, names)}")
+            failed = failed or report['mismatches'] > 0 or report['engine_mismatches'] > 0
+    
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
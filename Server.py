@@ -1,351 +1,1894 @@
-﻿#!/usr/bin/env python3
-# -*- coding: utf-8 -*-
-"""
-Battle Chess Server - Multi Client Server
-Nhóm 13
-"""
-
-import socket
-import threading
-import json
-import time
-import random
-from typing import List, Dict, Any
-
-class Champion:
-    def __init__(self, name: str, hp: int, dmg: int, range_val: int = 1):
-        self.name = name
-        self.max_hp = hp
-        self.hp = hp
-        self.dmg = dmg
-        self.range = range_val
-        self.alive = True
-    
-    def take_damage(self, damage: int):
-        self.hp -= damage
-        if self.hp <= 0:
-            self.hp = 0
-            self.alive = False
-    
-    def attack(self, target: 'Champion') -> str:
-        if not self.alive:
-            return f"{self.name} đã chết, không thể tấn công"
-        
-        if not target.alive:
-            return f"Mục tiêu {target.name} đã chết"
-        
-        target.take_damage(self.dmg)
-        result = f"{self.name} tấn công {target.name} gây {self.dmg} sát thương"
-        
-        if not target.alive:
-            result += f" - {target.name} đã bị tiêu diệt!"
-        else:
-            result += f" - {target.name} còn {target.hp}/{target.max_hp} HP"
-        
-        return result
-    
-    def to_dict(self) -> Dict[str, Any]:
-        return {
-            'name': self.name,
-            'hp': self.hp,
-            'max_hp': self.max_hp,
-            'dmg': self.dmg,
-            'range': self.range,
-            'alive': self.alive
-        }
-
-class BattleEngine:
-    
-    @staticmethod
-    def simulate_battle(team1: List[Champion], team2: List[Champion]) -> Dict[str, Any]:
-        battle_log = []
-        round_num = 1
-        
-        # Reset trạng thái tất cả tướng
-        for champion in team1 + team2:
-            champion.hp = champion.max_hp
-            champion.alive = True
-        
-        battle_log.append("=== TRẬN ĐẤU BẮT ĐẦU ===")
-        battle_log.append(f"Team 1: {', '.join([c.name for c in team1])}")
-        battle_log.append(f"Team 2: {', '.join([c.name for c in team2])}")
-        battle_log.append("")
-        
-        while True:
-            # Kiểm tra điều kiện kết thúc
-            team1_alive = [c for c in team1 if c.alive]
-            team2_alive = [c for c in team2 if c.alive]
-            
-            if not team1_alive:
-                battle_log.append("🏆 Team 2 THẮNG!")
-                return {
-                    'winner': 2,
-                    'log': battle_log,
-                    'team1_final': [c.to_dict() for c in team1],
-                    'team2_final': [c.to_dict() for c in team2]
-                }
-            
-            if not team2_alive:
-                battle_log.append("🏆 Team 1 THẮNG!")
-                return {
-                    'winner': 1,
-                    'log': battle_log,
-                    'team1_final': [c.to_dict() for c in team1],
-                    'team2_final': [c.to_dict() for c in team2]
-                }
-            
-            battle_log.append(f"--- ROUND {round_num} ---")
-            
-            battle_log.append("Team 1 tấn công:")
-            for attacker in team1_alive:
-                if team2_alive:
-                    target = team2_alive[0]
-                    result = attacker.attack(target)
-                    battle_log.append(f"  {result}")
-                    
-                    team2_alive = [c for c in team2 if c.alive]
-            
-            if not team2_alive:
-                continue
-            
-            battle_log.append("Team 2 phản công:")
-            for attacker in team2_alive:
-                if team1_alive:
-                    target = team1_alive[0]
-                    result = attacker.attack(target)
-                    battle_log.append(f"  {result}")
-                    
-                    team1_alive = [c for c in team1 if c.alive]
-            
-            battle_log.append("")
-            round_num += 1
-            
-            if round_num > 50:
-                battle_log.append("Trận đấu kéo dài quá lâu - HÒA!")
-                return {
-                    'winner': 0,
-                    'log': battle_log,
-                    'team1_final': [c.to_dict() for c in team1],
-                    'team2_final': [c.to_dict() for c in team2]
-                }
-
-class GameServer:
-    
-    def __init__(self, host='localhost', port=8888):
-        self.host = host
-        self.port = port
-        self.clients = {}  # {client_id: {'socket': socket, 'team': []}}
-        self.waiting_clients = []
-        self.client_counter = 0
-        
-        self.available_champions = [
-            {'name': 'Warrior', 'hp': 12, 'dmg': 4, 'range': 1},
-            {'name': 'Mage', 'hp': 6, 'dmg': 5, 'range': 2},
-            {'name': 'Archer', 'hp': 8, 'dmg': 4, 'range': 3},
-            {'name': 'Tank', 'hp': 20, 'dmg': 2, 'range': 1},
-            {'name': 'Assassin', 'hp': 6, 'dmg': 7, 'range': 1},
-            {'name': 'Healer', 'hp': 9, 'dmg': 1, 'range': 2},
-            {'name': 'Knight', 'hp': 15, 'dmg': 3, 'range': 1},
-            {'name': 'Wizard', 'hp': 7, 'dmg': 6, 'range': 2}
-        ]
-    
-    def start_server(self):
-        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        
-        try:
-            server_socket.bind((self.host, self.port))
-            server_socket.listen(10)
-            print(f"🎮 Battle Chess Server đang chạy tại {self.host}:{self.port}")
-            print("Đang chờ client kết nối...")
-            
-            while True:
-                client_socket, addr = server_socket.accept()
-                self.client_counter += 1
-                client_id = f"client_{self.client_counter}"
-                
-                print(f"✅ Client {client_id} kết nối từ {addr}")
-                
-                client_thread = threading.Thread(
-                    target=self.handle_client,
-                    args=(client_socket, client_id)
-                )
-                client_thread.daemon = True
-                client_thread.start()
-                
-        except Exception as e:
-            print(f"❌ Lỗi server: {e}")
-        finally:
-            server_socket.close()
-    
-    def handle_client(self, client_socket: socket.socket, client_id: str):
-        try:
-            self.clients[client_id] = {'socket': client_socket, 'team': []}
-            
-            welcome_msg = {
-                'type': 'welcome',
-                'message': f'Chào mừng {client_id}!',
-                'champions': self.available_champions
-            }
-            self.send_message(client_socket, welcome_msg)
-            
-            while True:
-                data = client_socket.recv(4096)
-                if not data:
-                    break
-                
-                try:
-                    message = json.loads(data.decode('utf-8'))
-                    self.process_message(client_id, message)
-                except json.JSONDecodeError:
-                    self.send_message(client_socket, {
-                        'type': 'error',
-                        'message': 'Định dạng JSON không hợp lệ'
-                    })
-                
-        except Exception as e:
-            print(f"❌ Lỗi khi xử lý client {client_id}: {e}")
-        finally:
-            self.disconnect_client(client_id)
-    
-    def process_message(self, client_id: str, message: Dict[str, Any]):
-        msg_type = message.get('type')
-        
-        if msg_type == 'select_team':
-            self.handle_team_selection(client_id, message.get('team', []))
-        elif msg_type == 'ready_to_battle':
-            self.handle_ready_to_battle(client_id)
-        else:
-            self.send_message(self.clients[client_id]['socket'], {
-                'type': 'error',
-                'message': f'Loại tin nhắn không hợp lệ: {msg_type}'
-            })
-    
-    def handle_team_selection(self, client_id: str, selected_team: List[str]):
-        if len(selected_team) != 4:
-            self.send_message(self.clients[client_id]['socket'], {
-                'type': 'error',
-                'message': 'Bạn phải chọn đúng 4 tướng!'
-            })
-            return
-        
-        team = []
-        champion_names = [c['name'] for c in self.available_champions]
-        
-        for champion_name in selected_team:
-            if champion_name not in champion_names:
-                self.send_message(self.clients[client_id]['socket'], {
-                    'type': 'error',
-                    'message': f'Tướng {champion_name} không tồn tại!'
-                })
-                return
-            
-            champion_info = next(c for c in self.available_champions if c['name'] == champion_name)
-            champion = Champion(
-                champion_info['name'],
-                champion_info['hp'],
-                champion_info['dmg'],
-                champion_info['range']
-            )
-            team.append(champion)
-        
-        self.clients[client_id]['team'] = team
-        
-        self.send_message(self.clients[client_id]['socket'], {
-            'type': 'team_confirmed',
-            'message': f'Đã chọn đội hình: {", ".join(selected_team)}',
-            'team': [c.to_dict() for c in team]
-        })
-    
-    def handle_ready_to_battle(self, client_id: str):
-        """Xử lý khi client sẵn sàng chiến đấu"""
-        if not self.clients[client_id]['team']:
-            self.send_message(self.clients[client_id]['socket'], {
-                'type': 'error',
-                'message': 'Bạn chưa chọn đội hình!'
-            })
-            return
-        
-        if client_id not in self.waiting_clients:
-            self.waiting_clients.append(client_id)
-        
-        self.send_message(self.clients[client_id]['socket'], {
-            'type': 'waiting',
-            'message': f'Đang chờ đối thủ... ({len(self.waiting_clients)}/2)'
-        })
-        
-        if len(self.waiting_clients) >= 2:
-            self.start_battle()
-    
-    def start_battle(self):
-        """Bắt đầu trận đấu giữa 2 client"""
-        client1_id = self.waiting_clients.pop(0)
-        client2_id = self.waiting_clients.pop(0)
-        
-        client1 = self.clients[client1_id]
-        client2 = self.clients[client2_id]
-        
-        print(f"⚔️ Bắt đầu trận đấu: {client1_id} vs {client2_id}")
-        
-        for client_id, opponent_id in [(client1_id, client2_id), (client2_id, client1_id)]:
-            self.send_message(self.clients[client_id]['socket'], {
-                'type': 'battle_start',
-                'message': f'Trận đấu bắt đầu! Đối thủ: {opponent_id}',
-                'your_team': [c.to_dict() for c in self.clients[client_id]['team']],
-                'enemy_team': [c.to_dict() for c in self.clients[opponent_id]['team']]
-            })
-        
-        battle_result = BattleEngine.simulate_battle(client1['team'], client2['team'])
-        
-        self.send_battle_result(client1_id, client2_id, battle_result)
-    
-    def send_battle_result(self, client1_id: str, client2_id: str, result: Dict[str, Any]):
-        winner = result['winner']
-        
-        client1_result = {
-            'type': 'battle_result',
-            'winner': winner,
-            'your_result': 'win' if winner == 1 else 'lose' if winner == 2 else 'draw',
-            'battle_log': result['log'],
-            'your_team_final': result['team1_final'],
-            'enemy_team_final': result['team2_final']
-        }
-        self.send_message(self.clients[client1_id]['socket'], client1_result)
-        
-        client2_result = {
-            'type': 'battle_result',
-            'winner': winner,
-            'your_result': 'win' if winner == 2 else 'lose' if winner == 1 else 'draw',
-            'battle_log': result['log'],
-            'your_team_final': result['team2_final'],
-            'enemy_team_final': result['team1_final']
-        }
-        self.send_message(self.clients[client2_id]['socket'], client2_result)
-        
-        print(f"✅ Trận đấu kết thúc: {client1_id} vs {client2_id} - Winner: Team {winner}")
-    
-    def send_message(self, client_socket, message):
-        try:
-            client_socket.sendall((json.dumps(message) + "\n").encode())
-        except:
-            print("Lỗi khi gửi tin nhắn")
-    
-    def disconnect_client(self, client_id: str):
-        if client_id in self.clients:
-            try:
-                self.clients[client_id]['socket'].close()
-            except:
-                pass
-            del self.clients[client_id]
-        
-        if client_id in self.waiting_clients:
-            self.waiting_clients.remove(client_id)
-        
-        print(f"❌ Client {client_id} đã ngắt kết nối")
-
-if __name__ == "__main__":
-    server = GameServer()
-    try:
-        server.start_server()
-    except KeyboardInterrupt:
-        print("\n🛑 Server đã dừng")
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battle Chess Server - Multi Client Server
+Nhóm 13
+"""
+
+import socket
+import threading
+import json
+import time
+import random
+import asyncio
+import argparse
+import hashlib
+import os
+import itertools
+import multiprocessing
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+from Matchmaking import MATCHMAKERS, EloRatings
+from Broadcast import Broadcaster
+from Metrics import ServerMetrics, start_http_server
+from MatchHistory import MatchHistory
+from Replay import ReplayWriter
+from Tournament import Tournament, parse_teams
+from Sessions import ConnectionMonitor, new_session_token
+from Protocol import (FrameDecoder, FrameError, FrameTooLarge, BattleLog, BinaryCodec, WIRE_FORMATS, COMPRESSIONS,
+                      compress_frame, encode_frame_raw, encode_frame_parts, encode_value, encode_message, decode_message)
+
+DEFAULT_CHAMPIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'champions.json')
+
+# Dữ liệu chờ gửi tối đa của một kết nối trước khi áp dụng chính sách với client chậm (--slow-client)
+DEFAULT_SEND_QUEUE_LIMIT = 1024 * 1024
+SLOW_CLIENT_POLICIES = ('disconnect', 'drop')
+SENDMSG_MAX_BUFFERS = 512  # số đoạn tối đa trong một lời gọi sendmsg (giới hạn IOV_MAX thường là 1024)
+CLOSE_LINGER = 1.0  # số giây chờ gửi nốt hàng đợi khi đóng kết nối
+DEFAULT_TOURNAMENT_MAX_TEAMS = 1024
+DEFAULT_COMPRESS_THRESHOLD = 512
+DEFAULT_HEARTBEAT_INTERVAL = 15.0  # giây im lặng trước khi server gửi ping
+DEFAULT_IDLE_TIMEOUT = 45.0        # giây im lặng (không trả lời ping) trước khi server ngắt kết nối
+DEFAULT_SESSION_TTL = 60.0         # giây giữ phiên sau khi mất kết nối để client resume
+
+# Loại tin nhắn client được gửi (loại khác được đếm chung vào 'unknown' trong metrics)
+MESSAGE_TYPES = ('select_team', 'ready_to_battle', 'set_format', 'set_compression', 'spectate', 'list_matches',
+                 'tournament', 'resume', 'ping', 'pong', 'leave')
+
+class Champion:
+    __slots__ = ('name', 'max_hp', 'hp', 'dmg', 'range', 'alive')
+    
+    def __init__(self, name: str, hp: int, dmg: int, range_val: int = 1):
+        self.name = name
+        self.max_hp = hp
+        self.hp = hp
+        self.dmg = dmg
+        self.range = range_val
+        self.alive = True
+    
+    def reset(self):
+        self.hp = self.max_hp
+        self.alive = True
+    
+    def take_damage(self, damage: int):
+        self.hp -= damage
+        if self.hp <= 0:
+            self.hp = 0
+            self.alive = False
+    
+    def attack(self, target: 'Champion') -> str:
+        if not self.alive:
+            return f"{self.name} đã chết, không thể tấn công"
+        
+        if not target.alive:
+            return f"Mục tiêu {target.name} đã chết"
+        
+        target.take_damage(self.dmg)
+        result = f"{self.name} tấn công {target.name} gây {self.dmg} sát thương"
+        
+        if not target.alive:
+            result += f" - {target.name} đã bị tiêu diệt!"
+        else:
+            result += f" - {target.name} còn {target.hp}/{target.max_hp} HP"
+        
+        return result
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'hp': self.hp,
+            'max_hp': self.max_hp,
+            'dmg': self.dmg,
+            'range': self.range,
+            'alive': self.alive
+        }
+
+class BattleEngine:
+    
+    MAX_ROUNDS = 50
+    
+    @staticmethod
+    def simulate_battle(team1: List[Champion], team2: List[Champion], record_log: bool = True) -> Dict[str, Any]:
+        """Mô phỏng trận đấu. result['log'] là BattleLog (gọi render() để lấy văn bản),
+        hoặc None nếu record_log=False (chỉ cần kết quả, dùng fast_resolve)."""
+        if not record_log:
+            return BattleEngine.fast_resolve(team1, team2)
+        
+        battle_log = BattleLog(team1, team2)
+        round_num = 1
+        
+        # Reset trạng thái tất cả tướng
+        for champion in team1:
+            champion.reset()
+        for champion in team2:
+            champion.reset()
+        
+        while True:
+            # Kiểm tra điều kiện kết thúc
+            team1_alive = [i for i, c in enumerate(team1) if c.alive]
+            team2_alive = [i for i, c in enumerate(team2) if c.alive]
+            
+            if not team1_alive:
+                winner, rounds = 2, round_num - 1
+                break
+            
+            if not team2_alive:
+                winner, rounds = 1, round_num
+                break
+            
+            for i in team1_alive:
+                if team2_alive:
+                    target = team2[team2_alive[0]]
+                    target.take_damage(team1[i].dmg)
+                    battle_log.record(round_num, 1, i, team2_alive[0], team1[i].dmg, not target.alive)
+                    
+                    team2_alive = [j for j, c in enumerate(team2) if c.alive]
+            
+            if not team2_alive:
+                continue
+            
+            for i in team2_alive:
+                if team1_alive:
+                    target = team1[team1_alive[0]]
+                    target.take_damage(team2[i].dmg)
+                    battle_log.record(round_num, 2, i, team1_alive[0], team2[i].dmg, not target.alive)
+                    
+                    team1_alive = [j for j, c in enumerate(team1) if c.alive]
+            
+            round_num += 1
+            
+            if round_num > BattleEngine.MAX_ROUNDS:
+                winner, rounds = 0, round_num - 1
+                break
+        
+        battle_log.winner = winner
+        
+        return {
+            'winner': winner,
+            'rounds': rounds,
+            'log': battle_log,
+            'team1_final': [c.to_dict() for c in team1],
+            'team2_final': [c.to_dict() for c in team2]
+        }
+    
+    @staticmethod
+    def fast_resolve(team1: List[Champion], team2: List[Champion]) -> Dict[str, Any]:
+        """Kết quả giống hệt simulate_battle (người thắng, số round, HP cuối) nhưng không duyệt
+        từng round một.
+        
+        Mọi tướng luôn đánh tướng còn sống đầu tiên của đối phương, nên trong các round không có
+        tướng nào chết, mỗi lượt chỉ trừ tổng sát thương của cả đội vào HP tướng đứng đầu bên kia.
+        Số round như vậy liên tiếp tính được bằng phép chia; các round đó được bỏ qua một lần rồi
+        round có tướng chết (hoặc round cuối trước giới hạn) được mô phỏng từng đòn như cũ. Số
+        round phải mô phỏng từng đòn vì thế không vượt quá số tướng chết + 1.
+        """
+        hp1 = [c.max_hp for c in team1]
+        hp2 = [c.max_hp for c in team2]
+        dmg1 = [c.dmg for c in team1]
+        dmg2 = [c.dmg for c in team2]
+        alive1 = list(range(len(team1)))
+        alive2 = list(range(len(team2)))
+        total1 = sum(dmg1)
+        total2 = sum(dmg2)
+        max_rounds = BattleEngine.MAX_ROUNDS
+        round_num = 1
+        
+        while True:
+            if not alive1:
+                winner, rounds = 2, round_num - 1
+                break
+            if not alive2:
+                winner, rounds = 1, round_num
+                break
+            
+            # Bỏ qua các round mà tướng đứng đầu hai bên đều sống sót (vẫn còn ít nhất 1 HP)
+            skip = max_rounds - round_num
+            if total1 > 0:
+                skip = min(skip, (hp2[alive2[0]] - 1) // total1)
+            if total2 > 0:
+                skip = min(skip, (hp1[alive1[0]] - 1) // total2)
+            if skip > 0:
+                hp2[alive2[0]] -= skip * total1
+                hp1[alive1[0]] -= skip * total2
+                round_num += skip
+            
+            # Round kế tiếp: mô phỏng từng đòn theo đúng thứ tự của simulate_battle
+            for i in alive1:
+                if not alive2:
+                    break
+                target = alive2[0]
+                hp2[target] -= dmg1[i]
+                if hp2[target] <= 0:
+                    hp2[target] = 0
+                    alive2.pop(0)
+                    total2 -= dmg2[target]
+            
+            if not alive2:
+                continue
+            
+            for i in alive2:
+                if not alive1:
+                    break
+                target = alive1[0]
+                hp1[target] -= dmg2[i]
+                if hp1[target] <= 0:
+                    hp1[target] = 0
+                    alive1.pop(0)
+                    total1 -= dmg1[target]
+            
+            round_num += 1
+            if round_num > max_rounds:
+                winner, rounds = 0, round_num - 1
+                break
+        
+        for team, hps in ((team1, hp1), (team2, hp2)):
+            for champion, hp in zip(team, hps):
+                champion.hp = hp
+                champion.alive = hp > 0
+        
+        return {
+            'winner': winner,
+            'rounds': rounds,
+            'log': None,
+            'team1_final': [c.to_dict() for c in team1],
+            'team2_final': [c.to_dict() for c in team2]
+        }
+    
+    @staticmethod
+    def simulate_rounds(team1: List[Champion], team2: List[Champion]):
+        """Generator mô phỏng từng round: mỗi lần next() engine chạy thêm đúng một round rồi trả
+        (round, [(team tấn công, vị trí tấn công, vị trí mục tiêu, sát thương, bị tiêu diệt), ...]),
+        cùng dạng với BattleLog.rounds(). Giá trị return của generator là kết quả như simulate_battle
+        nhưng không giữ log (result['log'] là None); người gọi tự giữ những round cần dùng."""
+        for champion in team1:
+            champion.reset()
+        for champion in team2:
+            champion.reset()
+        
+        round_num = 1
+        while True:
+            team1_alive = [i for i, c in enumerate(team1) if c.alive]
+            team2_alive = [i for i, c in enumerate(team2) if c.alive]
+            
+            if not team1_alive:
+                winner, rounds = 2, round_num - 1
+                break
+            
+            if not team2_alive:
+                winner, rounds = 1, round_num
+                break
+            
+            events = []
+            for i in team1_alive:
+                if team2_alive:
+                    target = team2[team2_alive[0]]
+                    target.take_damage(team1[i].dmg)
+                    events.append((1, i, team2_alive[0], team1[i].dmg, not target.alive))
+                    team2_alive = [j for j, c in enumerate(team2) if c.alive]
+            
+            if team2_alive:
+                for i in team2_alive:
+                    if team1_alive:
+                        target = team1[team1_alive[0]]
+                        target.take_damage(team2[i].dmg)
+                        events.append((2, i, team1_alive[0], team2[i].dmg, not target.alive))
+                        team1_alive = [j for j, c in enumerate(team1) if c.alive]
+            
+            yield round_num, events
+            
+            # Team 2 bị tiêu diệt giữa round: vòng lặp kết thúc ở lần kiểm tra kế tiếp, không sang round mới
+            if not team2_alive:
+                continue
+            
+            round_num += 1
+            
+            if round_num > BattleEngine.MAX_ROUNDS:
+                winner, rounds = 0, round_num - 1
+                break
+        
+        return {
+            'winner': winner,
+            'rounds': rounds,
+            'log': None,
+            'team1_final': [c.to_dict() for c in team1],
+            'team2_final': [c.to_dict() for c in team2]
+        }
+
+def simulate_task(team1_stats: List[tuple], team2_stats: List[tuple], record_log: bool) -> Tuple[Dict[str, Any], float]:
+    """Chạy trong worker (thread hoặc process): dựng tướng mới từ (tên, hp, dmg, range) rồi mô phỏng.
+    Trả về (kết quả, số giây mô phỏng)."""
+    started = time.perf_counter()
+    team1 = [Champion(*stats) for stats in team1_stats]
+    team2 = [Champion(*stats) for stats in team2_stats]
+    result = BattleEngine.simulate_battle(team1, team2, record_log)
+    return result, time.perf_counter() - started
+
+def champion_stat_version(champions: List[Dict[str, Any]]) -> str:
+    """Mã phiên bản chỉ số tướng: đổi khi thứ tự, tên hoặc chỉ số của bất kỳ tướng nào thay đổi"""
+    stats = [[c['name'], c['hp'], c['dmg'], c['range']] for c in champions]
+    return hashlib.sha1(json.dumps(stats).encode('utf-8')).hexdigest()[:16]
+
+class BattleCache:
+    """Bộ nhớ đệm LRU cho kết quả trận đấu.
+    
+    simulate_battle là tất định nên kết quả chỉ phụ thuộc vào (tên tướng team 1, tên tướng team 2,
+    phiên bản chỉ số tướng). Kết quả trong cache được dùng chung, người gọi không được sửa.
+    """
+    
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def make_key(team1: List[Champion], team2: List[Champion], stat_version: str):
+        return (tuple(c.name for c in team1), tuple(c.name for c in team2), stat_version)
+    
+    def get(self, key, record_log: bool = False) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._entries.get(key)
+            # Kết quả lưu không kèm log không dùng được khi cần log
+            if result is None or (record_log and result['log'] is None):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+    
+    def put(self, key, result: Dict[str, Any]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def simulate(self, team1: List[Champion], team2: List[Champion], stat_version: str,
+                 record_log: bool = True) -> Dict[str, Any]:
+        if self.max_entries <= 0:
+            return BattleEngine.simulate_battle(team1, team2, record_log)
+        
+        key = self.make_key(team1, team2, stat_version)
+        result = self.get(key, record_log)
+        if result is None:
+            result = BattleEngine.simulate_battle(team1, team2, record_log)
+            self.put(key, result)
+        return result
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+class ChampionRegistry:
+    """Danh mục tướng nạp từ file dữ liệu, tra cứu O(1) theo tên hoặc ID.
+    
+    ID của tướng là vị trí của nó trong danh mục (0, 1, 2, ...), client có thể gửi ID thay cho tên.
+    """
+    
+    def __init__(self, champions: List[Dict[str, Any]]):
+        for i, champion in enumerate(champions):
+            if champion.get('id', i) != i:
+                raise ValueError(f"ID của tướng {champion['name']} phải là {i}")
+            champion['id'] = i
+        
+        self.champions = champions
+        self.by_name = {c['name']: c for c in champions}
+        self.by_id = {c['id']: c for c in champions}
+        if len(self.by_name) != len(champions):
+            raise ValueError('Tên tướng bị trùng trong danh mục')
+        self._catalog_json = None
+    
+    @classmethod
+    def load(cls, path: str) -> 'ChampionRegistry':
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+    
+    def __len__(self) -> int:
+        return len(self.champions)
+    
+    def resolve(self, ref) -> Optional[Dict[str, Any]]:
+        """Tìm tướng theo ID (int) hoặc tên (str)"""
+        if isinstance(ref, bool):
+            return None
+        if isinstance(ref, int):
+            return self.by_id.get(ref)
+        if isinstance(ref, str):
+            return self.by_name.get(ref)
+        return None
+    
+    def update(self, name: str, **stats):
+        self.by_name[name].update(stats)
+        self._catalog_json = None
+    
+    @property
+    def catalog_json(self) -> bytes:
+        """Danh mục đã mã hóa JSON, chỉ mã hóa lại khi chỉ số tướng thay đổi"""
+        if self._catalog_json is None:
+            self._catalog_json = json.dumps(self.champions, ensure_ascii=False).encode('utf-8')
+        return self._catalog_json
+
+class GameServer:
+    
+    def __init__(self, host='localhost', port=8888, backlog=128, matchup_table=None, battle_cache_size=1024,
+                 champions_file=DEFAULT_CHAMPIONS_FILE, battle_workers=None, battle_pool='thread',
+                 matchmaking='fifo', stream_rounds=None, metrics_port=None, metrics_host='localhost',
+                 history=None, history_events=False, replay_dir=None, reuse_port=False, worker_id=None,
+                 broker=None, send_queue_limit=DEFAULT_SEND_QUEUE_LIMIT, slow_client='disconnect',
+                 tournament_workers=None, tournament_max_teams=DEFAULT_TOURNAMENT_MAX_TEAMS,
+                 compress_threshold=DEFAULT_COMPRESS_THRESHOLD, heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, session_ttl=DEFAULT_SESSION_TTL):
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        # reuse_port: nhiều tiến trình worker cùng nghe một cổng (SO_REUSEPORT, xem Cluster.py);
+        # worker_id đưa vào client_id để ID không trùng giữa các worker
+        self.reuse_port = reuse_port
+        self.worker_id = worker_id
+        self.clients = {}  # {client_id: {'socket': socket, 'team': [], 'team_snapshot': []}}
+        # Mỗi kết nối có hàng đợi gửi riêng tối đa send_queue_limit byte; slow_client là cách xử lý
+        # client không đọc kịp: 'disconnect' ngắt kết nối, 'drop' bỏ khung tin nhắn mới
+        self.send_queue_limit = send_queue_limit
+        self.slow_client = slow_client
+        self.send_frames_dropped = 0
+        self.slow_client_disconnects = 0
+        self._send_queue_lock = threading.Lock()
+        # Khung từ compress_threshold byte trở lên được nén cho client đã bật nén (set_compression), 0 = tắt
+        self.compress_threshold = compress_threshold
+        self.compressed_frames = 0
+        self.compression_bytes_in = 0
+        self.compression_bytes_out = 0
+        self._compression_lock = threading.Lock()
+        # Kết nối im lặng heartbeat_interval giây nhận ping, im lặng idle_timeout giây bị ngắt (0 = tắt).
+        # Client đã chọn đội hình mất kết nối được giữ phiên session_ttl giây (0 = tắt): vẫn giữ chỗ trong
+        # hàng đợi và nhận kết quả trận đấu, kết nối lại bằng tin nhắn resume với token trong welcome
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.session_ttl = session_ttl
+        self.sessions = {}  # {token: client_id}
+        self.sessions_resumed = 0
+        self._sessions_lock = threading.RLock()
+        self.monitor = None
+        if heartbeat_interval or session_ttl:
+            self.monitor = ConnectionMonitor(heartbeat_interval or None, idle_timeout, session_ttl,
+                                             self.send_ping, self.reap_idle, self.expire_session)
+        self.matchmaking_mode = matchmaking
+        self.matchmaking = MATCHMAKERS[matchmaking]()
+        self.ratings = EloRatings()
+        self.client_counter = 0
+        self.match_ids = itertools.count(1)
+        
+        # stream_rounds: số giây giữa hai round khi phát trực tiếp (None = chỉ gửi kết quả cuối)
+        self.broadcaster = Broadcaster(stream_rounds) if stream_rounds is not None else None
+        
+        # history: file SQLite lưu mọi trận đấu; history_events: luôn mô phỏng kèm log để lưu cả diễn biến
+        self.history = MatchHistory(history) if history else None
+        self.history_events = history_events
+        # replay_dir: thư mục ghi file replay (đội hình + kết quả, xem Replay.py)
+        self.replays = ReplayWriter(replay_dir) if replay_dir else None
+        
+        self.battle_executor = self.create_battle_executor(battle_pool, battle_workers)
+        self.battles_in_flight = 0
+        self._battles_lock = threading.Lock()
+        
+        # Giải đấu (Tournament.py) chạy trên pool tiến trình riêng, chỉ tạo khi có giải đầu tiên
+        self.tournament_workers = tournament_workers
+        self.tournament_max_teams = tournament_max_teams
+        self.tournament_executor = None
+        self.tournaments = {}  # {client_id: tournament_id} của các giải đang chạy
+        self.tournament_ids = itertools.count(1)
+        self._tournaments_lock = threading.Lock()
+        
+        self.registry = ChampionRegistry.load(champions_file)
+        self.available_champions = self.registry.champions
+        self.stat_version = champion_stat_version(self.available_champions)
+        self.battle_cache = BattleCache(battle_cache_size)
+        self.champion_snapshots = self.build_champion_snapshots()
+        self.codec = BinaryCodec(self.available_champions)
+        
+        self.matchup_table = None
+        if matchup_table:
+            self.load_matchup_table(matchup_table)
+        
+        # metrics = None khi tắt: mỗi điểm đo chỉ tốn một phép so sánh
+        self.metrics_host = metrics_host
+        self.metrics_port = metrics_port
+        self.metrics = self.create_metrics() if metrics_port is not None else None
+        
+        # broker: (địa chỉ, authkey) của tiến trình ghép trận chung cho mọi worker (Cluster.py)
+        self.broker = None
+        if broker is not None:
+            from Cluster import BrokerLink
+            self.broker = BrokerLink(self, *broker)
+    
+    @staticmethod
+    def create_battle_executor(pool: str, workers: Optional[int]):
+        """Pool mô phỏng trận đấu tách khỏi luồng I/O; workers=0 thì mô phỏng ngay trên luồng I/O"""
+        if workers == 0:
+            return None
+        if pool == 'process':
+            return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        return ThreadPoolExecutor(workers, thread_name_prefix='battle')
+    
+    def start_matchmaker(self, interval: float = 0.25):
+        """Luồng định kỳ gọi poll() để ghép những người chờ lâu khi dung sai điểm được nới rộng"""
+        if self.matchmaking_mode == 'fifo':
+            return
+        
+        def run():
+            while True:
+                time.sleep(interval)
+                for pair in self.matchmaking.poll():
+                    try:
+                        self.start_battle(*pair)
+                    except Exception as e:
+                        print(f"❌ Lỗi khi bắt đầu trận {pair[0]} vs {pair[1]}: {e}")
+        
+        thread = threading.Thread(target=run, name='matchmaker')
+        thread.daemon = True
+        thread.start()
+    
+    def create_metrics(self) -> ServerMetrics:
+        metrics = ServerMetrics()
+        metrics.callback('clients', 'Số client đang kết nối', lambda: len(self.clients))
+        metrics.callback('matchmaking_depth', 'Số người đang chờ ghép trận', lambda: len(self.matchmaking))
+        metrics.callback('battles_in_flight', 'Số trận đang chờ hoặc đang được mô phỏng trong pool',
+                         lambda: self.battles_in_flight)
+        metrics.callback('battle_cache_hits_total', 'Số lần tìm thấy kết quả trong cache',
+                         lambda: self.battle_cache.hits, 'counter')
+        metrics.callback('battle_cache_misses_total', 'Số lần không có kết quả trong cache',
+                         lambda: self.battle_cache.misses, 'counter')
+        if self.broadcaster is not None:
+            metrics.callback('broadcast_sent_bytes_total', 'Số byte phát trực tiếp cho người chơi và người xem',
+                             lambda: self.broadcaster.bytes_sent, 'counter')
+            metrics.callback('spectators', 'Số người đang xem trực tiếp', lambda: len(self.broadcaster.watching))
+        metrics.callback('send_queue_bytes', 'Số byte đang chờ gửi trong hàng đợi của mọi kết nối',
+                         self.send_queue_bytes)
+        metrics.callback('send_dropped_frames_total', 'Số khung tin nhắn bị bỏ do hàng đợi gửi của client đầy',
+                         lambda: self.send_frames_dropped, 'counter')
+        metrics.callback('slow_client_disconnects_total', 'Số client bị ngắt do không đọc kịp',
+                         lambda: self.slow_client_disconnects, 'counter')
+        metrics.callback('compressed_frames_total', 'Số khung tin nhắn đã nén',
+                         lambda: self.compressed_frames, 'counter')
+        metrics.callback('compression_saved_bytes_total', 'Số byte tiết kiệm được nhờ nén',
+                         lambda: self.compression_bytes_in - self.compression_bytes_out, 'counter')
+        if self.monitor is not None:
+            metrics.callback('sessions_detached', 'Số phiên đã mất kết nối đang chờ resume',
+                             lambda: len(self.monitor.detached))
+            metrics.callback('sessions_resumed_total', 'Số phiên được kết nối lại bằng resume',
+                             lambda: self.sessions_resumed, 'counter')
+            metrics.callback('sessions_expired_total', 'Số phiên hết hạn trước khi được resume',
+                             lambda: self.monitor.expired, 'counter')
+            metrics.callback('idle_disconnects_total', 'Số kết nối bị ngắt do im lặng quá idle timeout',
+                             lambda: self.monitor.idle_reaped, 'counter')
+        if self.history is not None:
+            metrics.callback('history_written_total', 'Số trận đã ghi vào lịch sử',
+                             lambda: self.history.written, 'counter')
+            metrics.callback('history_dropped_total', 'Số trận bị bỏ qua do hàng đợi ghi lịch sử đầy',
+                             lambda: self.history.dropped, 'counter')
+            metrics.callback('history_pending', 'Số trận đang chờ ghi vào lịch sử', self.history.pending)
+        self.matchmaking.on_wait = metrics.matchmaking_wait_seconds.observe
+        return metrics
+    
+    def start_monitor(self):
+        """Luồng quay bánh xe hẹn giờ của heartbeat, dọn kết nối im lặng và hết hạn phiên"""
+        if self.monitor is not None:
+            self.monitor.start()
+    
+    def start_metrics_endpoint(self):
+        """Mở endpoint HTTP /metrics (định dạng Prometheus) nếu metrics được bật"""
+        if self.metrics is None:
+            return
+        start_http_server(self.metrics, self.metrics_host, self.metrics_port)
+        print(f"📈 Metrics tại http://{self.metrics_host}:{self.metrics_port}/metrics")
+    
+    def shutdown_workers(self):
+        if self.battle_executor is not None:
+            self.battle_executor.shutdown(wait=False, cancel_futures=True)
+        if self.tournament_executor is not None:
+            self.tournament_executor.shutdown(wait=False, cancel_futures=True)
+        if self.history is not None:
+            # Ghi nốt các trận còn trong hàng đợi
+            self.history.close(timeout=5)
+        if self.replays is not None:
+            self.replays.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'clients': len(self.clients),
+            'matchmaking': self.matchmaking.stats(),
+            'battles_in_flight': self.battles_in_flight,
+            'tournaments': len(self.tournaments),
+            'battle_cache': self.battle_cache.stats(),
+            'broadcast': self.broadcaster.stats() if self.broadcaster is not None else None,
+            'history': self.history.stats() if self.history is not None else None,
+            'send_queues': self.send_queue_stats(),
+            'compression': {
+                'threshold': self.compress_threshold,
+                'frames': self.compressed_frames,
+                'bytes_in': self.compression_bytes_in,
+                'bytes_out': self.compression_bytes_out
+            },
+            'sessions': dict(self.monitor.stats(), resumed=self.sessions_resumed) if self.monitor is not None else None
+        }
+    
+    def client_sockets(self):
+        return [client['socket'] for client in list(self.clients.values())]
+    
+    def send_queue_bytes(self) -> int:
+        return sum(client_socket.pending_bytes() for client_socket in self.client_sockets())
+    
+    def send_queue_stats(self) -> Dict[str, Any]:
+        pending = [client_socket.pending_bytes() for client_socket in self.client_sockets()]
+        return {
+            'limit': self.send_queue_limit,
+            'policy': self.slow_client,
+            'pending_bytes': sum(pending),
+            'max_pending_bytes': max(pending, default=0),
+            'frames_dropped': self.send_frames_dropped,
+            'slow_client_disconnects': self.slow_client_disconnects
+        }
+    
+    def send_queue_overflow(self, policy: str):
+        """Được socket gọi khi hàng đợi gửi của một client vượt giới hạn"""
+        with self._send_queue_lock:
+            self.send_frames_dropped += 1
+            if policy == 'disconnect':
+                self.slow_client_disconnects += 1
+    
+    def send_queue_options(self) -> Dict[str, Any]:
+        return {'high_water': self.send_queue_limit, 'policy': self.slow_client,
+                'on_overflow': self.send_queue_overflow}
+    
+    def load_matchup_table(self, path: str):
+        """Nạp bảng kết quả tính sẵn (MatchupTable.py) nếu khớp với chỉ số tướng hiện tại"""
+        from MatchupTable import MatchupTable
+        
+        table = MatchupTable(path)
+        if table.stat_version != self.stat_version:
+            print(f"⚠️ Bảng kết quả {path} không khớp chỉ số tướng hiện tại - bỏ qua")
+            table.close()
+            return
+        
+        self.matchup_table = table
+        print(f"📚 Đã nạp bảng kết quả {path}")
+    
+    def update_champion_stats(self, name: str, **stats):
+        """Thay đổi chỉ số một tướng (hp, dmg, range) và vô hiệu hóa mọi kết quả đã lưu"""
+        self.registry.update(name, **stats)
+        
+        self.stat_version = champion_stat_version(self.available_champions)
+        self.battle_cache.clear()
+        self.champion_snapshots = self.build_champion_snapshots()
+        # Client đang dùng định dạng nhị phân giữ bảng mã theo danh mục cũ mà họ đã nhận
+        self.codec = BinaryCodec(self.available_champions)
+        
+        if self.matchup_table is not None and self.matchup_table.stat_version != self.stat_version:
+            print(f"⚠️ Bảng kết quả {self.matchup_table.path} đã cũ - ngừng sử dụng")
+            self.matchup_table.close()
+            self.matchup_table = None
+        
+        # Đội hình đã chọn phải dùng chỉ số mới
+        for client in list(self.clients.values()):
+            client['team'] = [self.create_champion(c.name) for c in client['team']]
+            client['team_snapshot'] = self.team_snapshot(client['team'])
+    
+    def build_champion_snapshots(self) -> Dict[str, Dict[str, Any]]:
+        """to_dict() của từng tướng khi đủ máu, dựng một lần và dùng chung (chỉ đọc)"""
+        return {name: self.create_champion(name).to_dict() for name in self.registry.by_name}
+    
+    def team_snapshot(self, team: List[Champion]) -> List[Dict[str, Any]]:
+        return [self.champion_snapshots[c.name] for c in team]
+    
+    def create_champion(self, name: str) -> Champion:
+        champion_info = self.registry.by_name[name]
+        return Champion(
+            champion_info['name'],
+            champion_info['hp'],
+            champion_info['dmg'],
+            champion_info['range']
+        )
+    
+    def start_server(self):
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        
+        try:
+            server_socket.bind((self.host, self.port))
+            server_socket.listen(self.backlog)
+            self.start_matchmaker()
+            self.start_monitor()
+            self.start_metrics_endpoint()
+            print(f"🎮 Battle Chess Server đang chạy tại {self.host}:{self.port}")
+            print("Đang chờ client kết nối...")
+            
+            while True:
+                client_socket, addr = server_socket.accept()
+                # Như transport của asyncio: tắt Nagle để waiting/battle_start/battle_result không chờ ACK
+                client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                client_id = self.next_client_id()
+                
+                print(f"✅ Client {client_id} kết nối từ {addr}")
+                
+                client_thread = threading.Thread(
+                    target=self.handle_client,
+                    args=(client_socket, client_id)
+                )
+                client_thread.daemon = True
+                client_thread.start()
+                
+        except Exception as e:
+            print(f"❌ Lỗi server: {e}")
+        finally:
+            server_socket.close()
+            self.shutdown_workers()
+    
+    def next_client_id(self) -> str:
+        self.client_counter += 1
+        if self.worker_id is None:
+            return f"client_{self.client_counter}"
+        return f"client_{self.worker_id}_{self.client_counter}"
+    
+    def handle_client(self, client_socket: socket.socket, client_id: str):
+        # connection.client_id đổi thành ID của phiên cũ nếu kết nối này resume phiên đó
+        connection = QueuedClientSocket(client_socket, **self.send_queue_options())
+        try:
+            self.register_client(client_id, connection)
+            
+            while True:
+                data = client_socket.recv(4096)
+                if not data:
+                    break
+                
+                if not self.handle_data(connection.client_id, data):
+                    break
+                
+        except Exception as e:
+            print(f"❌ Lỗi khi xử lý client {connection.client_id}: {e}")
+        finally:
+            self.disconnect_client(connection.client_id, connection)
+    
+    def register_client(self, client_id: str, client_socket):
+        """Đăng ký client mới và gửi lời chào (dùng chung cho mọi backend)"""
+        client_socket.client_id = client_id
+        session = new_session_token() if self.session_ttl else None
+        self.clients[client_id] = {
+            'socket': client_socket,
+            'decoder': FrameDecoder(),
+            'team': [],
+            'team_snapshot': [],
+            'session': session
+        }
+        if session is not None:
+            self.sessions[session] = client_id
+        if self.monitor is not None:
+            self.monitor.watch(client_id)
+        if self.metrics is not None:
+            self.metrics.connections.inc()
+        
+        # Lời chào luôn gửi dạng JSON; client chọn định dạng khác bằng tin nhắn set_format.
+        # Danh mục tướng đã được mã hóa sẵn, chỉ phần lời chào là riêng cho từng client
+        welcome_msg = {
+            'type': 'welcome',
+            'message': f'Chào mừng {client_id}!',
+            'formats': list(WIRE_FORMATS),
+            'compression': list(COMPRESSIONS) if self.compress_threshold else [],
+            'session': session,
+            'heartbeat': self.heartbeat_interval or None
+        }
+        self.send_frame(client_socket, encode_frame_raw(welcome_msg, {'champions': self.registry.catalog_json}))
+    
+    def handle_data(self, client_id: str, data: bytes) -> bool:
+        """Đưa dữ liệu nhận được vào bộ đọc khung và xử lý từng tin nhắn hoàn chỉnh.
+        Trả về False nếu cần đóng kết nối."""
+        client_socket = self.clients[client_id]['socket']
+        decoder = self.clients[client_id]['decoder']
+        decoder.feed(data)
+        if self.monitor is not None:
+            self.monitor.touch(client_id)
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.bytes_received.inc(len(data))
+        
+        while True:
+            try:
+                frame = decoder.next_frame()
+            except FrameError as e:
+                # Khung quá lớn hoặc khung nén hỏng: báo lỗi rồi đóng kết nối
+                self.send_message(self.clients[client_id]['socket'], {
+                    'type': 'error',
+                    'message': f'Tin nhắn quá lớn: {e}' if isinstance(e, FrameTooLarge) else str(e)
+                })
+                return False
+            
+            if frame is None:
+                return True
+            
+            try:
+                # set_format trong khung trước đổi định dạng của decoder cho các khung sau
+                if metrics is None:
+                    message = decode_message(frame, decoder.wire_format, client_socket.codec)
+                else:
+                    started = time.perf_counter()
+                    message = decode_message(frame, decoder.wire_format, client_socket.codec)
+                    metrics.decode_seconds.observe(time.perf_counter() - started, (decoder.wire_format,))
+                if not isinstance(message, dict):
+                    raise ValueError('Tin nhắn phải là một object')
+            except (ValueError, UnicodeDecodeError):
+                self.send_message(client_socket, {
+                    'type': 'error',
+                    'message': 'Định dạng JSON không hợp lệ' if decoder.wire_format == 'json'
+                               else 'Tin nhắn nhị phân không hợp lệ'
+                })
+                continue
+            
+            self.process_message(client_id, message)
+            if message.get('type') == 'leave':
+                return False
+            # resume trong khung này chuyển kết nối sang phiên cũ cho các khung sau
+            client_id = client_socket.client_id
+    
+    def process_message(self, client_id: str, message: Dict[str, Any]):
+        msg_type = message.get('type')
+        if self.metrics is not None:
+            self.metrics.messages.inc(labels=(msg_type if msg_type in MESSAGE_TYPES else 'unknown',))
+        
+        if msg_type == 'select_team':
+            self.handle_team_selection(client_id, message.get('team', []))
+        elif msg_type == 'ready_to_battle':
+            self.handle_ready_to_battle(client_id, bool(message.get('want_log', True)), message.get('player'))
+        elif msg_type == 'set_format':
+            self.handle_set_format(client_id, message.get('format'))
+        elif msg_type == 'set_compression':
+            self.handle_set_compression(client_id, message.get('compression'))
+        elif msg_type == 'spectate':
+            self.handle_spectate(client_id, message.get('match_id'))
+        elif msg_type == 'tournament':
+            self.handle_tournament(client_id, message)
+        elif msg_type == 'resume':
+            self.handle_resume(client_id, message.get('session'))
+        elif msg_type == 'ping':
+            self.send_message(self.clients[client_id]['socket'], {'type': 'pong'})
+        elif msg_type == 'pong':
+            pass  # handle_data đã ghi nhận kết nối còn sống
+        elif msg_type == 'leave':
+            # Client chủ động thoát: handle_data đóng kết nối và phiên bị xóa thay vì được giữ
+            self.clients[client_id]['left'] = True
+        elif msg_type == 'list_matches':
+            self.send_message(self.clients[client_id]['socket'], {
+                'type': 'matches',
+                'matches': self.broadcaster.matches() if self.broadcaster is not None else []
+            })
+        else:
+            self.send_message(self.clients[client_id]['socket'], {
+                'type': 'error',
+                'message': f'Loại tin nhắn không hợp lệ: {msg_type}'
+            })
+    
+    def handle_set_format(self, client_id: str, wire_format: Any):
+        """Đổi định dạng khung của kết nối. Client đổi bộ mã hóa ngay sau khi gửi set_format,
+        còn server trả lời 'format_changed' bằng định dạng cũ rồi mới đổi."""
+        client = self.clients[client_id]
+        client_socket = client['socket']
+        
+        if wire_format not in WIRE_FORMATS:
+            self.send_message(client_socket, {
+                'type': 'error',
+                'message': f'Định dạng không hỗ trợ: {wire_format}'
+            })
+            return
+        
+        # Chỉ đổi trước khi chọn đội hình: lúc đó chưa có trận đấu nào gửi tin nhắn cho client
+        # từ luồng khác nên không khung nào bị mã hóa nhầm định dạng
+        if client['team']:
+            self.send_message(client_socket, {
+                'type': 'error',
+                'message': 'Chỉ có thể đổi định dạng trước khi chọn đội hình'
+            })
+            return
+        
+        client['decoder'].wire_format = wire_format
+        self.send_message(client_socket, {'type': 'format_changed', 'format': wire_format})
+        client_socket.wire_format = wire_format
+        client_socket.codec = self.codec if wire_format == 'binary' else None
+    
+    def handle_tournament(self, client_id: str, message: Dict[str, Any]):
+        """Chạy giải đấu cho các đội hình trong message (teams, format, rounds, legs, top) ở luồng nền.
+        Client nhận 'tournament_started', một 'tournament_standings' (top đội) sau mỗi vòng,
+        rồi 'tournament_result' với bảng xếp hạng đầy đủ. Mỗi client chạy một giải một lúc."""
+        client_socket = self.clients[client_id]['socket']
+        top = message.get('top', 10)
+        
+        try:
+            if not isinstance(top, int) or isinstance(top, bool) or top < 1:
+                raise ValueError('top phải là số nguyên dương')
+            teams = parse_teams(self.registry, message.get('teams'), self.tournament_max_teams)
+            tournament = Tournament(self.available_champions, teams, message.get('format', 'round_robin'),
+                                    message.get('rounds'), message.get('legs', 2))
+        except ValueError as e:
+            self.send_message(client_socket, {'type': 'error', 'message': str(e)})
+            return
+        
+        with self._tournaments_lock:
+            if client_id in self.tournaments:
+                self.send_message(client_socket, {
+                    'type': 'error',
+                    'message': 'Bạn đang có một giải đấu chưa kết thúc'
+                })
+                return
+            tournament_id = f"tournament_{next(self.tournament_ids)}"
+            self.tournaments[client_id] = tournament_id
+            if self.tournament_executor is None:
+                self.tournament_executor = ProcessPoolExecutor(
+                    self.tournament_workers, mp_context=multiprocessing.get_context('spawn'))
+        
+        print(f"🏆 Bắt đầu {tournament_id} cho {client_id}: {len(teams)} đội, {tournament.format}")
+        self.send_message(client_socket, {
+            'type': 'tournament_started',
+            'tournament_id': tournament_id,
+            'format': tournament.format,
+            'teams': len(teams),
+            'rounds': tournament.rounds,
+            'games': tournament.games_total
+        })
+        
+        thread = threading.Thread(target=self.run_tournament, name=tournament_id,
+                                  args=(client_id, client_socket, tournament_id, tournament, top))
+        thread.daemon = True
+        thread.start()
+    
+    def run_tournament(self, client_id: str, client_socket, tournament_id: str, tournament: Tournament, top: int):
+        """Luồng nền của một giải đấu: dừng (hủy các vòng chưa chạy) nếu client ngắt kết nối"""
+        rounds = tournament.run(self.tournament_executor, top)
+        result = None
+        try:
+            for progress in rounds:
+                if not self.is_connected(client_id):
+                    print(f"🛑 Dừng {tournament_id}: {client_id} đã ngắt kết nối")
+                    return
+                progress.update(type='tournament_standings', tournament_id=tournament_id)
+                self.send_message(client_socket, progress)
+            
+            result = {
+                'type': 'tournament_result',
+                'tournament_id': tournament_id,
+                'rounds': tournament.round,
+                'games': tournament.games_played,
+                'standings': tournament.standings()
+            }
+            print(f"🏁 Kết thúc {tournament_id}: {tournament.games_played} trận")
+        except Exception as e:
+            print(f"❌ Lỗi khi chạy {tournament_id}: {e}")
+            result = {'type': 'error', 'message': f'Giải đấu {tournament_id} bị dừng do lỗi'}
+        finally:
+            rounds.close()
+            # Nhả lượt trước khi gửi kết quả để client bắt đầu được giải mới ngay khi nhận kết quả
+            with self._tournaments_lock:
+                self.tournaments.pop(client_id, None)
+            if result is not None and self.is_connected(client_id):
+                self.send_message(client_socket, result)
+    
+    def handle_set_compression(self, client_id: str, compression: Any):
+        """Bật (compression = 'zlib') hoặc tắt (None) nén các khung server gửi tới kết nối này.
+        Khung nén tự mô tả nên đổi được bất cứ lúc nào, kể cả khi trận đấu đang gửi tin nhắn."""
+        client_socket = self.clients[client_id]['socket']
+        
+        if compression is not None and (compression not in COMPRESSIONS or not self.compress_threshold):
+            self.send_message(client_socket, {
+                'type': 'error',
+                'message': f'Kiểu nén không hỗ trợ: {compression}'
+            })
+            return
+        
+        client_socket.compression = compression
+        self.send_message(client_socket, {
+            'type': 'compression_changed',
+            'compression': compression,
+            'threshold': self.compress_threshold
+        })
+    
+    def handle_resume(self, client_id: str, token: Any):
+        """Kết nối mới tiếp quản phiên có token (nhận trong welcome của kết nối cũ): client lấy lại đội hình,
+        chỗ trong hàng đợi hoặc trận đang đấu, và battle_result gần nhất (gửi ngay sau 'resumed').
+        Kết nối cũ nếu vẫn được coi là còn mở (half-open) bị ngắt."""
+        client = self.clients[client_id]
+        client_socket = client['socket']
+        
+        with self._sessions_lock:
+            old_id = self.sessions.get(token) if isinstance(token, str) else None
+            old = self.clients.get(old_id) if old_id not in (None, client_id) else None
+            if client['team']:
+                error = 'Chỉ có thể resume trước khi chọn đội hình'
+            elif old is None:
+                error = 'Phiên không tồn tại hoặc đã hết hạn'
+            else:
+                error = None
+                old_socket = old['socket']
+                attached = not old.pop('detached', False)
+                old['socket'] = client_socket
+                old['decoder'] = client['decoder']
+                client_socket.client_id = old_id
+                del self.clients[client_id]
+                self.sessions.pop(client['session'], None)
+                if self.monitor is not None:
+                    self.monitor.forget(client_id)
+                    self.monitor.watch(old_id)
+                self.sessions_resumed += 1
+                state = 'in_battle' if old.get('match_id') else 'queued' if old.get('queued') else 'idle'
+                last_result = old.get('last_result')
+        
+        if error is not None:
+            self.send_message(client_socket, {'type': 'error', 'message': error})
+            return
+        
+        if attached:
+            old_socket.abort()
+        print(f"🔁 {client_id} resume phiên của {old_id} ({state})")
+        self.send_message(client_socket, {
+            'type': 'resumed',
+            'client_id': old_id,
+            'team': old['team_snapshot'],
+            'state': state,
+            'pending_result': last_result[0] if last_result else None
+        })
+        if last_result:
+            self.send_frame_parts(client_socket, self.battle_result_parts(client_socket, *last_result,
+                                                                          old.get('want_log', True)))
+    
+    def is_connected(self, client_id: str) -> bool:
+        """Client còn kết nối (không tính phiên đã mất kết nối đang chờ resume)"""
+        client = self.clients.get(client_id)
+        return client is not None and not client.get('detached')
+    
+    def send_ping(self, client_id: str):
+        client = self.clients.get(client_id)
+        if client is not None and not client.get('detached'):
+            self.send_message(client['socket'], {'type': 'ping'})
+    
+    def reap_idle(self, client_id: str):
+        """Ngắt kết nối im lặng quá idle_timeout; luồng đọc nhận EOF và dọn client như khi client tự ngắt"""
+        client = self.clients.get(client_id)
+        if client is not None and not client.get('detached'):
+            print(f"💤 Client {client_id} im lặng quá {self.idle_timeout:g}s, ngắt kết nối")
+            client['socket'].abort()
+    
+    def expire_session(self, client_id: str):
+        with self._sessions_lock:
+            client = self.clients.get(client_id)
+            if client is None or not client.get('detached'):
+                return
+            self.remove_client(client_id)
+        print(f"⌛ Phiên của {client_id} đã hết hạn")
+    
+    def handle_spectate(self, client_id: str, match_id: Any):
+        """Đăng ký xem trực tiếp một trận đấu đang diễn ra (bỏ đăng ký trận đang xem nếu có)"""
+        client_socket = self.clients[client_id]['socket']
+        
+        if self.broadcaster is None:
+            self.send_message(client_socket, {
+                'type': 'error',
+                'message': 'Server không bật phát trực tiếp trận đấu'
+            })
+            return
+        
+        channel = self.broadcaster.subscribe(str(match_id), client_id, client_socket)
+        if channel is None:
+            self.send_message(client_socket, {
+                'type': 'error',
+                'message': f'Trận đấu {match_id} không tồn tại hoặc đã kết thúc'
+            })
+            return
+        
+        # Gửi trực tiếp (không qua kênh): có thể đến sau vài round đầu nếu trận đang được phát
+        self.send_message(client_socket, dict(
+            channel.info(),
+            type='spectating',
+            team1=channel.teams[0],
+            team2=channel.teams[1]
+        ))
+    
+    def handle_team_selection(self, client_id: str, selected_team: List[Any]):
+        """selected_team gồm 4 ID tướng (int) hoặc 4 tên tướng"""
+        if len(selected_team) != 4:
+            self.send_message(self.clients[client_id]['socket'], {
+                'type': 'error',
+                'message': 'Bạn phải chọn đúng 4 tướng!'
+            })
+            return
+        
+        team = []
+        
+        for champion_ref in selected_team:
+            champion_info = self.registry.resolve(champion_ref)
+            if champion_info is None:
+                self.send_message(self.clients[client_id]['socket'], {
+                    'type': 'error',
+                    'message': f'Tướng {champion_ref} không tồn tại!'
+                })
+                return
+            
+            team.append(self.create_champion(champion_info['name']))
+        
+        self.clients[client_id]['team'] = team
+        self.clients[client_id]['team_snapshot'] = self.team_snapshot(team)
+        
+        self.send_message(self.clients[client_id]['socket'], {
+            'type': 'team_confirmed',
+            'message': f'Đã chọn đội hình: {", ".join(c.name for c in team)}',
+            'team': self.clients[client_id]['team_snapshot']
+        })
+    
+    def handle_ready_to_battle(self, client_id: str, want_log: bool = True, player: Optional[str] = None):
+        """Xử lý khi client sẵn sàng chiến đấu. player là tên dùng để lưu điểm Elo (mặc định client_id)"""
+        if not self.clients[client_id]['team']:
+            self.send_message(self.clients[client_id]['socket'], {
+                'type': 'error',
+                'message': 'Bạn chưa chọn đội hình!'
+            })
+            return
+        
+        self.clients[client_id]['want_log'] = want_log
+        self.clients[client_id]['queued'] = True
+        self.clients[client_id].pop('last_result', None)
+        if player:
+            self.clients[client_id]['player'] = str(player)
+        player = self.clients[client_id].get('player', client_id)
+        
+        if self.broker is not None:
+            # Broker ghép trận với người chơi ở mọi worker và tự trả lời 'waiting'
+            self.broker.enqueue(client_id)
+            return
+        
+        pair, depth = self.matchmaking.push(client_id, self.ratings.get(player))
+        
+        self.send_message(self.clients[client_id]['socket'], {
+            'type': 'waiting',
+            'message': f'Đang chờ đối thủ... ({depth}/2)'
+        })
+        
+        if pair is not None:
+            self.start_battle(*pair)
+    
+    def requeue(self, client_id: str):
+        """Đưa client đã được ghép nhưng mất đối thủ trước khi trận bắt đầu về lại hàng đợi"""
+        client = self.clients.get(client_id)
+        if client is None or not client.get('queued'):
+            return
+        if self.broker is not None:
+            self.broker.enqueue(client_id)
+            return
+        
+        pair, _ = self.matchmaking.push(client_id, self.ratings.get(client.get('player', client_id)))
+        if pair is not None:
+            self.start_battle(*pair)
+    
+    def start_battle(self, client1_id: str, client2_id: str, match_id: Optional[str] = None):
+        """Bắt đầu trận đấu giữa 2 client (match_id do broker cấp khi chạy nhiều worker)"""
+        with self._sessions_lock:
+            client1 = self.clients.get(client1_id)
+            client2 = self.clients.get(client2_id)
+        if client1 is None or client2 is None:
+            # Có người bị xóa giữa lúc được ghép và lúc trận bắt đầu: đưa người còn lại về hàng đợi
+            print(f"⚠️ Hủy trận {client1_id} vs {client2_id}: có người chơi đã rời server")
+            for client_id, client in ((client1_id, client1), (client2_id, client2)):
+                if client is not None:
+                    self.requeue(client_id)
+            return
+        clients = {client1_id: client1, client2_id: client2}
+        
+        if match_id is None:
+            match_id = f"match_{next(self.match_ids)}"
+        
+        print(f"⚔️ Bắt đầu trận đấu {match_id}: {client1_id} vs {client2_id}")
+        for client in (client1, client2):
+            client['queued'] = False
+            client['match_id'] = match_id
+        
+        for side, client_id, opponent_id in [(1, client1_id, client2_id), (2, client2_id, client1_id)]:
+            self.send_message(clients[client_id]['socket'], {
+                'type': 'battle_start',
+                'message': f'Trận đấu bắt đầu! Đối thủ: {opponent_id}',
+                'match_id': match_id,
+                'side': side,
+                'your_team': clients[client_id]['team_snapshot'],
+                'enemy_team': clients[opponent_id]['team_snapshot']
+            })
+        
+        team1, team2 = client1['team'], client2['team']
+        want_log = client1.get('want_log', True) or client2.get('want_log', True)
+        if self.history is not None and self.history_events:
+            want_log = True
+        
+        if self.broadcaster is not None:
+            # Phát từng round cần log dạng sự kiện kể cả khi người chơi không cần log văn bản
+            want_log = True
+            self.broadcaster.open(
+                match_id,
+                [(client1_id, client1['socket']), (client2_id, client2['socket'])],
+                (client1['team_snapshot'], client2['team_snapshot'])
+            )
+        
+        battle_result = self.lookup_battle(team1, team2, want_log)
+        if battle_result is None and self.battle_executor is None:
+            battle_result = self.resolve_battle(team1, team2, want_log)
+        
+        if battle_result is not None:
+            self.deliver_battle_result(match_id, client1_id, client2_id, battle_result)
+            return
+        
+        # Mô phỏng trong pool để không chặn luồng I/O của client
+        key = BattleCache.make_key(team1, team2, self.stat_version)
+        with self._battles_lock:
+            self.battles_in_flight += 1
+        submitted = time.perf_counter()
+        future = self.battle_executor.submit(
+            simulate_task,
+            [(c.name, c.max_hp, c.dmg, c.range) for c in team1],
+            [(c.name, c.max_hp, c.dmg, c.range) for c in team2],
+            want_log
+        )
+        future.add_done_callback(lambda f: self.finish_battle(match_id, client1_id, client2_id, key, submitted, f))
+    
+    def finish_battle(self, match_id: str, client1_id: str, client2_id: str, key, submitted: float, future: Future):
+        """Được gọi khi worker mô phỏng xong"""
+        with self._battles_lock:
+            self.battles_in_flight -= 1
+        
+        try:
+            battle_result, simulate_seconds = future.result()
+        except Exception as e:
+            print(f"❌ Lỗi khi mô phỏng trận {client1_id} vs {client2_id}: {e}")
+            if self.broadcaster is not None:
+                self.broadcaster.close(match_id)
+            for client_id in (client1_id, client2_id):
+                client = self.clients.get(client_id)
+                if client:
+                    client.pop('match_id', None)
+                    self.send_message(client['socket'], {
+                        'type': 'error',
+                        'message': 'Không thể mô phỏng trận đấu, vui lòng thử lại'
+                    })
+            if self.broker is not None:
+                self.broker.release(client1_id, client2_id)
+            return
+        
+        if self.metrics is not None:
+            self.metrics.simulate_seconds.observe(simulate_seconds)
+            # Phần còn lại của thời gian từ lúc gửi vào pool là thời gian chờ worker (và chuyển dữ liệu)
+            self.metrics.battle_queue_seconds.observe(max(time.perf_counter() - submitted - simulate_seconds, 0.0))
+        
+        self.battle_cache.put(key, battle_result)
+        self.deliver_battle_result(match_id, client1_id, client2_id, battle_result)
+    
+    def deliver_battle_result(self, match_id: str, client1_id: str, client2_id: str, result: Dict[str, Any]):
+        """Gửi kết quả ngay, hoặc phát từng round cho người chơi và người xem rồi mới gửi kết quả"""
+        if self.broadcaster is None:
+            self.send_battle_result(match_id, client1_id, client2_id, result)
+            return
+        
+        self.broadcaster.stream(match_id, result['log'].rounds(), result['winner'],
+                                lambda: self.send_battle_result(match_id, client1_id, client2_id, result))
+    
+    def lookup_battle(self, team1: List[Champion], team2: List[Champion], want_log: bool = True) -> Optional[Dict[str, Any]]:
+        """Tìm kết quả không cần mô phỏng: tra bảng tính sẵn khi không ai cần log, sau đó tra cache"""
+        if not want_log and self.matchup_table is not None:
+            outcome = self.matchup_table.lookup(
+                [self.registry.by_name[c.name]['id'] for c in team1],
+                [self.registry.by_name[c.name]['id'] for c in team2]
+            )
+            
+            def final_team(team, hps):
+                final = []
+                for champion, hp in zip(team, hps):
+                    info = self.champion_snapshots[champion.name]
+                    if hp != info['hp']:
+                        info = dict(info, hp=hp, alive=hp > 0)
+                    final.append(info)
+                return final
+            
+            return {
+                'winner': outcome['winner'],
+                'rounds': outcome['rounds'],
+                'log': None,
+                'team1_final': final_team(team1, outcome['team1_hp']),
+                'team2_final': final_team(team2, outcome['team2_hp'])
+            }
+        
+        return self.battle_cache.get(BattleCache.make_key(team1, team2, self.stat_version), want_log)
+    
+    def resolve_battle(self, team1: List[Champion], team2: List[Champion], want_log: bool = True) -> Dict[str, Any]:
+        """Lấy kết quả trận đấu ngay trên luồng hiện tại (tra bảng, cache rồi mới mô phỏng)"""
+        result = self.lookup_battle(team1, team2, want_log)
+        if result is None:
+            started = time.perf_counter()
+            result = BattleEngine.simulate_battle(team1, team2, want_log)
+            if self.metrics is not None:
+                self.metrics.simulate_seconds.observe(time.perf_counter() - started)
+            self.battle_cache.put(BattleCache.make_key(team1, team2, self.stat_version), result)
+        return result
+    
+    def send_battle_result(self, match_id: str, client1_id: str, client2_id: str, result: Dict[str, Any]):
+        winner = result['winner']
+        # Client có thể đã ngắt kết nối trong lúc trận đấu được mô phỏng
+        client1 = self.clients.get(client1_id)
+        client2 = self.clients.get(client2_id)
+        want_log1 = client1 is not None and client1.get('want_log', True)
+        want_log2 = client2 is not None and client2.get('want_log', True)
+        player1 = client1.get('player', client1_id) if client1 else client1_id
+        player2 = client2.get('player', client2_id) if client2 else client2_id
+        
+        rating1, rating2 = self.ratings.record(player1, player2, winner)
+        if self.broker is not None:
+            # Báo điểm mới trước khi gửi kết quả để lần ghép trận sau của hai người dùng điểm mới
+            self.broker.report_ratings((player1, rating1), (player2, rating2))
+        
+        if self.history is not None:
+            # Chỉ đưa vào hàng đợi; luồng ghi nền mới chạm tới đĩa
+            self.history.record(
+                match_id, player1, player2,
+                [c['name'] for c in result['team1_final']], [c['name'] for c in result['team2_final']],
+                [c['max_hp'] for c in result['team1_final'] + result['team2_final']],
+                winner, result['rounds'], result['log'], (rating1, rating2), self.stat_version
+            )
+        if self.replays is not None:
+            self.write_replay(result)
+        
+        # Chỉ dựng log văn bản (một lần cho cả hai người chơi) khi có người dùng JSON cần;
+        # client nhị phân nhận thẳng log dạng sự kiện
+        battle_log = None
+        if result['log'] is not None and (want_log1 and client1['socket'].wire_format == 'json'
+                                          or want_log2 and client2['socket'].wire_format == 'json'):
+            battle_log = result['log'].render()
+        
+        # Phần dùng chung (đội hình cuối, log) chỉ mã hóa một lần cho mỗi định dạng; tin nhắn của
+        # từng người chơi chỉ khác phần đầu nhỏ và được gửi bằng scatter/gather
+        shared = {}
+        
+        players = (
+            (client1, 1, rating1, want_log1),
+            (client2, 2, rating2, want_log2)
+        )
+        for client, side, rating, want_log in players:
+            if client is None:
+                continue
+            
+            # Giữ kết quả đến trận sau để gửi lại khi client resume; phiên đang mất kết nối chỉ giữ lại
+            with self._sessions_lock:
+                client.pop('match_id', None)
+                client['last_result'] = (match_id, side, rating, result)
+                client_socket = client['socket']
+                if client.get('detached'):
+                    continue
+            
+            started = time.perf_counter()
+            parts = self.battle_result_parts(client_socket, match_id, side, rating, result, want_log, battle_log, shared)
+            if self.metrics is not None:
+                self.metrics.encode_seconds.observe(time.perf_counter() - started, (client_socket.wire_format,))
+            self.send_frame_parts(client_socket, parts)
+        
+        if self.broker is not None:
+            self.broker.release(client1_id, client2_id)
+        
+        print(f"✅ Trận đấu kết thúc: {client1_id} vs {client2_id} - Winner: Team {winner}")
+    
+    def battle_result_parts(self, client_socket, match_id: str, side: int, rating: float, result: Dict[str, Any],
+                            want_log: bool, battle_log: Optional[List[str]] = None,
+                            shared: Optional[Dict[tuple, bytes]] = None) -> List[bytes]:
+        """Các đoạn khung battle_result cho người chơi ở phía side. battle_log là log văn bản đã dựng
+        (dựng tại chỗ nếu client JSON cần mà chưa có); shared giữ các trường đã mã hóa để dùng lại
+        cho người chơi kia"""
+        if shared is None:
+            shared = {}
+        
+        def shared_field(field: str, value) -> bytes:
+            key = (field, client_socket.wire_format, client_socket.codec)
+            if key not in shared:
+                shared[key] = encode_value(value, client_socket.wire_format, client_socket.codec)
+            return shared[key]
+        
+        winner = result['winner']
+        header = {
+            'type': 'battle_result',
+            'match_id': match_id,
+            'winner': winner,
+            'your_result': 'win' if winner == side else 'lose' if winner == 3 - side else 'draw',
+            'rating': round(rating)
+        }
+        raw_fields = {
+            'your_team_final': shared_field(f'team{side}', result[f'team{side}_final']),
+            'enemy_team_final': shared_field(f'team{3 - side}', result[f'team{3 - side}_final'])
+        }
+        if want_log:
+            log = result['log']
+            if battle_log is None and log is not None and client_socket.wire_format == 'json':
+                battle_log = log.render()
+            raw_fields['battle_log'] = shared_field('battle_log', self.wire_log(client_socket, log, battle_log))
+        return encode_frame_parts(header, raw_fields, client_socket.wire_format, client_socket.codec)
+    
+    def write_replay(self, result: Dict[str, Any]):
+        by_name = self.registry.by_name
+        self.replays.write(
+            self.stat_version, self.available_champions,
+            [by_name[c['name']]['id'] for c in result['team1_final']],
+            [by_name[c['name']]['id'] for c in result['team2_final']],
+            result['winner'], result['rounds'],
+            [c['hp'] for c in result['team1_final']], [c['hp'] for c in result['team2_final']]
+        )
+    
+    @staticmethod
+    def wire_log(client_socket, log: Optional[BattleLog], rendered: Optional[List[str]]):
+        """Log gửi cho client: BattleLog cho định dạng nhị phân, văn bản đã dựng cho JSON"""
+        if log is not None and client_socket.wire_format == 'binary':
+            return log
+        return rendered
+    
+    def send_message(self, client_socket, message):
+        if self.metrics is None:
+            self.send_frame(client_socket, encode_message(message, client_socket.wire_format, client_socket.codec))
+            return
+        
+        started = time.perf_counter()
+        frame = encode_message(message, client_socket.wire_format, client_socket.codec)
+        self.metrics.encode_seconds.observe(time.perf_counter() - started, (client_socket.wire_format,))
+        self.send_frame(client_socket, frame)
+    
+    def send_frame(self, client_socket, frame: bytes):
+        if client_socket.compression is not None and len(frame) >= self.compress_threshold:
+            frame = self.compress(client_socket, frame, len(frame))
+        if self.metrics is not None:
+            self.metrics.bytes_sent.inc(len(frame))
+        try:
+            client_socket.sendall(frame)
+        except:
+            print("Lỗi khi gửi tin nhắn")
+    
+    def send_frame_parts(self, client_socket, parts: List[bytes]):
+        if client_socket.compression is not None:
+            size = sum(len(p) for p in parts)
+            if size >= self.compress_threshold:
+                parts = [self.compress(client_socket, parts, size)]
+        if self.metrics is not None:
+            self.metrics.bytes_sent.inc(sum(len(p) for p in parts))
+        try:
+            client_socket.sendmsg(parts)
+        except:
+            print("Lỗi khi gửi tin nhắn")
+    
+    def compress(self, client_socket, frame, size: int) -> bytes:
+        """Nén khung (bytes hoặc danh sách đoạn) cho client đã bật nén. Khung được nén độc lập với
+        từ điển dùng chung nên không cần giữ trạng thái nén cho từng kết nối."""
+        compressed = compress_frame(frame, client_socket.wire_format)
+        with self._compression_lock:
+            self.compressed_frames += 1
+            self.compression_bytes_in += size
+            self.compression_bytes_out += len(compressed)
+        return compressed
+    
+    def disconnect_client(self, client_id: str, client_socket=None):
+        """Kết nối client_socket (None = kết nối hiện tại) của client đã đóng. Client đã chọn đội hình
+        mà mất kết nối (không gửi leave) được giữ phiên session_ttl giây để resume; client khác bị xóa ngay."""
+        with self._sessions_lock:
+            client = self.clients.get(client_id)
+            # Phiên đã được kết nối khác resume: chỉ cần đóng kết nối cũ
+            taken_over = client is not None and client_socket is not None and client['socket'] is not client_socket
+            detach = (not taken_over and client is not None and not client.get('left')
+                      and bool(self.session_ttl and client['team']))
+            if detach:
+                client['detached'] = True
+                client_socket = client['socket']
+                self.monitor.detach(client_id)
+        
+        if not (taken_over or detach):
+            self.remove_client(client_id)
+            return
+        
+        try:
+            client_socket.close()
+        except:
+            pass
+        if detach:
+            if self.broadcaster is not None:
+                self.broadcaster.unsubscribe(client_id)
+            print(f"🔌 Client {client_id} mất kết nối, giữ phiên {self.session_ttl:g}s")
+    
+    def remove_client(self, client_id: str):
+        with self._sessions_lock:
+            client = self.clients.pop(client_id, None)
+            if client is not None:
+                self.sessions.pop(client.get('session'), None)
+        if client is not None:
+            try:
+                client['socket'].close()
+            except:
+                pass
+        if self.monitor is not None:
+            self.monitor.forget(client_id)
+        
+        self.matchmaking.remove(client_id)
+        if self.broker is not None:
+            self.broker.client_gone(client_id)
+        if self.broadcaster is not None:
+            self.broadcaster.unsubscribe(client_id)
+        
+        print(f"❌ Client {client_id} đã ngắt kết nối")
+
+class SendQueue(ABC):
+    """Giới hạn dữ liệu chờ gửi của một kết nối (phần chung của hai backend).
+    
+    Khi dữ liệu tồn đọng vượt high_water byte (client không đọc kịp), khung mới bị bỏ và xử lý
+    theo policy: 'drop' chỉ bỏ khung đó, 'disconnect' ngắt kết nối để người chơi khác (và trận đấu)
+    không phải chờ một client chậm. on_overflow(policy) được gọi mỗi lần để server đếm.
+    """
+    
+    def __init__(self, high_water: float = DEFAULT_SEND_QUEUE_LIMIT, policy: str = 'disconnect',
+                 on_overflow: Optional[Callable[[str], None]] = None):
+        self.high_water = high_water
+        self.policy = policy
+        self.on_overflow = on_overflow
+        self.bytes_queued = 0       # tổng số byte đã nhận vào hàng đợi
+        self.peak_pending = 0       # số byte tồn đọng lớn nhất từng có
+        self.frames_dropped = 0
+    
+    def _overflow(self):
+        self.frames_dropped += 1
+        if self.on_overflow is not None:
+            self.on_overflow(self.policy)
+        if self.policy == 'disconnect':
+            self.abort()
+    
+    @abstractmethod
+    def abort(self):
+        """Đóng kết nối ngay, bỏ các khung còn chờ gửi"""
+
+class QueuedClientSocket(SendQueue):
+    """Socket của backend threaded: mỗi kết nối có hàng đợi gửi riêng và một luồng ghi.
+    
+    Luồng I/O, worker mô phỏng, luồng ghép trận và broadcaster chỉ đưa khung vào hàng đợi nên không
+    bao giờ bị chặn bởi client nhận chậm; luồng ghi gom các khung đang chờ vào một lời gọi sendmsg.
+    """
+    
+    def __init__(self, sock: socket.socket, high_water: float = DEFAULT_SEND_QUEUE_LIMIT,
+                 policy: str = 'disconnect', on_overflow: Optional[Callable[[str], None]] = None):
+        super().__init__(high_water, policy, on_overflow)
+        self.sock = sock
+        self.wire_format = 'json'
+        self.codec = None
+        self.compression = None
+        self.client_id = None
+        self.pending = deque()  # memoryview các khung chưa gửi, theo thứ tự
+        self._pending_bytes = 0
+        self._closing = False
+        self._cond = threading.Condition()
+        
+        self._writer = threading.Thread(target=self._write_loop, name='client-writer')
+        self._writer.daemon = True
+        self._writer.start()
+    
+    def _enqueue(self, buffers: List[bytes], limit: float = float('inf')) -> bool:
+        size = sum(len(b) for b in buffers)
+        with self._cond:
+            if self._closing:
+                return False
+            pending = self._pending_bytes + size
+            if pending > limit:
+                return False
+            if pending <= self.high_water:
+                self.pending.extend(memoryview(b) for b in buffers)
+                self._pending_bytes = pending
+                self.bytes_queued += size
+                self.peak_pending = max(self.peak_pending, pending)
+                self._cond.notify_all()
+                return True
+        self._overflow()
+        return False
+    
+    def sendall(self, data: bytes):
+        self._enqueue([data])
+    
+    def sendmsg(self, buffers: List[bytes]):
+        """Các đoạn của một tin nhắn được đưa vào hàng đợi cùng lúc (không ghép lại)"""
+        self._enqueue(buffers)
+    
+    def write_nowait(self, data: bytes, limit: float) -> bool:
+        """Trả về False (và bỏ khung) nếu dữ liệu tồn đọng sẽ vượt quá limit byte"""
+        return self._enqueue([data], limit)
+    
+    def pending_bytes(self) -> int:
+        return self._pending_bytes
+    
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while not self.pending and not self._closing:
+                    self._cond.wait()
+                if not self.pending:
+                    return
+                buffers = list(itertools.islice(self.pending, SENDMSG_MAX_BUFFERS))
+            
+            try:
+                sent = self.sock.sendmsg(buffers)
+            except OSError:
+                self._discard()
+                return
+            
+            with self._cond:
+                self._pending_bytes -= sent
+                # sendmsg có thể chỉ gửi được một phần: bỏ các đoạn đã gửi xong, cắt đoạn dở dang
+                while self.pending and sent >= len(self.pending[0]):
+                    sent -= len(self.pending[0])
+                    self.pending.popleft()
+                if sent:
+                    self.pending[0] = self.pending[0][sent:]
+                self._cond.notify_all()
+    
+    def _discard(self):
+        with self._cond:
+            self._closing = True
+            self.pending.clear()
+            self._pending_bytes = 0
+            self._cond.notify_all()
+    
+    def abort(self):
+        """Ngắt kết nối ngay: luồng đọc nhận EOF và server dọn client như khi client tự ngắt"""
+        self._discard()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    
+    def close(self, linger: float = CLOSE_LINGER):
+        """Chờ tối đa linger giây để gửi nốt hàng đợi (ví dụ tin nhắn lỗi trước khi ngắt) rồi đóng"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: not self.pending, linger)
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+class AsyncClientSocket(SendQueue):
+    """Bọc StreamWriter để process_message dùng được như socket thường. Buffer của transport là
+    hàng đợi gửi của kết nối, được event loop đẩy dần khi socket ghi được."""
+    
+    def __init__(self, writer: asyncio.StreamWriter, loop: asyncio.AbstractEventLoop,
+                 high_water: float = DEFAULT_SEND_QUEUE_LIMIT, policy: str = 'disconnect',
+                 on_overflow: Optional[Callable[[str], None]] = None):
+        super().__init__(high_water, policy, on_overflow)
+        self.writer = writer
+        self.loop = loop
+        self.wire_format = 'json'
+        self.codec = None
+        self.compression = None
+        self.client_id = None
+        self._scheduled = 0  # byte đã chuyển cho event loop từ luồng khác nhưng chưa vào transport
+        self._scheduled_lock = threading.Lock()
+    
+    def _in_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+    
+    def _schedule(self, write, data, size: int):
+        with self._scheduled_lock:
+            self._scheduled += size
+        self.loop.call_soon_threadsafe(self._write_scheduled, write, data, size)
+    
+    def _write_scheduled(self, write, data, size: int):
+        with self._scheduled_lock:
+            self._scheduled -= size
+        write(data)
+    
+    def _accept(self, size: int, limit: float = float('inf')) -> bool:
+        if self.writer.transport.is_closing():
+            return False  # đã bị ngắt (abort) hoặc đang đóng
+        pending = self.pending_bytes() + size
+        if pending > limit:
+            return False
+        if pending > self.high_water:
+            self._overflow()
+            return False
+        self.bytes_queued += size
+        self.peak_pending = max(self.peak_pending, pending)
+        return True
+    
+    def _write(self, data: bytes):
+        # writer.write không chặn: dữ liệu được đưa vào buffer của transport
+        if self._in_loop():
+            self.writer.write(data)
+        else:
+            self._schedule(self.writer.write, data, len(data))
+    
+    def sendall(self, data: bytes):
+        if self._accept(len(data)):
+            self._write(data)
+    
+    def sendmsg(self, buffers: List[bytes]):
+        size = sum(len(b) for b in buffers)
+        if not self._accept(size):
+            return
+        # Transport tự gom các đoạn (dùng sendmsg nếu phiên bản asyncio hỗ trợ)
+        if self._in_loop():
+            self.writer.writelines(buffers)
+        else:
+            self._schedule(self.writer.writelines, buffers, size)
+    
+    def pending_bytes(self) -> int:
+        return self.writer.transport.get_write_buffer_size() + self._scheduled
+    
+    def write_nowait(self, data: bytes, limit: float) -> bool:
+        """Như sendall nhưng bỏ khung (trả về False) nếu dữ liệu tồn đọng sẽ vượt quá limit byte"""
+        if not self._accept(len(data), limit):
+            return False
+        self._write(data)
+        return True
+    
+    def abort(self):
+        # Bỏ buffer và đóng ngay; handle_connection nhận EOF và dọn client
+        if self._in_loop():
+            self.writer.transport.abort()
+        else:
+            self.loop.call_soon_threadsafe(self.writer.transport.abort)
+    
+    def close(self):
+        if self._in_loop():
+            self.writer.close()
+        else:
+            self.loop.call_soon_threadsafe(self.writer.close)
+
+class AsyncGameServer(GameServer):
+    """Server dùng asyncio: một event loop phục vụ tất cả kết nối thay vì mỗi client một thread"""
+    
+    def start_server(self):
+        try:
+            asyncio.run(self.serve())
+        except Exception as e:
+            print(f"❌ Lỗi server: {e}")
+        finally:
+            self.shutdown_workers()
+    
+    async def serve(self):
+        server = await asyncio.start_server(
+            self.handle_connection, self.host, self.port,
+            backlog=self.backlog, reuse_address=True, reuse_port=self.reuse_port or None
+        )
+        self.start_matchmaker()
+        self.start_monitor()
+        self.start_metrics_endpoint()
+        print(f"🎮 Battle Chess Server (asyncio) đang chạy tại {self.host}:{self.port}")
+        print("Đang chờ client kết nối...")
+        
+        async with server:
+            await server.serve_forever()
+    
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client_id = self.next_client_id()
+        addr = writer.get_extra_info('peername')
+        
+        print(f"✅ Client {client_id} kết nối từ {addr}")
+        
+        connection = AsyncClientSocket(writer, asyncio.get_running_loop(), **self.send_queue_options())
+        try:
+            self.register_client(client_id, connection)
+            
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                
+                if not self.handle_data(connection.client_id, data):
+                    break
+                
+        except Exception as e:
+            print(f"❌ Lỗi khi xử lý client {connection.client_id}: {e}")
+        finally:
+            self.disconnect_client(connection.client_id, connection)
+
+SERVER_BACKENDS = {
+    'threaded': GameServer,
+    'async': AsyncGameServer
+}
+
+def build_parser(description: str = 'Battle Chess Server') -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8888)
+    parser.add_argument('--backend', choices=sorted(SERVER_BACKENDS), default='threaded',
+                        help='threaded: mỗi client một thread, async: một event loop asyncio')
+    parser.add_argument('--matchup-table', default=None,
+                        help='bảng kết quả tính sẵn (tạo bằng: python MatchupTable.py build <file>)')
+    parser.add_argument('--battle-workers', type=int, default=None,
+                        help='số worker mô phỏng trận đấu (mặc định: số core, 0 = mô phỏng trên luồng I/O)')
+    parser.add_argument('--battle-pool', choices=['thread', 'process'], default='thread',
+                        help='process: dùng nhiều tiến trình để tận dụng mọi core')
+    parser.add_argument('--matchmaking', choices=sorted(MATCHMAKERS), default='fifo',
+                        help='fifo: ghép theo thứ tự đến, rating: ghép theo điểm Elo gần nhau')
+    parser.add_argument('--champions', default=DEFAULT_CHAMPIONS_FILE,
+                        help='file JSON danh mục tướng')
+    parser.add_argument('--battle-cache', type=int, default=1024,
+                        help='số kết quả trận đấu tối đa giữ trong cache LRU (0 = tắt)')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='bật metrics và phục vụ http://<metrics-host>:<port>/metrics (định dạng Prometheus)')
+    parser.add_argument('--metrics-host', default='localhost')
+    parser.add_argument('--stream-rounds', type=float, default=None, metavar='SECONDS',
+                        help='phát trực tiếp từng round cho người chơi và người xem, cách nhau SECONDS giây')
+    parser.add_argument('--history', default=None, metavar='FILE',
+                        help='lưu mọi trận đấu vào file SQLite (tra cứu: python MatchHistory.py)')
+    parser.add_argument('--history-events', action='store_true',
+                        help='lưu cả diễn biến từng trận (luôn mô phỏng kèm log, không dùng bảng tính sẵn)')
+    parser.add_argument('--replays', default=None, metavar='DIR',
+                        help='ghi replay mọi trận vào thư mục DIR (kiểm tra: python Replay.py verify DIR/*.bcr)')
+    parser.add_argument('--send-queue-limit', type=int, default=DEFAULT_SEND_QUEUE_LIMIT, metavar='BYTES',
+                        help='số byte chờ gửi tối đa của mỗi kết nối trước khi coi client là chậm')
+    parser.add_argument('--slow-client', choices=SLOW_CLIENT_POLICIES, default='disconnect',
+                        help='disconnect: ngắt client không đọc kịp, drop: bỏ tin nhắn mới cho client đó')
+    parser.add_argument('--compress-threshold', type=int, default=DEFAULT_COMPRESS_THRESHOLD, metavar='BYTES',
+                        help='nén các khung từ BYTES byte trở lên cho client bật nén (0 = không hỗ trợ nén)')
+    parser.add_argument('--heartbeat', type=float, default=DEFAULT_HEARTBEAT_INTERVAL, metavar='SECONDS',
+                        help='gửi ping cho kết nối im lặng SECONDS giây (0 = tắt ping và việc ngắt kết nối im lặng)')
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT, metavar='SECONDS',
+                        help='ngắt kết nối im lặng (không trả lời ping) quá SECONDS giây')
+    parser.add_argument('--session-ttl', type=float, default=DEFAULT_SESSION_TTL, metavar='SECONDS',
+                        help='giữ phiên của client mất kết nối SECONDS giây để kết nối lại bằng resume (0 = tắt)')
+    parser.add_argument('--tournament-workers', type=int, default=None,
+                        help='số tiến trình chạy giải đấu (tin nhắn tournament, mặc định: số core)')
+    parser.add_argument('--tournament-max-teams', type=int, default=DEFAULT_TOURNAMENT_MAX_TEAMS,
+                        help='số đội tối đa của một giải đấu')
+    return parser
+
+def parse_args(argv=None):
+    return build_parser().parse_args(argv)
+
+def create_server(args, **overrides) -> GameServer:
+    """Tạo server từ tham số dòng lệnh; overrides ghi đè từng tham số của GameServer"""
+    options = dict(matchup_table=args.matchup_table, battle_cache_size=args.battle_cache,
+                   champions_file=args.champions, battle_workers=args.battle_workers,
+                   battle_pool=args.battle_pool, matchmaking=args.matchmaking,
+                   stream_rounds=args.stream_rounds, metrics_port=args.metrics_port,
+                   metrics_host=args.metrics_host, history=args.history,
+                   history_events=args.history_events, replay_dir=args.replays,
+                   send_queue_limit=args.send_queue_limit, slow_client=args.slow_client,
+                   tournament_workers=args.tournament_workers, tournament_max_teams=args.tournament_max_teams,
+                   compress_threshold=args.compress_threshold, heartbeat_interval=args.heartbeat,
+                   idle_timeout=args.idle_timeout, session_ttl=args.session_ttl)
+    options.update(overrides)
+    return SERVER_BACKENDS[args.backend](args.host, args.port, **options)
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = create_server(args)
+    try:
+        server.start_server()
+    except KeyboardInterrupt:
+        print("\n🛑 Server đã dừng")
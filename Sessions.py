@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battle Chess Sessions - Heartbeat, dọn kết nối im lặng và giữ phiên để client kết nối lại
+Nhóm 13
+
+Mọi hẹn giờ (gửi ping, ngắt kết nối im lặng quá lâu, hết hạn phiên đã mất kết nối) nằm trên một
+bánh xe hẹn giờ duy nhất do một luồng quay, thay vì mỗi client một timer. Nhận dữ liệu chỉ ghi lại
+thời điểm (touch); hẹn giờ của client không bị đặt lại mỗi tin nhắn mà khi đến hạn mới xem client
+đã im lặng bao lâu để quyết định gửi ping, ngắt kết nối hay hẹn lại.
+"""
+
+import math
+import time
+import secrets
+import threading
+from typing import Dict, Hashable, List, Callable, Optional
+
+def new_session_token() -> str:
+    return secrets.token_urlsafe(16)
+
+class TimerWheel:
+    """Bánh xe hẹn giờ (hashed timing wheel): hẹn, hẹn lại và hủy đều O(1).
+    
+    Mỗi khóa có tối đa một hẹn giờ. Ô thứ i chứa các hẹn giờ đến hạn ở các tick i, i + slots,
+    i + 2*slots...; advance() chỉ duyệt các ô đã đi qua. Hạn được làm tròn lên tick kế tiếp nên
+    hẹn giờ không bao giờ đến sớm, chỉ trễ tối đa một tick.
+    """
+    
+    def __init__(self, tick: float = 0.5, slots: int = 512, clock: Callable[[], float] = time.monotonic):
+        self.tick = tick
+        self.clock = clock
+        self.slots = [{} for _ in range(slots)]  # {khóa: tick đến hạn}
+        self.where = {}  # {khóa: ô đang chứa hẹn giờ}
+        self.current = int(clock() / tick)
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self.where)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.where
+    
+    def schedule(self, key: Hashable, delay: float):
+        """Hẹn (hoặc hẹn lại) key sau delay giây"""
+        with self._lock:
+            deadline = max(math.ceil((self.clock() + delay) / self.tick), self.current + 1)
+            self._cancel(key)
+            slot = deadline % len(self.slots)
+            self.slots[slot][key] = deadline
+            self.where[key] = slot
+    
+    def cancel(self, key: Hashable):
+        with self._lock:
+            self._cancel(key)
+    
+    def _cancel(self, key: Hashable):
+        slot = self.where.pop(key, None)
+        if slot is not None:
+            del self.slots[slot][key]
+    
+    def advance(self) -> List[Hashable]:
+        """Quay bánh xe đến thời điểm hiện tại, trả về các khóa đã đến hạn (và bỏ chúng khỏi bánh xe)"""
+        expired = []
+        with self._lock:
+            target = int(self.clock() / self.tick)
+            # Bị trễ hơn một vòng (máy ngủ, luồng bị chặn) thì chỉ cần duyệt mỗi ô một lần
+            for tick in range(max(self.current + 1, target - len(self.slots) + 1), target + 1):
+                slot = self.slots[tick % len(self.slots)]
+                due = [key for key, deadline in slot.items() if deadline <= target]
+                for key in due:
+                    del slot[key]
+                    del self.where[key]
+                expired.extend(due)
+            self.current = max(self.current, target)
+        return expired
+
+class ConnectionMonitor:
+    """Theo dõi các kết nối đang mở và các phiên đã mất kết nối trên một TimerWheel.
+    
+    - kết nối im lặng interval giây: on_ping(client_id) (server gửi ping, client trả lời pong)
+    - kết nối im lặng timeout giây: on_idle(client_id) (server ngắt kết nối, kể cả kết nối half-open
+      mà recv() không bao giờ báo đóng)
+    - phiên mất kết nối quá session_ttl giây mà không được resume: on_expire(client_id)
+    
+    interval = None thì không gửi ping và không ngắt kết nối im lặng, chỉ theo dõi phiên.
+    """
+    
+    def __init__(self, interval: Optional[float], timeout: float, session_ttl: float,
+                 on_ping: Callable[[str], None], on_idle: Callable[[str], None],
+                 on_expire: Callable[[str], None], tick: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.interval = interval
+        self.timeout = timeout
+        self.session_ttl = session_ttl
+        self.on_ping = on_ping
+        self.on_idle = on_idle
+        self.on_expire = on_expire
+        self.clock = clock
+        # Tick đủ nhỏ so với khoảng thời gian ngắn nhất cần đo
+        shortest = min(t for t in (interval, session_ttl) if t) if interval or session_ttl else 1.0
+        self.wheel = TimerWheel(tick or min(max(shortest / 8, 0.01), 1.0), clock=clock)
+        self.last_seen = {}  # {client_id: thời điểm nhận dữ liệu gần nhất} của kết nối đang mở
+        self.detached = {}   # {client_id: thời điểm mất kết nối} của phiên chờ resume
+        self.pings_sent = 0
+        self.idle_reaped = 0
+        self.expired = 0
+    
+    def watch(self, client_id: str):
+        """Bắt đầu theo dõi một kết nối (kết nối mới hoặc phiên vừa được resume)"""
+        self.detached.pop(client_id, None)
+        if self.interval is None:
+            self.wheel.cancel(client_id)
+            return
+        self.last_seen[client_id] = self.clock()
+        self.wheel.schedule(client_id, self.interval)
+    
+    def touch(self, client_id: str):
+        """Gọi mỗi lần nhận dữ liệu: chỉ ghi lại thời điểm, không đụng tới bánh xe"""
+        if client_id in self.last_seen:
+            self.last_seen[client_id] = self.clock()
+    
+    def detach(self, client_id: str):
+        """Kết nối đã đóng nhưng phiên được giữ session_ttl giây để resume"""
+        self.last_seen.pop(client_id, None)
+        self.detached[client_id] = self.clock()
+        self.wheel.schedule(client_id, self.session_ttl)
+    
+    def forget(self, client_id: str):
+        self.last_seen.pop(client_id, None)
+        self.detached.pop(client_id, None)
+        self.wheel.cancel(client_id)
+    
+    def start(self):
+        thread = threading.Thread(target=self.run, name='connection-monitor')
+        thread.daemon = True
+        thread.start()
+    
+    def run(self):
+        while True:
+            time.sleep(self.wheel.tick)
+            for client_id in self.wheel.advance():
+                try:
+                    self.expire(client_id)
+                except Exception as e:
+                    print(f"❌ Lỗi khi kiểm tra kết nối {client_id}: {e}")
+    
+    def expire(self, client_id: str):
+        """Hẹn giờ của client_id đến hạn: quyết định theo trạng thái hiện tại rồi hẹn lại nếu cần"""
+        now = self.clock()
+    
+        detached_at = self.detached.get(client_id)
+        if detached_at is not None:
+            remaining = detached_at + self.session_ttl - now
+            if remaining > 0:
+                self.wheel.schedule(client_id, remaining)
+                return
+            self.detached.pop(client_id, None)
+            self.expired += 1
+            self.on_expire(client_id)
+            return
+    
+        last_seen = self.last_seen.get(client_id)
+        if last_seen is None or self.interval is None:
+            return  # đã forget
+    
+        idle = now - last_seen
+        if idle >= self.timeout:
+            self.idle_reaped += 1
+            self.on_idle(client_id)
+            # Hẹn lại phòng khi ngắt kết nối không làm luồng đọc kết thúc; detach/forget sẽ ghi đè
+            self.wheel.schedule(client_id, self.interval)
+        elif idle >= self.interval:
+            self.pings_sent += 1
+            self.on_ping(client_id)
+            self.wheel.schedule(client_id, self.timeout - idle)
+        else:
+            self.wheel.schedule(client_id, self.interval - idle)
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            'watched': len(self.last_seen),
+            'detached': len(self.detached),
+            'timers': len(self.wheel),
+            'pings_sent': self.pings_sent,
+            'idle_reaped': self.idle_reaped,
+            'expired': self.expired
+        }
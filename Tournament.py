@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battle Chess Tournament - Giải đấu vòng tròn hoặc hệ Thụy Sĩ cho nhiều đội hình cùng lúc
+Nhóm 13
+
+Mỗi cặp đấu gồm legs trận (mặc định 2: mỗi đội đánh trước một lần, vì đánh trước có lợi).
+Thắng 1 điểm, hòa 0.5 điểm mỗi trận. Các trận của một vòng được chia cho pool tiến trình và
+bảng xếp hạng được trả về sau mỗi vòng (Tournament.run là generator), nên server gửi được
+bảng xếp hạng dần dần trong lúc giải đấu đang chạy.
+
+- round_robin: mọi cặp đội gặp nhau một lần, xếp lịch theo phương pháp vòng tròn (n-1 vòng)
+- swiss: mỗi vòng ghép các đội cùng điểm chưa gặp nhau; số đội lẻ thì đội xếp cuối chưa được
+  miễn đấu sẽ được miễn đấu (tính như thắng cả legs trận). Mặc định ceil(log2 n) vòng
+
+Xếp hạng theo điểm, rồi Buchholz (tổng điểm các đối thủ đã gặp), rồi số trận thắng.
+
+Chạy: python Tournament.py teams.json --format swiss --rounds 7
+      python Tournament.py --random 500 --format round_robin --workers 4
+teams.json: [{"name": "Đội A", "team": ["Tank", "Knight", "Warrior", "Mage"]}, ...]
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+
+TOURNAMENT_FORMATS = ('round_robin', 'swiss')
+
+def _play_chunk(stats: List[tuple], pairings: List[Tuple[int, int, tuple, tuple]], legs: int):
+    """Chạy trong worker: đánh các cặp (đội a, đội b, đội hình a, đội hình b),
+    trả về [(a, b, [người thắng của từng trận theo góc nhìn a: 1 a thắng, 2 b thắng, 0 hòa])]"""
+    from Server import BattleEngine, Champion
+    
+    # Đội hình trùng nhau (đội hình phổ biến) chỉ cần mô phỏng một lần: kết quả là tất định
+    outcomes = {}
+    
+    def winner(first: tuple, second: tuple) -> int:
+        key = (first, second)
+        if key not in outcomes:
+            outcomes[key] = BattleEngine.simulate_battle(
+                [Champion(*stats[i]) for i in first], [Champion(*stats[i]) for i in second], record_log=False
+            )['winner']
+        return outcomes[key]
+    
+    results = []
+    for a, b, team_a, team_b in pairings:
+        games = []
+        for leg in range(legs):
+            if leg % 2 == 0:
+                games.append(winner(team_a, team_b))
+            else:
+                # b đánh trước: đổi lại góc nhìn của a
+                games.append((0, 2, 1)[winner(team_b, team_a)])
+        results.append((a, b, games))
+    return results
+
+class Standing:
+    __slots__ = ('index', 'name', 'team', 'points', 'wins', 'draws', 'losses', 'byes', 'opponents')
+    
+    def __init__(self, index: int, name: str, team: List[int]):
+        self.index = index
+        self.name = name
+        self.team = team
+        self.points = 0.0
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        self.byes = 0
+        self.opponents = []
+
+class Tournament:
+    """teams: [(tên đội, [ID tướng])]; champions: danh mục tướng (mỗi tướng có id, name, hp, dmg, range)"""
+    
+    def __init__(self, champions: List[Dict[str, Any]], teams: List[Tuple[str, List[int]]],
+                 format: str = 'round_robin', rounds: Optional[int] = None, legs: int = 2):
+        if format not in TOURNAMENT_FORMATS:
+            raise ValueError(f'Thể thức không hỗ trợ: {format}')
+        if len(teams) < 2:
+            raise ValueError('Cần ít nhất 2 đội')
+        if legs not in (1, 2) or isinstance(legs, bool):
+            raise ValueError('legs phải là 1 hoặc 2')
+        if rounds is not None and (not isinstance(rounds, int) or isinstance(rounds, bool) or rounds < 1):
+            raise ValueError('rounds phải là số nguyên dương')
+    
+        self.stats = [(c['name'], c['hp'], c['dmg'], c['range']) for c in champions]
+        self.names = [c['name'] for c in champions]
+        self.format = format
+        self.legs = legs
+        self.entries = [Standing(i, name, list(team)) for i, (name, team) in enumerate(teams)]
+        self.played = [set() for _ in teams]  # đối thủ đã gặp (hệ Thụy Sĩ tránh gặp lại)
+    
+        n = len(teams)
+        if format == 'round_robin':
+            self.rounds = n - 1 if n % 2 == 0 else n
+            self.games_total = n * (n - 1) // 2 * legs
+        else:
+            self.rounds = min(rounds or math.ceil(math.log2(n)), n - 1 if n % 2 == 0 else n)
+            self.games_total = self.rounds * (n // 2) * legs
+        self.games_played = 0
+        self.round = 0
+    
+    def round_robin_schedule(self) -> List[List[Tuple[int, int]]]:
+        """Phương pháp vòng tròn: giữ cố định đội đầu, xoay các đội còn lại (None = miễn đấu)"""
+        slots = list(range(len(self.entries)))
+        if len(slots) % 2:
+            slots.append(None)
+        half = len(slots) // 2
+        schedule = []
+        for round_index in range(len(slots) - 1):
+            pairs = []
+            for i in range(half):
+                a, b = slots[i], slots[-1 - i]
+                if a is not None and b is not None:
+                    # Đổi chiều theo vòng để không đội nào luôn là đội đánh trước khi legs=1
+                    pairs.append((a, b) if (round_index + i) % 2 == 0 else (b, a))
+            schedule.append(pairs)
+            slots = [slots[0], slots[-1]] + slots[1:-1]
+        return schedule
+    
+    def swiss_pairings(self) -> Tuple[List[Tuple[int, int]], Optional[int]]:
+        """Ghép các đội theo thứ hạng hiện tại, ưu tiên cặp chưa gặp nhau"""
+        order = [entry.index for entry in self.ranked()]
+        bye = None
+        if len(order) % 2:
+            bye = next((i for i in reversed(order) if not self.entries[i].byes), order[-1])
+            order.remove(bye)
+    
+        pairs, paired = [], set()
+        for position, a in enumerate(order):
+            if a in paired:
+                continue
+            candidates = [b for b in order[position + 1:] if b not in paired]
+            b = next((b for b in candidates if b not in self.played[a]), candidates[0])
+            pairs.append((a, b))
+            paired.update((a, b))
+        return pairs, bye
+    
+    def record(self, a: int, b: int, games: List[int]):
+        entry_a, entry_b = self.entries[a], self.entries[b]
+        for winner in games:
+            if winner == 1:
+                entry_a.points += 1.0
+                entry_a.wins += 1
+                entry_b.losses += 1
+            elif winner == 2:
+                entry_b.points += 1.0
+                entry_b.wins += 1
+                entry_a.losses += 1
+            else:
+                entry_a.points += 0.5
+                entry_b.points += 0.5
+                entry_a.draws += 1
+                entry_b.draws += 1
+        entry_a.opponents.append(b)
+        entry_b.opponents.append(a)
+        self.played[a].add(b)
+        self.played[b].add(a)
+        self.games_played += len(games)
+    
+    def award_bye(self, index: int):
+        entry = self.entries[index]
+        entry.points += float(self.legs)
+        entry.byes += 1
+    
+    def buchholz(self, entry: Standing) -> float:
+        return sum(self.entries[i].points for i in entry.opponents)
+    
+    def ranked(self) -> List[Standing]:
+        return sorted(self.entries, key=lambda e: (-e.points, -self.buchholz(e), -e.wins, e.index))
+    
+    def standings(self, top: Optional[int] = None) -> List[Dict[str, Any]]:
+        ranked = self.ranked()
+        if top is not None:
+            ranked = ranked[:top]
+        return [{
+            'rank': rank,
+            'name': entry.name,
+            'team': [self.names[i] for i in entry.team],
+            'points': entry.points,
+            'wins': entry.wins,
+            'draws': entry.draws,
+            'losses': entry.losses,
+            'byes': entry.byes,
+            'buchholz': self.buchholz(entry)
+        } for rank, entry in enumerate(ranked, 1)]
+    
+    def progress(self, top: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            'round': self.round,
+            'rounds': self.rounds,
+            'games_played': self.games_played,
+            'games_total': self.games_total,
+            'standings': self.standings(top)
+        }
+    
+    def _submit(self, executor, pairs: List[Tuple[int, int]]) -> list:
+        """Chia các cặp của một vòng cho mọi worker"""
+        workers = getattr(executor, '_max_workers', 1)
+        chunk = max(1, -(-len(pairs) // workers))
+        return [
+            executor.submit(_play_chunk, self.stats,
+                            [(a, b, tuple(self.entries[a].team), tuple(self.entries[b].team))
+                             for a, b in pairs[start:start + chunk]],
+                            self.legs)
+            for start in range(0, len(pairs), chunk)
+        ]
+    
+    def run(self, executor, top: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Chạy giải đấu trên executor, trả về tiến độ (progress()) sau mỗi vòng.
+        Dừng generator giữa chừng (close()) sẽ hủy các vòng chưa chạy."""
+        futures = []
+        try:
+            if self.format == 'round_robin':
+                # Lịch thi đấu biết trước: gửi tất cả các vòng vào pool ngay, nhận kết quả theo thứ tự vòng
+                futures = [self._submit(executor, pairs) for pairs in self.round_robin_schedule()]
+                for round_futures in futures:
+                    for future in round_futures:
+                        for a, b, games in future.result():
+                            self.record(a, b, games)
+                    self.round += 1
+                    yield self.progress(top)
+            else:
+                for _ in range(self.rounds):
+                    pairs, bye = self.swiss_pairings()
+                    round_futures = self._submit(executor, pairs)
+                    futures.append(round_futures)
+                    for future in round_futures:
+                        for a, b, games in future.result():
+                            self.record(a, b, games)
+                    if bye is not None:
+                        self.award_bye(bye)
+                    self.round += 1
+                    yield self.progress(top)
+        finally:
+            for round_futures in futures:
+                for future in round_futures:
+                    future.cancel()
+
+def parse_teams(registry, entries: Any, max_teams: Optional[int] = None) -> List[Tuple[str, List[int]]]:
+    """entries: [{"name": ..., "team": [4 ID hoặc tên tướng]}] hoặc [[4 ID hoặc tên tướng]].
+    Trả về [(tên đội, [ID tướng])], ValueError nếu danh sách không hợp lệ"""
+    if not isinstance(entries, list) or len(entries) < 2:
+        raise ValueError('Cần danh sách ít nhất 2 đội')
+    if max_teams is not None and len(entries) > max_teams:
+        raise ValueError(f'Tối đa {max_teams} đội mỗi giải đấu')
+    
+    teams = []
+    for i, entry in enumerate(entries):
+        name, refs = f'Đội {i + 1}', entry
+        if isinstance(entry, dict):
+            name, refs = str(entry.get('name', name))[:64], entry.get('team')
+        if not isinstance(refs, list) or len(refs) != 4:
+            raise ValueError(f'{name}: phải chọn đúng 4 tướng')
+        champions = [registry.resolve(ref) for ref in refs]
+        if None in champions:
+            raise ValueError(f'{name}: tướng {refs[champions.index(None)]} không tồn tại')
+        teams.append((name, [c['id'] for c in champions]))
+    return teams
+
+def random_teams(count: int, champions: List[Dict[str, Any]], seed: int = 13) -> List[Tuple[str, List[int]]]:
+    rng = random.Random(seed)
+    return [(f'Đội {i + 1}', [rng.randrange(len(champions)) for _ in range(4)]) for i in range(count)]
+
+def print_standings(standings: List[Dict[str, Any]]):
+    print(f"{'#':>4} {'Đội':<16} {'Điểm':>6} {'T':>5} {'H':>5} {'B':>5} {'Buchholz':>9}  Đội hình")
+    for row in standings:
+        print(f"{row['rank']:>4} {row['name'][:16]:<16} {row['points']:>6.1f} {row['wins']:>5} {row['draws']:>5} "
+              f"{row['losses']:>5} {row['buchholz']:>9.1f}  {', '.join(row['team'])}")
+
+def main(argv=None):
+    from Server import ChampionRegistry, DEFAULT_CHAMPIONS_FILE
+    
+    parser = argparse.ArgumentParser(description='Giải đấu cho nhiều đội hình (không cần kết nối tới server)')
+    parser.add_argument('teams', nargs='?', help='file JSON: [{"name": ..., "team": [4 ID hoặc tên tướng]}]')
+    parser.add_argument('--random', type=int, default=0, metavar='N', help='tạo N đội hình ngẫu nhiên thay cho file')
+    parser.add_argument('--format', choices=TOURNAMENT_FORMATS, default='round_robin')
+    parser.add_argument('--rounds', type=int, default=None, help='số vòng của hệ Thụy Sĩ (mặc định ceil(log2 số đội))')
+    parser.add_argument('--legs', type=int, choices=[1, 2], default=2, help='số trận mỗi cặp đấu')
+    parser.add_argument('--workers', type=int, default=None, help='số tiến trình (mặc định: số core)')
+    parser.add_argument('--top', type=int, default=10, help='số đội in ra sau mỗi vòng')
+    parser.add_argument('--champions', default=DEFAULT_CHAMPIONS_FILE)
+    parser.add_argument('--seed', type=int, default=13)
+    args = parser.parse_args(argv)
+    
+    if not args.random and not args.teams:
+        parser.error('cần file đội hình hoặc --random N')
+    
+    registry = ChampionRegistry.load(args.champions)
+    try:
+        if args.random:
+            teams = random_teams(args.random, registry.champions, args.seed)
+        else:
+            with open(args.teams, encoding='utf-8') as f:
+                teams = parse_teams(registry, json.load(f))
+        tournament = Tournament(registry.champions, teams, args.format, args.rounds, args.legs)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"🏆 {len(teams)} đội, {args.format}, {tournament.rounds} vòng, {tournament.games_total:,} trận")
+    
+    started = time.perf_counter()
+    executor = ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context('spawn'))
+    with executor:
+        for progress in tournament.run(executor, args.top):
+            leader = progress['standings'][0]
+            print(f"⏳ Vòng {progress['round']}/{progress['rounds']}: {progress['games_played']:,} trận, "
+                  f"dẫn đầu {leader['name']} ({leader['points']:.1f} điểm)")
+    elapsed = time.perf_counter() - started
+    
+    print(f"\n✅ Xong {tournament.games_played:,} trận trong {elapsed:.1f}s "
+          f"({tournament.games_played / elapsed:,.0f} trận/s)\n")
+    print_standings(tournament.standings(args.top))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
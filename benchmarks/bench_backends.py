@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+So sánh backend threaded và async của GameServer:
+- Số kết nối nhàn rỗi trên mỗi MB RAM của tiến trình server
+- Độ trễ p99 của tin nhắn select_team -> team_confirmed khi đang giữ nhiều kết nối
+
+Chạy: python benchmarks/bench_backends.py --connections 2000 --messages 2000
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def rss_kb(pid: int) -> int:
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+def wait_for_port(host: str, port: int, timeout: float = 10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'Server không mở cổng {port}')
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[index]
+
+async def open_connection(host, port):
+    reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+    await reader.readline()  # welcome
+    return reader, writer
+
+async def open_connections(host, port, connections, batch_size=100):
+    # Mở theo từng đợt nhỏ để không tràn hàng đợi listen() của server
+    conns = []
+    for start in range(0, connections, batch_size):
+        batch = [open_connection(host, port) for _ in range(start, min(connections, start + batch_size))]
+        conns.extend(await asyncio.gather(*batch))
+    return conns
+
+async def measure_latency(conns, messages, concurrency):
+    payload = (json.dumps({'type': 'select_team', 'team': ['Warrior', 'Mage', 'Tank', 'Knight']}) + '\n').encode()
+    latencies = []
+    per_worker = messages // concurrency
+    
+    async def worker(offset):
+        for i in range(per_worker):
+            reader, writer = conns[(offset + i * concurrency) % len(conns)]
+            started = time.perf_counter()
+            writer.write(payload)
+            await reader.readline()
+            latencies.append(time.perf_counter() - started)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return latencies, time.perf_counter() - started
+
+async def bench_backend(backend, host, port, connections, messages, concurrency):
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'Server.py'), '--backend', backend, '--host', host, '--port', str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_port(host, port)
+        time.sleep(0.5)
+        base_rss = rss_kb(proc.pid)
+        
+        conns = await open_connections(host, port, connections)
+        # Để server ổn định trước khi đo RAM
+        await asyncio.sleep(1.0)
+        loaded_rss = rss_kb(proc.pid)
+        
+        latencies, elapsed = await measure_latency(conns, messages, concurrency)
+        
+        for _, writer in conns:
+            writer.close()
+        
+        used_mb = max(loaded_rss - base_rss, 1) / 1024.0
+        return {
+            'backend': backend,
+            'connections': connections,
+            'rss_delta_mb': used_mb,
+            'connections_per_mb': connections / used_mb,
+            'messages': len(latencies),
+            'msg_per_s': len(latencies) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000
+        }
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark backend threaded vs async')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=18888)
+    parser.add_argument('--connections', type=int, default=2000)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--backends', nargs='+', default=['threaded', 'async'])
+    args = parser.parse_args()
+    
+    print(f"{'Backend':<10} {'Conns':>7} {'RSS MB':>8} {'Conns/MB':>9} {'Msg/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for i, backend in enumerate(args.backends):
+        r = asyncio.run(bench_backend(backend, args.host, args.port + i, args.connections,
+                                      args.messages, args.concurrency))
+        print(f"{r['backend']:<10} {r['connections']:>7} {r['rss_delta_mb']:>8.1f} {r['connections_per_mb']:>9.1f} "
+              f"{r['msg_per_s']:>8.0f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+So sánh số trận/giây giữa BattleEngine.simulate_battle (từng trận) và
+BatchSimulator.simulate_batch (NumPy, nhiều trận cùng lúc), đồng thời kiểm tra
+hai engine cho kết quả giống hệt nhau.
+
+Chạy: python benchmarks/bench_batch.py --fights 1000000 --scalar-fights 20000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Server import GameServer, BattleEngine, Champion
+from BatchSimulator import simulate_batch, team_arrays
+
+def random_teams(names, count, rng):
+    return [[rng.choice(names) for _ in range(4)] for _ in range(count)]
+
+def build_team(names, info):
+    return [Champion(n, info[n]['hp'], info[n]['dmg'], info[n]['range']) for n in names]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark engine từng trận vs engine NumPy')
+    parser.add_argument('--fights', type=int, default=1000000)
+    parser.add_argument('--scalar-fights', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=13)
+    args = parser.parse_args()
+    
+    champions = GameServer().available_champions
+    info = {c['name']: c for c in champions}
+    names = list(info)
+    rng = random.Random(args.seed)
+    
+    teams1 = random_teams(names, args.fights, rng)
+    teams2 = random_teams(names, args.fights, rng)
+    hp1, dmg1 = team_arrays(teams1, champions)
+    hp2, dmg2 = team_arrays(teams2, champions)
+    
+    started = time.perf_counter()
+    batch = simulate_batch(hp1, dmg1, hp2, dmg2)
+    batch_elapsed = time.perf_counter() - started
+    
+    scalar_count = min(args.scalar_fights, args.fights)
+    started = time.perf_counter()
+    scalar_results = [
+        BattleEngine.simulate_battle(build_team(teams1[i], info), build_team(teams2[i], info))
+        for i in range(scalar_count)
+    ]
+    scalar_elapsed = time.perf_counter() - started
+    
+    mismatches = 0
+    for i, result in enumerate(scalar_results):
+        if (result['winner'] != batch['winner'][i]
+                or [c['hp'] for c in result['team1_final']] != batch['team1_hp'][i].tolist()
+                or [c['hp'] for c in result['team2_final']] != batch['team2_hp'][i].tolist()):
+            mismatches += 1
+    
+    print(f"Scalar: {scalar_count:>9} trận  {scalar_elapsed:8.2f}s  {scalar_count / scalar_elapsed:>12,.0f} trận/s")
+    print(f"Batch : {args.fights:>9} trận  {batch_elapsed:8.2f}s  {args.fights / batch_elapsed:>12,.0f} trận/s")
+    print(f"Tăng tốc: x{(args.fights / batch_elapsed) / (scalar_count / scalar_elapsed):.1f}")
+    print(f"Kết quả khác nhau: {mismatches}/{scalar_count}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Đo chi phí bộ nhớ và thời gian của ba chế độ log trong BattleEngine.simulate_battle:
+- text:   ghi sự kiện rồi dựng ngay log văn bản (tương đương cách làm cũ)
+- events: chỉ ghi sự kiện gọn (BattleLog), chưa dựng văn bản
+- none:   record_log=False, chỉ tính kết quả
+
+Chạy: python benchmarks/bench_battle_log.py --fights 20000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Server import GameServer, BattleEngine
+
+def run_mode(server, pairs, mode):
+    kept = []
+    tracemalloc.start()
+    started = time.perf_counter()
+    
+    for team1_names, team2_names in pairs:
+        team1 = [server.create_champion(n) for n in team1_names]
+        team2 = [server.create_champion(n) for n in team2_names]
+        result = BattleEngine.simulate_battle(team1, team2, record_log=(mode != 'none'))
+        # Giữ lại phần log như server giữ trong cache
+        if mode == 'text':
+            kept.append(result['log'].render())
+        else:
+            kept.append(result['log'])
+    
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, current, peak
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark chi phí log trận đấu')
+    parser.add_argument('--fights', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=13)
+    args = parser.parse_args()
+    
+    server = GameServer(battle_cache_size=0)
+    names = [c['name'] for c in server.available_champions]
+    rng = random.Random(args.seed)
+    pairs = [([rng.choice(names) for _ in range(4)], [rng.choice(names) for _ in range(4)])
+             for _ in range(args.fights)]
+    
+    print(f"{'Chế độ':<8} {'trận/s':>10} {'giữ lại/trận':>14} {'đỉnh/trận':>12}")
+    for mode in ('text', 'events', 'none'):
+        elapsed, current, peak = run_mode(server, pairs, mode)
+        print(f"{mode:<8} {args.fights / elapsed:>10,.0f} {current / args.fights:>12,.0f} B "
+              f"{peak / args.fights:>10,.0f} B")
+
+if __name__ == "__main__":
+    main()
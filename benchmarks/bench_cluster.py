@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Số trận/giây của Cluster.py theo số worker: mỗi cấu hình chạy launcher trên một cổng riêng rồi
+dùng LoadGenerator để tạo tải (người chơi giả liên tục ready_to_battle -> battle_result).
+
+Với nhiều worker phần lớn trận đấu có hai người chơi ở hai worker khác nhau, nên số liệu gồm cả chi
+phí chuyển tin nhắn qua broker. Số worker lớn hơn số core không làm tăng thông lượng.
+
+Chạy: python benchmarks/bench_cluster.py --workers 1,2,4 --players 2000 --duration 10
+"""
+
+import os
+import sys
+import signal
+import asyncio
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import LoadGenerator
+from LoadGenerator import percentile
+
+def bench_workers(workers: int, args, port: int) -> dict:
+    load_args = LoadGenerator.parse_args([
+        '--host', args.host, '--port', str(port), '--players', str(args.players),
+        '--duration', str(args.duration), '--format', args.format
+    ])
+    load_args.server_args = f'--workers {workers} --backend {args.backend} --battle-workers 0'
+    
+    server = LoadGenerator.start_server(load_args, os.path.join(ROOT, 'Cluster.py'))
+    try:
+        stats = asyncio.run(LoadGenerator.run_load(load_args))
+    finally:
+        server.send_signal(signal.SIGINT)
+        try:
+            server.wait(15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+    
+    matches = sum(stats.results.values()) / 2
+    return {
+        'matches_per_s': matches / stats.elapsed,
+        'p50_ms': percentile(stats.match_latencies, 50) * 1000,
+        'p99_ms': percentile(stats.match_latencies, 99) * 1000,
+        'errors': sum(stats.errors.values())
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark số trận/giây theo số worker của Cluster.py')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=19888)
+    parser.add_argument('--workers', default='1,2,4', help='các số worker cần đo, cách nhau bởi dấu phẩy')
+    parser.add_argument('--players', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--backend', choices=['threaded', 'async'], default='async')
+    parser.add_argument('--format', choices=['json', 'binary'], default='json')
+    args = parser.parse_args()
+    
+    print(f"💻 {os.cpu_count()} core")
+    print(f"{'Worker':>6} {'trận/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'lỗi':>6}")
+    for i, workers in enumerate(int(w) for w in args.workers.split(',')):
+        r = bench_workers(workers, args, args.port + i)
+        print(f"{workers:>6} {r['matches_per_s']:>10,.1f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['errors']:>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Nén tin nhắn battle_result (set_compression): số byte trên đường truyền mỗi tin nhắn và thời gian
+CPU nén (phía server) / giải nén (phía client, qua FrameDecoder) mỗi tin nhắn.
+
+So sánh JSON escape \\uXXXX như trước (ensure_ascii), JSON UTF-8, zlib không có từ điển và zlib với
+từ điển dùng chung COMPRESSION_DICTIONARY. Chỉ khung từ --threshold byte trở lên được nén, giống server.
+Dòng "dài nhất" chỉ tính 5% trận có nhiều round nhất (log dài nhất).
+
+Chạy: python benchmarks/bench_compression.py --fights 5000
+"""
+
+import os
+import sys
+import time
+import zlib
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Server import GameServer, DEFAULT_COMPRESS_THRESHOLD
+from Protocol import (BinaryCodec, FrameDecoder, COMPRESSION_LEVEL, LENGTH_PREFIX, COMPRESSED_FLAG,
+                      compress_frame, encode_message, decode_message)
+from bench_wire_format import build_results, battle_message
+
+def zlib_without_dictionary(frame: bytes, wire_format: str) -> bytes:
+    payload = frame[:-1] if wire_format == 'json' else frame[LENGTH_PREFIX.size:]
+    data = zlib.compress(payload, COMPRESSION_LEVEL)
+    return LENGTH_PREFIX.pack(len(data) | COMPRESSED_FLAG) + data
+
+# (tên, định dạng, ensure_ascii, hàm nén)
+VARIANTS = [
+    ('json ascii', 'json', True, None),
+    ('json', 'json', False, None),
+    ('json + zlib', 'json', False, zlib_without_dictionary),
+    ('json + zlib + từ điển', 'json', False, compress_frame),
+    ('binary', 'binary', False, None),
+    ('binary + zlib + từ điển', 'binary', False, compress_frame)
+]
+
+def run_variant(results, wire_format, ensure_ascii, compress, codec, threshold):
+    frames = []
+    for result in results:
+        battle_log = result['log'].render() if wire_format == 'json' else result['log']
+        frames.append(encode_message(battle_message(result, battle_log), wire_format, codec, ensure_ascii))
+    
+    compressed = 0
+    started = time.perf_counter()
+    if compress is not None:
+        for i, frame in enumerate(frames):
+            if len(frame) >= threshold:
+                frames[i] = compress(frame, wire_format)
+                compressed += 1
+    compress_time = time.perf_counter() - started
+    
+    decoder = FrameDecoder(wire_format=wire_format)
+    started = time.perf_counter()
+    for frame in frames:
+        if compress is zlib_without_dictionary and frame[0] & 0x80:
+            decode_message(zlib.decompress(frame[LENGTH_PREFIX.size:]), wire_format, codec)
+            continue
+        decoder.feed(frame)
+        decode_message(decoder.next_frame(), wire_format, codec)
+    decode_time = time.perf_counter() - started
+    
+    return sum(len(f) for f in frames), compressed, compress_time, decode_time
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark nén tin nhắn battle_result')
+    parser.add_argument('--fights', type=int, default=5000)
+    parser.add_argument('--threshold', type=int, default=DEFAULT_COMPRESS_THRESHOLD)
+    parser.add_argument('--seed', type=int, default=13)
+    args = parser.parse_args()
+    
+    server = GameServer(battle_cache_size=0, battle_workers=0)
+    codec = BinaryCodec(server.available_champions)
+    results = build_results(server, args.fights, args.seed)
+    longest = sorted(results, key=lambda r: r['rounds'])[-max(1, len(results) // 20):]
+    
+    for title, group in (('Mọi trận', results), (f"Dài nhất (>= {longest[0]['rounds']} round)", longest)):
+        print(f"\n{title}: {len(group)} tin nhắn battle_result có log, ngưỡng nén {args.threshold} byte")
+        print(f"{'':<24} {'byte/tin':>9} {'tỉ lệ':>7} {'đã nén':>7} {'nén':>10} {'giải mã':>10}")
+        baseline = None
+        for name, wire_format, ensure_ascii, compress in VARIANTS:
+            size, compressed, compress_time, decode_time = run_variant(
+                group, wire_format, ensure_ascii, compress, codec, args.threshold)
+            baseline = baseline or size
+            print(f"{name:<24} {size / len(group):>9,.0f} {size / baseline:>7.1%} {compressed / len(group):>7.0%} "
+                  f"{compress_time / len(group) * 1e6:>7,.1f} µs {decode_time / len(group) * 1e6:>7,.1f} µs")
+
+if __name__ == "__main__":
+    main()
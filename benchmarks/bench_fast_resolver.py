@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+So sánh BattleEngine.fast_resolve (bỏ qua các round không có tướng chết) với vòng lặp từng round
+của simulate_battle, và kiểm tra hai cách cho cùng người thắng, số round, HP cuối.
+
+- Tốc độ: số trận/giây trên cùng một tập cặp đội hình ngẫu nhiên
+- Kiểm tra: mọi cặp đội hình (C^4 x C^4), chia theo team 1 cho nhiều tiến trình;
+  --sample N chỉ kiểm tra N đội hình team 1 ngẫu nhiên (vẫn đấu với mọi team 2)
+
+Chạy: python benchmarks/bench_fast_resolver.py --fights 20000 --workers 4
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Server import GameServer, BattleEngine, Champion
+
+def outcome(result):
+    return (result['winner'], result['rounds'],
+            [c['hp'] for c in result['team1_final']], [c['hp'] for c in result['team2_final']])
+
+def reference(team1, team2):
+    """Kết quả của vòng lặp từng round (đường ghi log)"""
+    return outcome(BattleEngine.simulate_battle(team1, team2, record_log=True))
+
+def check_rows(stats, rows, team_size):
+    """Kiểm tra các đội hình team 1 trong rows với mọi đội hình team 2; trả về (số trận, các cặp sai)"""
+    compositions = list(itertools.product(range(len(stats)), repeat=team_size))
+    teams = [[Champion(*stats[i]) for i in ids] for ids in compositions]
+    checked, mismatches = 0, []
+    
+    for row in rows:
+        team1 = [Champion(*stats[i]) for i in compositions[row]]
+        for col, team2 in enumerate(teams):
+            expected = reference(team1, team2)
+            if outcome(BattleEngine.fast_resolve(team1, team2)) != expected:
+                mismatches.append((row, col))
+            checked += 1
+    return checked, mismatches
+
+def bench_speed(stats, fights, team_size, seed):
+    rng = random.Random(seed)
+    pairs = [([Champion(*rng.choice(stats)) for _ in range(team_size)],
+              [Champion(*rng.choice(stats)) for _ in range(team_size)]) for _ in range(fights)]
+    
+    print(f"{'Cách tính':<14} {'trận/s':>10}")
+    timings = {}
+    for name, resolve in (('từng round', reference), ('fast_resolve', BattleEngine.fast_resolve)):
+        started = time.perf_counter()
+        for team1, team2 in pairs:
+            resolve(team1, team2)
+        timings[name] = time.perf_counter() - started
+        print(f"{name:<14} {fights / timings[name]:>10,.0f}")
+    print(f"⚡ Nhanh hơn {timings['từng round'] / timings['fast_resolve']:.1f} lần")
+
+def validate(stats, team_size, workers, sample, seed):
+    n = len(stats) ** team_size
+    rows = list(range(n))
+    if sample:
+        rows = sorted(random.Random(seed).sample(rows, min(sample, n)))
+    
+    # Nhiều khối nhỏ hơn số tiến trình để các tiến trình không phải chờ nhau ở cuối
+    chunk = max(1, len(rows) // (workers * 8))
+    chunks = [rows[i:i + chunk] for i in range(0, len(rows), chunk)]
+    
+    started = time.time()
+    checked, mismatches = 0, []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = [executor.submit(check_rows, stats, rows_chunk, team_size) for rows_chunk in chunks]
+        for future in as_completed(futures):
+            done, bad = future.result()
+            checked += done
+            mismatches.extend(bad)
+            print(f"\r⏳ {checked:,}/{len(rows) * n:,} trận ({time.time() - started:.0f}s)", end='', flush=True)
+    
+    print(f"\n{'✅' if not mismatches else '❌'} {checked:,} trận, {len(mismatches)} trận khác kết quả")
+    for row, col in mismatches[:10]:
+        print(f"   team1 #{row} vs team2 #{col}")
+    return not mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark và kiểm tra fast_resolve')
+    parser.add_argument('--fights', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--sample', type=int, default=0,
+                        help='số đội hình team 1 cần kiểm tra (mặc định: tất cả)')
+    parser.add_argument('--skip-validate', action='store_true')
+    parser.add_argument('--seed', type=int, default=13)
+    args = parser.parse_args()
+    
+    stats = [(c['name'], c['hp'], c['dmg'], c['range']) for c in GameServer().available_champions]
+    
+    bench_speed(stats, args.fights, 4, args.seed)
+    if not args.skip_validate:
+        return 0 if validate(stats, 4, args.workers, args.sample, args.seed) else 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
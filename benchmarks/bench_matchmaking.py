@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mô phỏng tải cho bộ ghép trận (đồng hồ ảo, không cần server):
+- Đổ một lượt lớn người chơi vào hàng đợi cùng lúc (mặc định 10.000)
+- Sau đó người chơi mới tiếp tục đến với tốc độ cố định, poll() được gọi mỗi tick
+- Báo cáo độ trễ ghép trận (theo thời gian ảo), chênh lệch điểm Elo của các cặp và
+  chi phí CPU thực cho mỗi push/poll
+
+Chạy: python benchmarks/bench_matchmaking.py --players 10000 --arrival-rate 2000 --duration 30
+     python benchmarks/bench_matchmaking.py --modes rating --base-tolerance 0 --widen-step 5
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Matchmaking import MATCHMAKERS
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+def simulate(mode, players, arrival_rate, duration, tick, seed, **options):
+    rng = random.Random(seed)
+    clock = VirtualClock()
+    matchmaker = MATCHMAKERS[mode](clock=clock, **(options if mode == 'rating' else {}))
+    
+    ratings, enqueued = {}, {}
+    latencies, rating_gaps = [], []
+    max_depth = 0
+    push_time = poll_time = 0.0
+    pushes = polls = 0
+    counter = 0
+    
+    def on_pair(pair):
+        for client_id in pair:
+            latencies.append(clock.now - enqueued.pop(client_id))
+        rating_gaps.append(abs(ratings[pair[0]] - ratings[pair[1]]))
+    
+    def arrive():
+        nonlocal counter, push_time, pushes, max_depth
+        counter += 1
+        client_id = f"p{counter}"
+        ratings[client_id] = min(3000.0, max(0.0, rng.gauss(1500, 300)))
+        enqueued[client_id] = clock.now
+        started = time.perf_counter()
+        pair, depth = matchmaker.push(client_id, ratings[client_id])
+        push_time += time.perf_counter() - started
+        pushes += 1
+        max_depth = max(max_depth, depth)
+        if pair:
+            on_pair(pair)
+    
+    for _ in range(players):
+        arrive()
+    depth_after_burst = len(matchmaker)
+    
+    carry = 0.0
+    while clock.now < duration:
+        clock.now += tick
+        carry += arrival_rate * tick
+        while carry >= 1.0:
+            arrive()
+            carry -= 1.0
+        
+        started = time.perf_counter()
+        pairs = matchmaker.poll()
+        poll_time += time.perf_counter() - started
+        polls += 1
+        for pair in pairs:
+            on_pair(pair)
+    
+    return {
+        'mode': mode,
+        'players': counter,
+        'matched': len(latencies),
+        'depth_after_burst': depth_after_burst,
+        'max_depth': max_depth,
+        'final_depth': len(matchmaker),
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+        'max': max(latencies) if latencies else 0.0,
+        'gap_avg': sum(rating_gaps) / len(rating_gaps) if rating_gaps else 0.0,
+        'gap_p99': percentile(rating_gaps, 99),
+        'push_us': push_time / pushes * 1e6 if pushes else 0.0,
+        'poll_us': poll_time / polls * 1e6 if polls else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Mô phỏng tải cho bộ ghép trận')
+    parser.add_argument('--players', type=int, default=10000, help='số người vào hàng đợi cùng lúc ban đầu')
+    parser.add_argument('--arrival-rate', type=float, default=2000.0, help='người chơi mới mỗi giây (ảo)')
+    parser.add_argument('--duration', type=float, default=30.0, help='thời gian mô phỏng (giây ảo)')
+    parser.add_argument('--tick', type=float, default=0.25)
+    parser.add_argument('--modes', nargs='+', default=['fifo', 'rating'])
+    parser.add_argument('--seed', type=int, default=13)
+    parser.add_argument('--base-tolerance', type=float, default=50.0,
+                        help='dung sai Elo ban đầu (đặt 0 để giữ cả đợt đầu trong hàng đợi)')
+    parser.add_argument('--widen-step', type=float, default=50.0)
+    parser.add_argument('--widen-interval', type=float, default=1.0)
+    args = parser.parse_args()
+    options = {
+        'base_tolerance': args.base_tolerance,
+        'widen_step': args.widen_step,
+        'widen_interval': args.widen_interval
+    }
+    
+    print(f"{'Mode':<7} {'Người':>7} {'Ghép':>7} {'Chờ sau đợt đầu':>16} {'Chờ max':>8} "
+          f"{'p50 s':>7} {'p99 s':>7} {'max s':>7} {'ΔElo TB':>8} {'ΔElo p99':>9} {'push µs':>8} {'poll µs':>8}")
+    for mode in args.modes:
+        r = simulate(mode, args.players, args.arrival_rate, args.duration, args.tick, args.seed, **options)
+        print(f"{r['mode']:<7} {r['players']:>7} {r['matched']:>7} {r['depth_after_burst']:>16} {r['max_depth']:>8} "
+              f"{r['p50']:>7.2f} {r['p99']:>7.2f} {r['max']:>7.2f} {r['gap_avg']:>8.1f} {r['gap_p99']:>9.1f} "
+              f"{r['push_us']:>8.1f} {r['poll_us']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
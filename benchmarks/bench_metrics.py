@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Đo chi phí của metrics trên đường xử lý tin nhắn (không cần mạng): các cặp client giả gửi
+select_team + ready_to_battle qua handle_data, server mô phỏng và gửi kết quả vào socket giả.
+So sánh số tin nhắn/s khi tắt và bật metrics.
+
+Chạy: python benchmarks/bench_metrics.py --pairs 20000
+"""
+
+import os
+import sys
+import time
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Server import GameServer
+from Protocol import encode_frame
+
+class NullSocket:
+    """Socket giả: bỏ qua mọi dữ liệu gửi đi"""
+    
+    wire_format = 'json'
+    codec = None
+    compression = None
+    
+    def sendall(self, data: bytes):
+        pass
+    
+    def sendmsg(self, buffers):
+        pass
+    
+    def close(self):
+        pass
+
+def run(metrics_enabled: bool, pairs: int) -> float:
+    server = GameServer(battle_workers=0, metrics_port=0 if metrics_enabled else None)
+    payloads = [
+        encode_frame({'type': 'select_team', 'team': [0, 1, 2, 3]}) + encode_frame({'type': 'ready_to_battle'}),
+        encode_frame({'type': 'select_team', 'team': [3, 4, 5, 6]}) + encode_frame({'type': 'ready_to_battle'})
+    ]
+    
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for client_id in ('a', 'b'):
+            server.register_client(client_id, NullSocket())
+    
+        started = time.perf_counter()
+        for _ in range(pairs):
+            server.handle_data('a', payloads[0])
+            server.handle_data('b', payloads[1])
+        elapsed = time.perf_counter() - started
+    
+    return pairs * 4 / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark chi phí metrics')
+    parser.add_argument('--pairs', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    results = {}
+    for _ in range(args.repeat):
+        for enabled in (False, True):
+            rate = run(enabled, args.pairs)
+            results[enabled] = max(results.get(enabled, 0.0), rate)
+    
+    print(f"{'metrics':<8} {'tin nhắn/s':>12}")
+    print(f"{'tắt':<8} {results[False]:>12,.0f}")
+    print(f"{'bật':<8} {results[True]:>12,.0f}")
+    print(f"Chi phí khi bật: {(results[False] / results[True] - 1) * 100:.1f}%")
+
+if __name__ == "__main__":
+    main()
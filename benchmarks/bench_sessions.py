@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chi phí heartbeat và dọn kết nối im lặng (Sessions.py) theo số kết nối: thời gian touch() trên đường
+nhận dữ liệu, và thời gian CPU luồng monitor tốn cho mỗi chu kỳ heartbeat khi mọi client đều hoạt
+động (hẹn lại) hoặc đều im lặng (gửi ping).
+
+Đồng hồ giả được đẩy từng tick nên không phải chờ thật; callback ping không làm gì.
+
+Chạy: python benchmarks/bench_sessions.py --clients 1000,10000,100000
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Sessions import ConnectionMonitor
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+def run_interval(monitor: ConnectionMonitor, clock: FakeClock, active: bool) -> float:
+    """Đẩy đồng hồ qua một chu kỳ heartbeat, trả về thời gian CPU của luồng monitor"""
+    ids = list(monitor.last_seen)
+    busy = 0.0
+    ticks = int(monitor.interval / monitor.wheel.tick)
+    for _ in range(ticks):
+        clock.now += monitor.wheel.tick
+        if active:
+            for client_id in ids:
+                monitor.touch(client_id)
+        started = time.perf_counter()
+        for client_id in monitor.wheel.advance():
+            monitor.expire(client_id)
+        busy += time.perf_counter() - started
+    return busy
+
+def bench(clients: int, interval: float) -> dict:
+    results = {}
+    for active in (True, False):
+        clock = FakeClock()
+        monitor = ConnectionMonitor(interval, interval * 3, 60.0, lambda c: None, lambda c: None,
+                                    lambda c: None, clock=clock)
+        ids = [f"client_{i}" for i in range(clients)]
+        for i, client_id in enumerate(ids):
+            # Kết nối đến rải đều trong một chu kỳ
+            clock.now += interval / clients
+            monitor.watch(client_id)
+    
+        if active:
+            started = time.perf_counter()
+            for client_id in ids:
+                monitor.touch(client_id)
+            results['touch_ns'] = (time.perf_counter() - started) / clients * 1e9
+    
+        if active:
+            run_interval(monitor, clock, active)  # chu kỳ đầu để hẹn giờ ổn định
+            results['active'] = run_interval(monitor, clock, active)
+        else:
+            # Chu kỳ mọi client đều im lặng đủ lâu để nhận ping
+            results['idle'] = run_interval(monitor, clock, active)
+            results['pings'] = monitor.pings_sent
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark heartbeat trên bánh xe hẹn giờ')
+    parser.add_argument('--clients', default='1000,10000,100000', help='các số kết nối cần đo, cách nhau bởi dấu phẩy')
+    parser.add_argument('--interval', type=float, default=15.0, help='giây giữa hai heartbeat')
+    args = parser.parse_args()
+    
+    print(f"{'Kết nối':>8} {'touch':>9} {'hoạt động/chu kỳ':>18} {'im lặng/chu kỳ':>16} {'ping':>8}")
+    for clients in (int(c) for c in args.clients.split(',')):
+        r = bench(clients, args.interval)
+        print(f"{clients:>8,} {r['touch_ns']:>6.0f} ns {r['active'] * 1000:>15.1f} ms "
+              f"{r['idle'] * 1000:>13.1f} ms {r['pings']:>8,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+So sánh hai định dạng khung tin nhắn (json và binary) trên tin nhắn battle_result:
+số byte mỗi trận và thời gian CPU mã hóa/giải mã mỗi tin nhắn.
+
+Mã hóa JSON tính cả bước dựng log văn bản (server phải dựng log cho client JSON),
+giải mã nhị phân tính cả bước dựng log văn bản ở phía client.
+
+Chạy: python benchmarks/bench_wire_format.py --fights 5000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Server import GameServer, BattleEngine
+from Protocol import BinaryCodec, FrameDecoder, encode_message, decode_message
+
+def build_results(server, fights, seed):
+    names = list(server.registry.by_name)
+    rng = random.Random(seed)
+    results = []
+    for _ in range(fights):
+        team1 = [server.create_champion(rng.choice(names)) for _ in range(4)]
+        team2 = [server.create_champion(rng.choice(names)) for _ in range(4)]
+        results.append(BattleEngine.simulate_battle(team1, team2, record_log=True))
+    return results
+
+def battle_message(result, battle_log):
+    # Cùng dạng với tin nhắn send_battle_result gửi cho người chơi 1
+    message = {
+        'type': 'battle_result',
+        'match_id': 'match_1234',
+        'winner': result['winner'],
+        'your_result': 'win' if result['winner'] == 1 else 'lose' if result['winner'] == 2 else 'draw',
+        'rating': 1516,
+        'your_team_final': result['team1_final'],
+        'enemy_team_final': result['team2_final']
+    }
+    if battle_log is not None:
+        message['battle_log'] = battle_log
+    return message
+
+def run_format(results, wire_format, codec, with_log):
+    frames = []
+    started = time.perf_counter()
+    for result in results:
+        if not with_log:
+            battle_log = None
+        elif wire_format == 'json':
+            battle_log = result['log'].render()
+        else:
+            battle_log = result['log']
+        frames.append(encode_message(battle_message(result, battle_log), wire_format, codec))
+    encode_time = time.perf_counter() - started
+    
+    decoder = FrameDecoder(wire_format=wire_format)
+    started = time.perf_counter()
+    for frame in frames:
+        decoder.feed(frame)
+        decode_message(decoder.next_frame(), wire_format, codec)
+    decode_time = time.perf_counter() - started
+    
+    return sum(len(f) for f in frames), encode_time, decode_time
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark định dạng khung tin nhắn')
+    parser.add_argument('--fights', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=13)
+    args = parser.parse_args()
+    
+    server = GameServer(battle_cache_size=0, battle_workers=0)
+    codec = BinaryCodec(server.available_champions)
+    results = build_results(server, args.fights, args.seed)
+    
+    print(f"{'Định dạng':<10} {'log':<5} {'byte/trận':>10} {'mã hóa':>10} {'giải mã':>10}")
+    for with_log in (True, False):
+        for wire_format in ('json', 'binary'):
+            size, encode_time, decode_time = run_format(results, wire_format, codec, with_log)
+            print(f"{wire_format:<10} {'có' if with_log else 'không':<5} {size / args.fights:>10,.0f} "
+                  f"{encode_time / args.fights * 1e6:>7,.1f} µs {decode_time / args.fights * 1e6:>7,.1f} µs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battle Chess Tests - Ghép trận
+Nhóm 13
+
+Chạy: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Server import GameServer
+from Matchmaking import RatingMatchmaker
+from Protocol import FrameDecoder, decode_message
+
+class FakeSocket:
+    """Thay cho socket thật: giữ lại các khung server gửi"""
+    
+    def __init__(self):
+        self.wire_format = 'json'
+        self.codec = None
+        self.compression = None
+        self.client_id = None
+        self.sent = bytearray()
+    
+    def sendall(self, data: bytes):
+        self.sent += data
+    
+    def sendmsg(self, parts):
+        for part in parts:
+            self.sent += part
+    
+    def close(self):
+        pass
+    
+    def messages(self):
+        decoder = FrameDecoder()
+        decoder.feed(bytes(self.sent))
+        return [decode_message(frame, 'json') for frame in decoder]
+
+class StartBattleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = GameServer(battle_workers=0, matchmaking='rating')
+        self.sockets = {}
+        for client_id in ('a', 'b', 'c'):
+            self.sockets[client_id] = FakeSocket()
+            self.server.register_client(client_id, self.sockets[client_id])
+            self.server.handle_team_selection(client_id, [0, 1, 2, 3])
+    
+    def test_partner_removed_before_start_requeues_survivor(self):
+        server = self.server
+        # poll() đã ghép a với b (cả hai đã rời hàng đợi), rồi a ngắt kết nối trước start_battle
+        for client_id in ('a', 'b'):
+            server.clients[client_id]['queued'] = True
+        server.remove_client('a')
+    
+        server.start_battle('a', 'b')
+    
+        self.assertIn('b', server.matchmaking)
+        self.assertTrue(server.clients['b']['queued'])
+        self.assertNotIn('battle_start', [m['type'] for m in self.sockets['b'].messages()])
+    
+        # Người chơi kế tiếp được ghép với b
+        server.handle_ready_to_battle('c')
+        self.assertNotIn('b', server.matchmaking)
+        results = {client_id: [m for m in self.sockets[client_id].messages() if m['type'] == 'battle_result']
+                   for client_id in ('b', 'c')}
+        self.assertEqual(len(results['b']), 1)
+        self.assertEqual(results['b'][0]['match_id'], results['c'][0]['match_id'])
+    
+    def test_both_removed(self):
+        server = self.server
+        server.remove_client('a')
+        server.remove_client('b')
+        server.start_battle('a', 'b')
+        self.assertEqual(len(server.matchmaking), 0)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+class RatingMatchmakerTest(unittest.TestCase):
+    
+    def assert_stale_exact(self, queue: RatingMatchmaker):
+        live = sum(1 for _, seq, client_id in queue._widen_heap if queue._is_queued(seq, client_id))
+        self.assertEqual(live, len(queue))
+        self.assertEqual(queue._stale, len(queue._widen_heap) - live)
+    
+    def test_stale_count_after_poll_match(self):
+        clock = FakeClock()
+        queue = RatingMatchmaker(widen_interval=1.0, clock=clock)
+        for client_id, rating in (('a', 1000), ('c', 2000), ('d', 3000)):
+            self.assertIsNone(queue.push(client_id, rating)[0])
+        clock.now += 0.5
+        self.assertIsNone(queue.push('b', 1080)[0])
+        clock.now += 0.5
+        # Mục heap của a bị poll() lấy ra trước khi ghép: không được tính là mục cũ
+        self.assertEqual(queue.poll(), [('b', 'a')])
+        self.assert_stale_exact(queue)
+        self.assertEqual(queue._stale, 1)
+    
+    def test_nearest_rating_wins(self):
+        queue = RatingMatchmaker(base_tolerance=100, clock=FakeClock())
+        for client_id, rating in (('far', 1000), ('near', 1150), ('other', 1400)):
+            queue.push(client_id, rating)
+        self.assertEqual(queue.push('new', 1190)[0], ('near', 'new'))
+        self.assert_stale_exact(queue)
+
+if __name__ == '__main__':
+    unittest.main()